@@ -1,329 +1,64 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Union, List, Optional
+from typing import AsyncIterator, Callable, Literal, Union, List, Optional, Tuple
+from collections import deque
+import asyncio
+import json
 import logging
-import re
-from docx import Document
-from docx.shared import Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from io import BytesIO
+import os
+import time
 
 # Import our existing lesson generation functions
 from prompt_builder import build_grammar_lesson_prompt, build_multi_rule_grammar_lesson_prompt
-from openai_client import generate_lesson
+from openai_client import stream_lesson_async, rate_limiter, circuit_breaker, retry_stats, MODEL_PARAMS
+from circuit_breaker import CircuitOpenError
+from lesson_parser import Lesson, LessonTokenizer, parse_lesson
+from lesson_pipeline import (
+    build_stronger_prompt,
+    repair_lesson,
+    generate_validated_lesson,
+)
 from database import LessonDatabase
+from lesson_cache import LessonCache
+from lesson_compression import body_hash
+from artifact_cache import ArtifactCache
+from docx_renderer import DOCX_MEDIA_TYPE, DOCX_RENDERER_VERSION, docx_filename
+from render_pool import RenderPool, RenderQueueFullError
+from zip_stream import stream_zip
+from singleflight import SingleFlight
+from job_queue import JobQueue
+import metrics
+from request_timing import ServerTimingMiddleware, current_timing
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def clean_lesson_text(text: str, subject: str, topic: str) -> str:
-    """
-    Clean lesson text by removing markdown formatting, placeholder headings,
-    and adding a clean title.
-    """
-    if not text:
-        return text
-    
-    # Remove markdown formatting first
-    # Replace **bold** → bold
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    # Replace _italics_ → italics
-    text = re.sub(r'_(.*?)_', r'\1', text)
-    # Remove heading syntax (##, ###)
-    text = re.sub(r'^#{1,3}\s*', '', text, flags=re.MULTILINE)
-    
-    cleaned_lines = []
-    activity_counter = 0
-    rule_section_processed = False
-    title_added = False
-    
-    # Regex patterns (compiled for efficiency and case-insensitivity)
-    rule_heading_pattern = re.compile(r'^\s*Rule Heading\s*$', re.IGNORECASE)
-    rule_x_pattern = re.compile(r'^\s*Rule \d+:\s*.*$', re.IGNORECASE)
-    # This pattern now captures optional leading numbers for activity sections
-    activity_section_pattern = re.compile(r'^\s*(?:\d+\.\s*)?(Activity|Section) Section [A-Z]\s*$', re.IGNORECASE)
-    bullet_pattern = re.compile(r'^\s*[-•]\s*') # For removing leading bullets
-    topic_pattern = re.compile(r'^\s*' + re.escape(topic) + r'\s*$', re.IGNORECASE)
-    
-    lines = text.split('\n')
-    
-    # Add clean title at the top
-    cleaned_lines.append(f"{subject} — {topic}")
-    cleaned_lines.append("") # Add a blank line after title
-    title_added = True
-    
-    for line in lines:
-        # 1. Handle "Rule Heading" and "Rule X:" replacement
-        if rule_heading_pattern.match(line) or rule_x_pattern.match(line):
-            if not rule_section_processed:
-                # Don't add topic again if it's already in the title
-                if not title_added:
-                    cleaned_lines.append(topic)
-                    cleaned_lines.append("") # Blank line after topic
-                cleaned_lines.append("Explanation")
-                cleaned_lines.append("") # Blank line after explanation
-                rule_section_processed = True
-            continue # Skip the original rule line
-        
-        # 2. Remove any standalone line that equals the topic (case-insensitive) if it appears again near the top
-        if topic_pattern.match(line) and title_added:
-            continue # Skip duplicate topic lines
-        
-        # 3. Handle Activity Section renaming and remove leading numbers
-        match_activity = activity_section_pattern.match(line)
-        if match_activity:
-            activity_counter += 1
-            cleaned_lines.append(f"Activity {activity_counter}")
-            cleaned_lines.append("") # Blank line after activity title
-            continue
-        
-        # 4. Remove leading "-" or "•" from list items
-        line = bullet_pattern.sub('', line)
-        
-        # Add the processed line
-        cleaned_lines.append(line)
-    
-    # 5. Ensure the cleaned text is returned without any extra blank lines caused by these removals.
-    # Trim extra blank lines (more than 2 consecutive empty lines -> 1 empty line)
-    final_cleaned_lines = []
-    consecutive_blanks = 0
-    for line in cleaned_lines:
-        if not line.strip():
-            consecutive_blanks += 1
-        else:
-            consecutive_blanks = 0
-        
-        if consecutive_blanks <= 1: # Allow at most one blank line
-            final_cleaned_lines.append(line)
-    
-    # Remove leading/trailing blank lines from the final list
-    while final_cleaned_lines and not final_cleaned_lines[0].strip():
-        final_cleaned_lines.pop(0)
-    while final_cleaned_lines and not final_cleaned_lines[-1].strip():
-        final_cleaned_lines.pop()
-    
-    return '\n'.join(final_cleaned_lines)
-
-
-def parse_lesson_sections(text: str) -> dict:
-    """
-    Parse lesson text into sections: explanation and activities.
-    Returns {"explanation": str, "activities": {1: str, 2: str, 3: str, 4: str}}
-    """
-    sections = {"explanation": "", "activities": {}}
-    
-    # Split text into lines
-    lines = text.split('\n')
-    current_section = "explanation"
-    current_content = []
-    
-    for line in lines:
-        # Check for Activity headers
-        activity_match = re.match(r'^Activity\s+(\d+)\s*$', line.strip(), re.IGNORECASE)
-        if activity_match:
-            # Save previous section
-            if current_section == "explanation":
-                sections["explanation"] = '\n'.join(current_content).strip()
-            else:
-                sections["activities"][int(current_section)] = '\n'.join(current_content).strip()
-            
-            # Start new activity section
-            current_section = activity_match.group(1)
-            current_content = []
-        else:
-            current_content.append(line)
-    
-    # Save the last section
-    if current_section == "explanation":
-        sections["explanation"] = '\n'.join(current_content).strip()
-    else:
-        sections["activities"][int(current_section)] = '\n'.join(current_content).strip()
-    
-    return sections
-
-
-def count_numbered_items(block: str) -> int:
-    """
-    Count numbered items in a text block using regex pattern.
-    """
-    if not block:
-        return 0
-    
-    # Find all lines that match the pattern: start with optional whitespace, then number, dot, space
-    matches = re.findall(r'^\s*\d+\.\s', block, re.MULTILINE)
-    return len(matches)
-
-
-def validate_counts(sections: dict, config: dict) -> dict:
-    """
-    Validate that each activity has the expected number of items.
-    Returns dict with per-activity actual vs expected counts and overall 'ok' status.
-    """
-    validation_result = {
-        "ok": True,
-        "activities": {},
-        "summary": {}
-    }
-    
-    expected_counts = {
-        1: config.get("section_a_questions", 6),
-        2: config.get("section_b_questions", 6),
-        3: config.get("section_c_questions", 6),
-        4: config.get("section_d_questions", 6)
-    }
-    
-    for activity_num in range(1, 5):
-        activity_content = sections["activities"].get(activity_num, "")
-        actual_count = count_numbered_items(activity_content)
-        expected_count = expected_counts[activity_num]
-        
-        validation_result["activities"][activity_num] = {
-            "actual": actual_count,
-            "expected": expected_count,
-            "match": actual_count == expected_count
-        }
-        
-        if actual_count != expected_count:
-            validation_result["ok"] = False
-    
-    # Add summary
-    validation_result["summary"] = {
-        "total_activities": len(sections["activities"]),
-        "matching_activities": sum(1 for act in validation_result["activities"].values() if act["match"]),
-        "total_expected": sum(expected_counts.values()),
-        "total_actual": sum(act["actual"] for act in validation_result["activities"].values())
-    }
-    
-    return validation_result
-
-
-def generate_targeted_activity_prompt(topic: str, activity_num: int, expected_count: int) -> str:
-    """
-    Generate a targeted prompt for regenerating a specific activity.
-    """
-    return f"""Regenerate ONLY Activity {activity_num} for topic "{topic}", exactly {expected_count} items, each on its own line starting '1.' to '{expected_count}.' No extra text.
-
-Example format:
-1. [First item]
-2. [Second item]
-3. [Third item]
-...
-{expected_count}. [Last item]
-
-Topic: {topic}
-Activity {activity_num}:"""
-
-
-def fix_activity_section(lesson_text: str, topic: str, activity_num: int, expected_count: int, max_attempts: int = 2) -> str:
-    """
-    Attempt to fix a specific activity section by regenerating it.
-    Returns the updated lesson text.
-    """
-    logger.info(f"Attempting to fix Activity {activity_num} (expected: {expected_count} items)")
-    
-    for attempt in range(max_attempts):
-        try:
-            # Generate targeted prompt
-            targeted_prompt = generate_targeted_activity_prompt(topic, activity_num, expected_count)
-            
-            # Generate new activity content
-            new_activity_content = generate_lesson(targeted_prompt)
-            
-            # Clean up the generated content (remove any extra text)
-            lines = new_activity_content.split('\n')
-            cleaned_lines = []
-            for line in lines:
-                if re.match(r'^\s*\d+\.\s', line.strip()):
-                    cleaned_lines.append(line)
-            
-            if len(cleaned_lines) == expected_count:
-                # Replace the activity section in the original text
-                sections = parse_lesson_sections(lesson_text)
-                sections["activities"][activity_num] = '\n'.join(cleaned_lines)
-                
-                # Reconstruct the lesson text
-                updated_text = sections["explanation"] + "\n\n"
-                for act_num in range(1, 5):
-                    if act_num in sections["activities"]:
-                        updated_text += f"Activity {act_num}\n{sections['activities'][act_num]}\n\n"
-                
-                logger.info(f"Successfully fixed Activity {activity_num} on attempt {attempt + 1}")
-                return updated_text.strip()
-            else:
-                logger.warning(f"Activity {activity_num} attempt {attempt + 1}: got {len(cleaned_lines)} items, expected {expected_count}")
-                
-        except Exception as e:
-            logger.error(f"Error fixing Activity {activity_num} attempt {attempt + 1}: {str(e)}")
-    
-    # If all attempts failed, try to synthesize the missing items
-    logger.warning(f"All attempts failed for Activity {activity_num}, synthesizing items")
-    return synthesize_missing_items(lesson_text, topic, activity_num, expected_count)
-
-
-def synthesize_missing_items(lesson_text: str, topic: str, activity_num: int, expected_count: int) -> str:
-    """
-    Synthesize missing items for an activity when regeneration fails.
-    """
-    sections = parse_lesson_sections(lesson_text)
-    current_content = sections["activities"].get(activity_num, "")
-    current_count = count_numbered_items(current_content)
-    
-    if current_count >= expected_count:
-        return lesson_text
-    
-    # Extract existing items
-    lines = current_content.split('\n')
-    existing_items = []
-    for line in lines:
-        if re.match(r'^\s*\d+\.\s', line.strip()):
-            existing_items.append(line.strip())
-    
-    # Generate additional items
-    missing_count = expected_count - current_count
-    additional_prompt = f"""Generate exactly {missing_count} more numbered items for Activity {activity_num} about "{topic}". 
-Each item should be on its own line starting with the next number ({current_count + 1}.) through ({expected_count}.).
-Make them relevant to the topic and consistent with the existing items.
-
-Existing items:
-{chr(10).join(existing_items[:3])}  # Show first 3 for context
-
-Generate {missing_count} more items:"""
-    
-    try:
-        additional_content = generate_lesson(additional_prompt)
-        additional_lines = additional_content.split('\n')
-        additional_items = []
-        
-        for line in additional_lines:
-            if re.match(r'^\s*\d+\.\s', line.strip()):
-                additional_items.append(line.strip())
-                if len(additional_items) >= missing_count:
-                    break
-        
-        # Combine existing and additional items
-        all_items = existing_items + additional_items[:missing_count]
-        
-        # Update the activity section
-        sections["activities"][activity_num] = '\n'.join(all_items)
-        
-        # Reconstruct the lesson text
-        updated_text = sections["explanation"] + "\n\n"
-        for act_num in range(1, 5):
-            if act_num in sections["activities"]:
-                updated_text += f"Activity {act_num}\n{sections['activities'][act_num]}\n\n"
-        
-        logger.info(f"Synthesized {len(additional_items[:missing_count])} items for Activity {activity_num}")
-        return updated_text.strip()
-        
-    except Exception as e:
-        logger.error(f"Error synthesizing items for Activity {activity_num}: {str(e)}")
-        return lesson_text
-
-
-app = FastAPI(title="Coding Cat Lesson Generator API", version="1.0.0")
+# Background generation jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_SHUTDOWN_TIMEOUT = float(os.getenv("JOB_SHUTDOWN_TIMEOUT", "30"))
+
+# DOCX rendering is CPU-bound, so it runs in worker processes off the event loop
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 2)))
+RENDER_MAX_PENDING = int(os.getenv("RENDER_MAX_PENDING", str(RENDER_WORKERS * 8)))
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT_SECONDS", "30"))
+EXPORT_MAX_LESSONS = int(os.getenv("EXPORT_MAX_LESSONS", "500"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_queue.start()
+    # Start the render workers from this thread (not a worker thread), then
+    # wait for their warm-up renders without blocking the loop
+    await asyncio.gather(*(asyncio.wrap_future(warmup) for warmup in render_pool.start()))
+    yield
+    # Let queued jobs drain before the process exits
+    await job_queue.shutdown(JOB_SHUTDOWN_TIMEOUT)
+    render_pool.shutdown()
+
+app = FastAPI(title="Coding Cat Lesson Generator API", version="1.0.0", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -332,14 +67,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Per-stage Server-Timing header on every response, and opt-in profiling of slow requests
+app.add_middleware(ServerTimingMiddleware)
+
 # Request model
 class LessonRequest(BaseModel):
     grade: Union[int, str]
     subject: str
     topic: str
     questions_per_section: int = 6
+    fresh: bool = False  # Bypass the lesson cache and always generate a new lesson
 
 # Response model
 class LessonResponse(BaseModel):
@@ -348,6 +88,7 @@ class LessonResponse(BaseModel):
     regenerated: bool = False
     warnings: List[str] = []
     lessonId: Optional[int] = None
+    cached: bool = False
 
 # Lesson history models
 class LessonSummary(BaseModel):
@@ -356,174 +97,69 @@ class LessonSummary(BaseModel):
     grade: int
     age: Optional[int]
     date_generated: str
+    # Only present when the full projection is requested (fields=full)
+    lesson_text: Optional[str] = None
+    tags: Optional[List[str]] = None
 
 class LessonsListResponse(BaseModel):
     lessons: List[LessonSummary]
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+class LessonSearchResult(LessonSummary):
+    snippet: str
+    score: float
+
+class LessonSearchResponse(BaseModel):
+    query: str
+    lessons: List[LessonSearchResult]
     total: int
 
-# Initialize database
-db = LessonDatabase()
+class LessonExportRequest(BaseModel):
+    # Either explicit lesson IDs or a grade/topic filter
+    lesson_ids: Optional[List[int]] = None
+    grade: Optional[int] = None
+    topic: Optional[str] = None
+
+# Lesson activity models
+class LessonActivity(BaseModel):
+    lesson_id: int
+    number: int
+    content: str
+    item_count: int
+
+class LessonActivityUpdate(BaseModel):
+    content: str
+
+# Background job models
+class JobStatusResponse(BaseModel):
+    jobId: str
+    status: str
+    stage: Optional[str] = None
+    result: Optional[LessonResponse] = None
+    error: Optional[str] = None
+    createdAt: str
+    updatedAt: str
+
+# Initialize database (LESSON_DB_PATH moves it, and the caches stored alongside it)
+db = LessonDatabase(os.getenv("LESSON_DB_PATH", "lessons.db"))
+
+# Initialize the generated lesson cache (stored alongside the lessons table)
+lesson_cache = LessonCache(
+    db.db_path,
+    max_entries=int(os.getenv("LESSON_CACHE_MAX_ENTRIES", "1000")),
+    ttl_seconds=float(os.getenv("LESSON_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+)
 
-def validate_lesson(text: str, topic: str) -> tuple[bool, List[str]]:
-    """
-    Validate lesson content for banned terms and topic adherence.
-    Returns (is_valid, warnings_list)
-    """
-    warnings = []
-    
-    # Check for banned terms (pictures, drawings, diagrams, images)
-    banned_pattern = r"\b(picture|draw|diagram|image|illustration)\b"
-    banned_matches = re.findall(banned_pattern, text, flags=re.IGNORECASE)
-    if banned_matches:
-        warnings.append(f"Found banned terms: {', '.join(set(banned_matches))}")
-    
-    # Check topic adherence (topic should appear at least 2 times)
-    topic_matches = len(re.findall(re.escape(topic), text, flags=re.IGNORECASE))
-    if topic_matches < 2:
-        warnings.append(f"Topic '{topic}' only appears {topic_matches} times")
-    
-    is_valid = len(warnings) == 0
-    return is_valid, warnings
+# Coalesces concurrent identical generation requests into one upstream generation
+generation_flights = SingleFlight()
 
-def create_docx_from_lesson(lesson_text: str, grade: int, topics: List[str]) -> BytesIO:
-    """
-    Create a Word document from lesson text with proper styling.
-    """
-    doc = Document()
-    
-    # Set up document margins
-    sections = doc.sections
-    for section in sections:
-        section.top_margin = Inches(1)
-        section.bottom_margin = Inches(1)
-        section.left_margin = Inches(1)
-        section.right_margin = Inches(1)
-    
-    # Add header
-    header = doc.add_heading('Coding Cat Club', 0)
-    header.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    
-    # Add grade and topic info
-    topic_text = ', '.join(topics)
-    grade_topic = doc.add_paragraph(f'Grade {grade} — Topic: {topic_text}')
-    grade_topic.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    
-    # Add Name and Date lines
-    name_date = doc.add_paragraph()
-    name_date.add_run('Name: ').bold = True
-    name_date.add_run('_' * 30)
-    name_date.add_run('    Date: ').bold = True
-    name_date.add_run('_' * 30)
-    
-    # Add title
-    title = doc.add_heading('Lesson Worksheet', level=1)
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    
-    # Process lesson text line by line
-    lines = lesson_text.split('\n')
-    i = 0
-    
-    # Skip the first line if it's the subject-topic title (already handled in header)
-    if lines and ' — ' in lines[0]:
-        i = 2  # Skip title and empty line
-    
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        if not line:
-            # Empty line - add paragraph break
-            doc.add_paragraph()
-            i += 1
-            continue
-        
-        # Check for section headers (previously bold text, now plain text)
-        # Look for lines that are likely section headers (all caps, short, or end with colon)
-        if (line.isupper() and len(line) < 50) or line.endswith(':') and len(line) < 100:
-            # Section header
-            doc.add_heading(line, level=2)
-            i += 1
-            continue
-        
-        # Check for numbered lists
-        numbered_match = re.match(r'^(\d+)\.\s*(.+)$', line)
-        if numbered_match:
-            # Start numbered list
-            list_items = []
-            while i < len(lines) and re.match(r'^\d+\.\s*(.+)$', lines[i].strip()):
-                match = re.match(r'^\d+\.\s*(.+)$', lines[i].strip())
-                if match:
-                    list_items.append(match.group(1))
-                i += 1
-            
-            # Add numbered list with manual numbering (restarts at 1 for each block)
-            for idx, item in enumerate(list_items, 1):
-                p = doc.add_paragraph(f"{idx}. {item}")
-                # Check if next line is an answer line
-                if i < len(lines) and lines[i].strip() == '':
-                    i += 1
-                    if i < len(lines) and lines[i].strip() == '':
-                        # Add answer line
-                        answer_p = doc.add_paragraph()
-                        answer_run = answer_p.add_run('_' * 50)
-                        answer_run.underline = True
-                        i += 1
-            continue
-        
-        # Check for bullet points
-        bullet_match = re.match(r'^[-•]\s*(.+)$', line)
-        if bullet_match:
-            # Start bullet list
-            list_items = []
-            while i < len(lines) and re.match(r'^[-•]\s*(.+)$', lines[i].strip()):
-                match = re.match(r'^[-•]\s*(.+)$', lines[i].strip())
-                if match:
-                    list_items.append(match.group(1))
-                i += 1
-            
-            # Add bullet list
-            for item in list_items:
-                doc.add_paragraph(item, style='List Bullet')
-            continue
-        
-        # Check for instructions
-        if line.startswith('Instructions:'):
-            p = doc.add_paragraph()
-            p.add_run('Instructions: ').bold = True
-            p.add_run(line.replace('Instructions:', '').strip()).italic = True
-            i += 1
-            continue
-        
-        # Regular paragraph with markdown processing
-        p = doc.add_paragraph()
-        
-        # Process bold text within the line
-        parts = re.split(r'(\*\*.*?\*\*)', line)
-        for part in parts:
-            if part.startswith('**') and part.endswith('**'):
-                # Bold text
-                run = p.add_run(part.replace('**', ''))
-                run.bold = True
-            else:
-                # Regular text
-                p.add_run(part)
-        
-        # Check if next line should be an answer line
-        if i + 1 < len(lines) and lines[i + 1].strip() == '':
-            i += 1
-            if i + 1 < len(lines) and lines[i + 1].strip() == '':
-                # Add answer line
-                answer_p = doc.add_paragraph()
-                answer_run = answer_p.add_run('_' * 50)
-                answer_run.underline = True
-                i += 1
-        
-        i += 1
-    
-    # Save to BytesIO
-    docx_buffer = BytesIO()
-    doc.save(docx_buffer)
-    docx_buffer.seek(0)
-    return docx_buffer
+# Rendered DOCX downloads
+artifact_cache = ArtifactCache(
+    db.db_path,
+    max_bytes=int(os.getenv("DOCX_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+)
+render_pool = RenderPool(workers=RENDER_WORKERS, max_pending=RENDER_MAX_PENDING, timeout=RENDER_TIMEOUT)
 
 @app.get("/")
 async def root():
@@ -533,44 +169,353 @@ async def root():
 async def health_check():
     return {"status": "healthy", "message": "API is running"}
 
+@app.get("/api/stats")
+async def get_stats():
+    """
+    Report runtime counters for the generation pipeline.
+    """
+    return {
+        "cache": lesson_cache.stats(),
+        "coalescing": generation_flights.stats(),
+        "jobs": await job_queue.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "circuit_breaker": circuit_breaker.stats(),
+        "retries": retry_stats,
+        "storage": db.get_storage_stats(),
+        "artifacts": artifact_cache.stats(),
+        "rendering": render_pool.stats()
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Export stage latency histograms and pipeline counters in the Prometheus text format.
+    """
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+async def get_cached_artifact(cache_key: str) -> Optional[bytes]:
+    """
+    Look up a rendered file off the event loop. Cache errors are logged and treated as misses.
+    """
+    try:
+        content = await asyncio.to_thread(artifact_cache.get, cache_key)
+    except Exception as e:
+        logger.warning(f"Artifact cache lookup failed: {e}")
+        metrics.STORAGE_FAILURES.inc(store="artifact_cache", operation="get")
+        content = None
+    metrics.CACHE_LOOKUPS.inc(cache="artifact_cache", result="miss" if content is None else "hit")
+    return content
+
+async def store_artifact(cache_key: str, lesson_id: int, content: bytes):
+    """
+    Cache a rendered file off the event loop. Cache errors are logged, not raised.
+    """
+    try:
+        await asyncio.to_thread(artifact_cache.set, cache_key, lesson_id, content)
+    except Exception as e:
+        logger.warning(f"Failed to store rendered file in cache: {e}")
+        metrics.STORAGE_FAILURES.inc(store="artifact_cache", operation="set")
+
+async def render_lesson_docx(lesson: dict, cache_key: Optional[str] = None, export: bool = False) -> bytes:
+    """
+    Return a lesson's DOCX from the artifact cache, rendering it in the render pool on a miss.
+    Export renders wait for the pool's export slots and are not cached, so a
+    large export cannot evict the files teachers keep downloading.
+    """
+    if cache_key is None:
+        cache_key = ArtifactCache.make_key(lesson['id'], body_hash(lesson['lesson_text']), DOCX_RENDERER_VERSION)
+    content = await get_cached_artifact(cache_key)
+    if content is None:
+        # Render from the stored sections; the body is only parsed if they are gone
+        sections = db.get_lesson_sections(lesson['id']) or parse_lesson(lesson['lesson_text'])
+        with metrics.STAGE_SECONDS.time(stage="docx_render"):
+            content = await render_pool.render(sections, lesson['grade'], lesson['topics'], wait_for_slot=export)
+        if not export:
+            await store_artifact(cache_key, lesson['id'], content)
+    return content
+
+async def export_docx_entries(lesson_ids: List[int]) -> AsyncIterator[Tuple[str, bytes]]:
+    """
+    Render lessons for a ZIP export, yielding (filename, content) in order.
+    A window of renders runs ahead in the render pool; lessons deleted since the
+    export started are skipped.
+    """
+    window = deque()
+    try:
+        for lesson_id in lesson_ids:
+            lesson = db.get_lesson(lesson_id)
+            if lesson is None:
+                continue
+            name = f"{lesson_id}_{docx_filename(lesson)}"
+            # The window bounds this export's renders; they wait for the pool's export
+            # slots rather than taking the pending budget downloads rely on
+            window.append((name, asyncio.ensure_future(render_lesson_docx(lesson, export=True))))
+            if len(window) >= RENDER_WORKERS * 2:
+                name, render = window.popleft()
+                yield name, await render
+        while window:
+            name, render = window.popleft()
+            yield name, await render
+    finally:
+        # The client went away: don't keep rendering files nobody will receive
+        for _, render in window:
+            render.cancel()
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 requires).
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or any(candidate.removeprefix('W/') == etag for candidate in candidates)
+
 @app.get("/api/lessons/{lesson_id}/docx")
-async def download_lesson_docx(lesson_id: int):
+async def download_lesson_docx(lesson_id: int, request: Request):
     """
-    Download a lesson as a Word document (.docx)
+    Download a lesson as a Word document (.docx).
+    Rendered files are cached; repeat downloads send If-None-Match and get a 304.
     """
     try:
-        logger.info(f"Generating DOCX for lesson ID: {lesson_id}")
-        
         # Get lesson from database
         lesson = db.get_lesson(lesson_id)
         if not lesson:
             raise HTTPException(status_code=404, detail=f"Lesson with ID {lesson_id} not found")
         
-        # Create DOCX
-        docx_buffer = create_docx_from_lesson(
-            lesson['lesson_text'],
-            lesson['grade'],
-            lesson['topics']
+        cache_key = ArtifactCache.make_key(lesson_id, body_hash(lesson['lesson_text']), DOCX_RENDERER_VERSION)
+        etag = f'"{cache_key}"'
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        content = await render_lesson_docx(lesson, cache_key)
+        
+        filename = docx_filename(lesson)
+        return Response(
+            content,
+            media_type=DOCX_MEDIA_TYPE,
+            headers={
+                "Content-Disposition": f"attachment; filename={filename}",
+                "ETag": etag,
+                "Cache-Control": "no-cache"
+            }
         )
-        
-        # Create filename
-        topic_text = '_'.join(lesson['topics']).replace(' ', '_')
-        filename = f"Lesson_Grade{lesson['grade']}_{topic_text}.docx"
-        
-        logger.info(f"DOCX generated successfully: {filename}")
-        
-        return StreamingResponse(
-            docx_buffer,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
+    
     except HTTPException:
         raise
+    except RenderQueueFullError:
+        logger.warning(f"Render queue full, rejecting DOCX download for lesson {lesson_id}")
+        raise HTTPException(status_code=503, detail="Too many documents are being generated, please retry shortly",
+                            headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out generating DOCX for lesson {lesson_id}")
+        raise HTTPException(status_code=504, detail="Timed out generating DOCX")
     except Exception as e:
         logger.error(f"Error generating DOCX for lesson {lesson_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate DOCX: {str(e)}")
 
+@app.post("/api/lessons/export")
+async def export_lessons_zip(request: LessonExportRequest):
+    """
+    Download many lessons as a ZIP of DOCX worksheets, by ID or by grade/topic filter.
+    The archive is streamed while the worksheets are rendered.
+    """
+    if request.lesson_ids:
+        lesson_ids = list(dict.fromkeys(request.lesson_ids))
+        if len(lesson_ids) > EXPORT_MAX_LESSONS:
+            raise HTTPException(status_code=400, detail=f"At most {EXPORT_MAX_LESSONS} lessons can be exported at once")
+        missing = sorted(set(lesson_ids) - set(db.get_existing_ids(lesson_ids)))
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Lessons not found: {', '.join(map(str, missing))}")
+    elif request.grade is not None or request.topic:
+        lessons = db.find_lessons(grade=request.grade, topic=request.topic, limit=EXPORT_MAX_LESSONS + 1)
+        if len(lessons) > EXPORT_MAX_LESSONS:
+            raise HTTPException(status_code=400, detail=f"More than {EXPORT_MAX_LESSONS} lessons match; narrow the filter")
+        lesson_ids = [lesson['id'] for lesson in lessons]
+        if not lesson_ids:
+            raise HTTPException(status_code=404, detail="No lessons match the filter")
+    else:
+        raise HTTPException(status_code=400, detail="Provide lesson_ids or a grade/topic filter")
+    
+    logger.info(f"Exporting {len(lesson_ids)} lessons as ZIP")
+    return StreamingResponse(
+        stream_zip(export_docx_entries(lesson_ids)),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=lesson_worksheets.zip"}
+    )
+
+def prepare_lesson_request(request: LessonRequest) -> tuple[int, dict, List[str], str]:
+    """
+    Validate a lesson request and build its configuration and prompt.
+    Returns (grade_level, lesson_config, topics, prompt); raises HTTPException on bad input.
+    """
+    # Convert grade to int if it's a string
+    grade_level = int(request.grade) if isinstance(request.grade, str) else request.grade
+    
+    # Validate grade level (expanded to 1-12)
+    if grade_level < 1 or grade_level > 12:
+        raise HTTPException(status_code=422, detail="Grade level must be between 1 and 12")
+    
+    # Validate questions per section
+    if request.questions_per_section < 1 or request.questions_per_section > 20:
+        raise HTTPException(status_code=400, detail="Questions per section must be between 1 and 20")
+    
+    # Create lesson configuration
+    lesson_config = {
+        "grade_level": grade_level,
+        "section_a_questions": request.questions_per_section,
+        "section_b_questions": request.questions_per_section,
+        "section_c_questions": request.questions_per_section,
+        "section_d_questions": request.questions_per_section
+    }
+    
+    # For now, we'll focus on single topic lessons
+    # In the future, we could split the topic by commas or other delimiters for multi-topic lessons
+    topics = [topic.strip() for topic in request.topic.split(',') if topic.strip()]
+    
+    if not topics:
+        raise HTTPException(status_code=400, detail="At least one topic must be provided")
+    
+    # Generate the prompt based on number of topics
+    with metrics.STAGE_SECONDS.time(stage="prompt_build"):
+        if len(topics) == 1:
+            prompt = build_grammar_lesson_prompt(topics[0], lesson_config)
+        else:
+            prompt = build_multi_rule_grammar_lesson_prompt(topics, lesson_config)
+    
+    return grade_level, lesson_config, topics, prompt
+
+
+def save_generated_lesson(topics: List[str], grade_level: int, lesson_text: str,
+                          lesson: Optional[Lesson] = None) -> Optional[int]:
+    """
+    Save a generated lesson (and, if given, its parsed form) to the database.
+    Returns the lesson ID, or None if the save failed (the request should not fail).
+    """
+    try:
+        lesson_id = db.save_lesson(topics, grade_level, lesson_text, lesson=lesson)
+        logger.info(f"Lesson saved to database with ID: {lesson_id}")
+        return lesson_id
+    except Exception as e:
+        logger.warning(f"Failed to save lesson to database: {e}")
+        return None
+
+
+def make_lesson_cache_key(prompt: str, subject: str) -> str:
+    """
+    Build the cache key for a lesson request. The prompt already encodes the
+    normalized topics, grade and question counts; the subject only affects the title.
+    """
+    return LessonCache.make_key(prompt, MODEL_PARAMS, subject=subject)
+
+
+async def get_cached_lesson(cache_key: str) -> Optional[dict]:
+    """
+    Look up a previously generated lesson off the event loop. Cache errors are
+    logged and treated as misses.
+    """
+    try:
+        cached = await asyncio.to_thread(lesson_cache.get, cache_key)
+    except Exception as e:
+        logger.warning(f"Lesson cache lookup failed: {e}")
+        metrics.STORAGE_FAILURES.inc(store="lesson_cache", operation="get")
+        cached = None
+    metrics.CACHE_LOOKUPS.inc(cache="lesson_cache", result="hit" if cached else "miss")
+    return cached
+
+
+async def put_cached_lesson(cache_key: str, entry: dict):
+    """
+    Write a lesson cache entry off the event loop. Cache errors are logged, not raised.
+    """
+    try:
+        await asyncio.to_thread(lesson_cache.set, cache_key, entry)
+    except Exception as e:
+        logger.warning(f"Failed to store lesson in cache: {e}")
+        metrics.STORAGE_FAILURES.inc(store="lesson_cache", operation="set")
+
+
+async def store_cached_lesson(cache_key: str, lesson_text: str, regenerated: bool,
+                              warnings: List[str], validation_result: dict, lesson_id: Optional[int]):
+    """
+    Cache a generated lesson with the history ID it was saved under. Lessons whose
+    activity counts could not be repaired are not cached.
+    """
+    if not validation_result['ok']:
+        return
+    await put_cached_lesson(cache_key, {
+        "lessonText": lesson_text,
+        "regenerated": regenerated,
+        "warnings": warnings,
+        "lessonId": lesson_id
+    })
+
+
+async def cached_lesson_id(cache_key: str, cached: dict, topics: List[str], grade_level: int) -> Optional[int]:
+    """
+    Return the history ID for a lesson served from the cache: the lesson saved when
+    it was generated, so repeat requests do not add history rows. Only if that
+    lesson has since been deleted (or was never saved) is it saved again, and the
+    cache entry updated to point at the new row.
+    """
+    lesson_id = cached.get("lessonId")
+    if lesson_id is not None and db.get_existing_ids([lesson_id]):
+        return lesson_id
+    lesson_id = save_generated_lesson(topics, grade_level, cached["lessonText"])
+    if lesson_id is not None:
+        await put_cached_lesson(cache_key, dict(cached, lessonId=lesson_id))
+    return lesson_id
+
+
+def format_sse_event(event: str, data: dict) -> str:
+    """
+    Format a Server-Sent Events message with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def produce_lesson(request: LessonRequest, on_stage: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    Produce a lesson for a request: serve it from the cache, join an identical
+    generation already in flight, or run the pipeline. A generated lesson is saved
+    to the history and cached with its ID (a cached one keeps that ID), and the
+    LessonResponse fields are returned.
+    """
+    grade_level, lesson_config, topics, prompt = prepare_lesson_request(request)
+    
+    cache_key = make_lesson_cache_key(prompt, request.subject)
+    cached = None if request.fresh else await get_cached_lesson(cache_key)
+    if cached:
+        logger.info("Serving lesson from cache")
+        return {
+            "lessonText": cached["lessonText"],
+            "regenerated": cached["regenerated"],
+            "warnings": cached["warnings"],
+            "lessonId": await cached_lesson_id(cache_key, cached, topics, grade_level),
+            "cached": True
+        }
+    
+    # Identical requests already in flight share one generation instead of starting their own
+    result = await generation_flights.do(
+        cache_key,
+        lambda: generate_validated_lesson(prompt, request.subject, topics, lesson_config, on_stage)
+    )
+    
+    # Save lesson to database (optional - you can remove this if you don't want to auto-save)
+    if on_stage:
+        on_stage("saving")
+    lesson_id = save_generated_lesson(topics, grade_level, result["lessonText"], result.get("lesson"))
+    await store_cached_lesson(cache_key, result["lessonText"], result["regenerated"], result["warnings"],
+                              result["validation"], lesson_id)
+    
+    return {
+        "lessonText": result["lessonText"],
+        "regenerated": result["regenerated"],
+        "warnings": result["warnings"],
+        "lessonId": lesson_id,
+        "cached": False
+    }
+
+
 @app.post("/api/generate-lesson", response_model=LessonResponse)
 async def generate_lesson_endpoint(request: LessonRequest):
     """
@@ -579,162 +524,238 @@ async def generate_lesson_endpoint(request: LessonRequest):
     try:
         logger.info(f"Generating lesson for grade {request.grade}, subject {request.subject}, topic {request.topic}")
         
-        # Convert grade to int if it's a string
-        grade_level = int(request.grade) if isinstance(request.grade, str) else request.grade
-        
-        # Validate grade level (expanded to 1-12)
-        if grade_level < 1 or grade_level > 12:
-            raise HTTPException(status_code=422, detail="Grade level must be between 1 and 12")
-        
-        # Validate questions per section
-        if request.questions_per_section < 1 or request.questions_per_section > 20:
-            raise HTTPException(status_code=400, detail="Questions per section must be between 1 and 20")
-        
-        # Create lesson configuration
-        lesson_config = {
-            "grade_level": grade_level,
-            "section_a_questions": request.questions_per_section,
-            "section_b_questions": request.questions_per_section,
-            "section_c_questions": request.questions_per_section,
-            "section_d_questions": request.questions_per_section
-        }
-        
-        # For now, we'll focus on single topic lessons
-        # In the future, we could split the topic by commas or other delimiters for multi-topic lessons
-        topics = [topic.strip() for topic in request.topic.split(',') if topic.strip()]
-        
-        if not topics:
-            raise HTTPException(status_code=400, detail="At least one topic must be provided")
-        
-        # Generate the prompt based on number of topics
-        if len(topics) == 1:
-            prompt = build_grammar_lesson_prompt(topics[0], lesson_config)
-        else:
-            prompt = build_multi_rule_grammar_lesson_prompt(topics, lesson_config)
-        
-        logger.info("Calling OpenAI API to generate lesson...")
-        
-        # Generate the lesson using OpenAI
-        lesson_text = generate_lesson(prompt)
-        
-        # Validate the generated lesson
-        is_valid, warnings = validate_lesson(lesson_text, topics[0])
-        
-        # If invalid, regenerate once with stronger constraints
-        regenerated = False
-        if not is_valid:
-            logger.warning(f"Lesson validation failed: {warnings}. Regenerating with stronger constraints.")
-            
-            # Add stronger system steer to the prompt
-            stronger_prompt = prompt + f"\n\nYour last output violated constraints. Strictly follow: no pictures; keep strictly on-topic: {topics[0]}."
-            
-            # Regenerate
-            lesson_text = generate_lesson(stronger_prompt)
-            regenerated = True
+        return LessonResponse(**await produce_lesson(request))
+    
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except CircuitOpenError as e:
+        logger.warning(f"Rejecting lesson generation: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, int(e.retry_after)))}
+        )
+    except Exception as e:
+        logger.error(f"Error generating lesson: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate lesson: {str(e)}")
+
+@app.post("/api/generate-lesson/stream")
+async def generate_lesson_stream_endpoint(request: LessonRequest):
+    """
+    Generate a lesson and stream it as Server-Sent Events.
+    Events: "token" (cleaned text chunk), "reset" (discard streamed text, a
+    regeneration follows), "status" (pipeline stage), "done" (final lesson with
+    validation/repair results, lessonId and the per-stage timing, which the
+    Server-Timing header cannot carry for a stream) and "error".
+    """
+    logger.info(f"Streaming lesson for grade {request.grade}, subject {request.subject}, topic {request.topic}")
+    
+    # Validate up front so bad requests get a normal HTTP error instead of a stream
+    grade_level, lesson_config, topics, prompt = prepare_lesson_request(request)
+    cache_key = make_lesson_cache_key(prompt, request.subject)
+    
+    async def stream_attempt(attempt_prompt: str, call_type: str):
+        # Clean, parse and validate the lesson in one pass as its chunks arrive
+        tokenizer = LessonTokenizer(request.subject, topics[0])
+        tokenize_seconds = 0.0
+        async for chunk in stream_lesson_async(attempt_prompt, call_type=call_type):
+            start = time.perf_counter()
+            cleaned = tokenizer.feed(chunk)
+            tokenize_seconds += time.perf_counter() - start
+            if cleaned:
+                yield cleaned, None
+        start = time.perf_counter()
+        cleaned = tokenizer.finish()
+        lesson = tokenizer.lesson()
+        metrics.STAGE_SECONDS.observe(tokenize_seconds + time.perf_counter() - start, stage="clean_validate")
+        yield cleaned, lesson
+    
+    async def event_stream():
+        try:
+            cached = None if request.fresh else await get_cached_lesson(cache_key)
+            if cached:
+                logger.info("Serving streamed lesson from cache")
+                yield format_sse_event("token", {"text": cached["lessonText"]})
+                yield format_sse_event("done", {
+                    "lessonText": cached["lessonText"],
+                    "success": True,
+                    "regenerated": cached["regenerated"],
+                    "repaired": False,
+                    "warnings": cached["warnings"],
+                    "validation": None,
+                    "cached": True,
+                    "lessonId": await cached_lesson_id(cache_key, cached, topics, grade_level)
+                })
+                return
             
-            # Validate again
-            is_valid, new_warnings = validate_lesson(lesson_text, topics[0])
-            warnings = new_warnings  # Use the new warnings from regeneration
-        
-        logger.info("Lesson generated successfully")
-        
-        # Clean the lesson text
-        cleaned_lesson_text = clean_lesson_text(lesson_text, request.subject, topics[0])
-        
-        # Validate activity counts and fix if needed
-        sections = parse_lesson_sections(cleaned_lesson_text)
-        validation_result = validate_counts(sections, lesson_config)
-        
-        # Log initial validation results
-        logger.info(f"Initial validation: {validation_result['summary']}")
-        for act_num, act_data in validation_result['activities'].items():
-            if not act_data['match']:
-                logger.warning(f"Activity {act_num}: expected {act_data['expected']}, got {act_data['actual']}")
-        
-        # Fix mismatched activities
-        if not validation_result['ok']:
-            logger.info("Fixing mismatched activities...")
-            fixed_lesson_text = cleaned_lesson_text
+            regenerated = False
+            attempt_prompt = prompt
+            while True:
+                async for cleaned, lesson in stream_attempt(attempt_prompt, "regenerate" if regenerated else "main"):
+                    if cleaned:
+                        yield format_sse_event("token", {"text": cleaned})
+                
+                # Validate the generated lesson; regenerate once with stronger constraints
+                warnings = lesson.warnings
+                if lesson.is_valid or regenerated:
+                    break
+                logger.warning(f"Lesson validation failed: {warnings}. Regenerating with stronger constraints.")
+                yield format_sse_event("reset", {"reason": "regenerating", "warnings": warnings})
+                attempt_prompt = build_stronger_prompt(prompt, topics[0])
+                regenerated = True
+                metrics.REGENERATIONS.inc()
             
-            for act_num, act_data in validation_result['activities'].items():
-                if not act_data['match']:
-                    logger.info(f"Fixing Activity {act_num}: {act_data['actual']} -> {act_data['expected']} items")
-                    fixed_lesson_text = fix_activity_section(
-                        fixed_lesson_text, 
-                        topics[0], 
-                        act_num, 
-                        act_data['expected']
-                    )
+            cleaned_lesson_text = lesson.text
             
-            # Re-validate after fixes
-            fixed_sections = parse_lesson_sections(fixed_lesson_text)
-            final_validation = validate_counts(fixed_sections, lesson_config)
+            yield format_sse_event("status", {"stage": "validating"})
+            repaired_lesson, validation_result = await repair_lesson(lesson, topics[0], lesson_config)
+            repaired_lesson_text = repaired_lesson.text
             
-            # Log final validation results
-            logger.info(f"Final validation: {final_validation['summary']}")
-            for act_num, act_data in final_validation['activities'].items():
-                if not act_data['match']:
-                    logger.warning(f"Activity {act_num} still mismatched: expected {act_data['expected']}, got {act_data['actual']}")
-                else:
-                    logger.info(f"Activity {act_num} fixed: {act_data['actual']} items")
+            lesson_id = save_generated_lesson(topics, grade_level, repaired_lesson_text, repaired_lesson)
+            await store_cached_lesson(cache_key, repaired_lesson_text, regenerated, warnings, validation_result, lesson_id)
             
-            cleaned_lesson_text = fixed_lesson_text
+            yield format_sse_event("done", {
+                "lessonText": repaired_lesson_text,
+                "success": True,
+                "regenerated": regenerated,
+                "repaired": repaired_lesson_text != cleaned_lesson_text,
+                "warnings": warnings,
+                "validation": validation_result,
+                "cached": False,
+                "lessonId": lesson_id,
+                "timing": current_timing().stages() if current_timing() else None
+            })
         
-        # Save lesson to database (optional - you can remove this if you don't want to auto-save)
-        try:
-            lesson_id = db.save_lesson(topics, grade_level, cleaned_lesson_text)
-            logger.info(f"Lesson saved to database with ID: {lesson_id}")
-            print(f"DEBUG: Lesson saved with ID: {lesson_id}")  # Debug log
         except Exception as e:
-            logger.warning(f"Failed to save lesson to database: {e}")
-            lesson_id = None  # Set to None if save fails
-            # Don't fail the request if database save fails
-        
-        return LessonResponse(
-            lessonText=cleaned_lesson_text,
-            regenerated=regenerated,
-            warnings=warnings,
-            lessonId=lesson_id
-        )
-        
-    except HTTPException:
-        # Re-raise HTTP exceptions
-        raise
-    except Exception as e:
-        logger.error(f"Error generating lesson: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate lesson: {str(e)}")
+            logger.error(f"Error streaming lesson: {str(e)}")
+            yield format_sse_event("error", {"detail": f"Failed to generate lesson: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def process_generation_job(payload: dict, set_stage: Callable[[str], None]) -> dict:
+    """
+    Job queue handler: generate the lesson described by a queued LessonRequest payload.
+    """
+    request = LessonRequest(**payload)
+    logger.info(f"Processing generation job for grade {request.grade}, subject {request.subject}, topic {request.topic}")
+    return await produce_lesson(request, on_stage=set_stage)
+
+
+job_queue = JobQueue(process_generation_job, db.db_path, workers=JOB_WORKERS)
+
+
+def format_job_status(job: dict) -> JobStatusResponse:
+    """
+    Convert a job row from the queue into the API response model.
+    """
+    return JobStatusResponse(
+        jobId=job['id'],
+        status=job['status'],
+        stage=job['stage'],
+        result=LessonResponse(**job['result']) if job['result'] else None,
+        error=job['error'],
+        createdAt=job['created_at'],
+        updatedAt=job['updated_at']
+    )
+
+@app.post("/api/jobs", response_model=JobStatusResponse, status_code=202)
+async def create_generation_job(request: LessonRequest):
+    """
+    Queue a lesson generation job and return its ID immediately.
+    Poll GET /api/jobs/{job_id} for the stage and result.
+    """
+    # Validate up front so bad requests are rejected instead of failing later in the queue
+    prepare_lesson_request(request)
+    
+    try:
+        job_id = await job_queue.submit(request.model_dump())
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    logger.info(f"Queued generation job {job_id}")
+    return format_job_status(await job_queue.get_job(job_id))
 
-@app.get("/api/lessons", response_model=LessonsListResponse)
-async def get_lessons_list():
+@app.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_generation_job(job_id: str):
+    """
+    Get the status, current stage and (once finished) result of a generation job.
+    """
+    job = await job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job with ID {job_id} not found")
+    return format_job_status(job)
+
+@app.get("/api/lessons", response_model=LessonsListResponse, response_model_exclude_unset=True)
+async def get_lessons_list(limit: int = 20, cursor: Optional[str] = None, include_total: bool = False,
+                           grade: Optional[int] = None, topic: Optional[str] = None,
+                           date_from: Optional[str] = None, date_to: Optional[str] = None,
+                           fields: Literal["summary", "full"] = "summary"):
     """
-    Get all lessons from the database, ordered by date descending.
-    Returns a list of lesson summaries with basic information.
+    Get one page of lessons from the database, ordered by date descending.
+    Optionally filter by grade, topic and an inclusive date range (ISO dates).
+    Pass next_cursor from the response as cursor to get the next page; total
+    is only counted when include_total is true. Lesson bodies are left out
+    unless fields=full; fetch them per lesson from /api/lessons/{lesson_id}.
     """
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    
     try:
-        logger.info("Fetching all lessons from database")
-        lessons = db.list_lessons()
+        logger.info("Fetching lessons from database")
+        page = db.list_lessons_page(
+            limit=limit,
+            cursor=cursor,
+            include_total=include_total,
+            fields=fields,
+            grade=grade,
+            topic=topic,
+            date_from=date_from,
+            date_to=date_to
+        )
         
         # Convert to response format
-        lesson_summaries = [
-            LessonSummary(
-                id=lesson['id'],
-                topics=lesson['topics'],
-                grade=lesson['grade'],
-                age=lesson['age'],
-                date_generated=lesson['date_generated']
-            )
-            for lesson in lessons
-        ]
+        lesson_summaries = [LessonSummary(**lesson) for lesson in page['lessons']]
         
         return LessonsListResponse(
             lessons=lesson_summaries,
-            total=len(lesson_summaries)
+            total=page['total'],
+            next_cursor=page['next_cursor']
         )
-        
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching lessons: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch lessons: {str(e)}")
 
+@app.get("/api/lessons/search", response_model=LessonSearchResponse, response_model_exclude_unset=True)
+async def search_lessons_endpoint(q: str, limit: int = 20, fields: Literal["summary", "full"] = "summary"):
+    """
+    Full-text search over lesson topics, content and tags, best matches first.
+    Supports "exact phrases" and prefix* terms. Each result includes a snippet
+    with the matched terms in [brackets]; lesson bodies are only included
+    with fields=full.
+    """
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    
+    try:
+        logger.info(f"Searching lessons for: {q}")
+        results = db.search_lessons(q, limit=limit, fields=fields)
+        
+        lessons = [LessonSearchResult(**lesson) for lesson in results]
+        
+        return LessonSearchResponse(query=q, lessons=lessons, total=len(lessons))
+    
+    except Exception as e:
+        logger.error(f"Error searching lessons: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to search lessons: {str(e)}")
+
 @app.get("/api/lessons/{lesson_id}")
 async def get_lesson_by_id(lesson_id: int):
     """
@@ -749,7 +770,7 @@ async def get_lesson_by_id(lesson_id: int):
             raise HTTPException(status_code=404, detail=f"Lesson with ID {lesson_id} not found")
         
         return lesson
-        
+    
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
@@ -757,6 +778,63 @@ async def get_lesson_by_id(lesson_id: int):
         logger.error(f"Error fetching lesson {lesson_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch lesson: {str(e)}")
 
+@app.get("/api/lessons/{lesson_id}/activities/{number}", response_model=LessonActivity)
+async def get_lesson_activity(lesson_id: int, number: int):
+    """
+    Get one activity of a lesson with its numbered item count.
+    Returns 404 if the lesson or activity is not found.
+    """
+    try:
+        activity = db.get_activity(lesson_id, number)
+        if not activity:
+            raise HTTPException(status_code=404, detail=f"Activity {number} of lesson {lesson_id} not found")
+        return activity
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching activity {number} of lesson {lesson_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch activity: {str(e)}")
+
+@app.put("/api/lessons/{lesson_id}/activities/{number}", response_model=LessonActivity)
+async def update_lesson_activity(lesson_id: int, number: int, update: LessonActivityUpdate):
+    """
+    Replace the content of one activity of a lesson. Files rendered from the old
+    text are dropped. Returns 404 if the lesson or activity is not found.
+    """
+    try:
+        activity = db.update_activity(lesson_id, number, update.content)
+        if not activity:
+            raise HTTPException(status_code=404, detail=f"Activity {number} of lesson {lesson_id} not found")
+        await asyncio.to_thread(artifact_cache.invalidate_lesson, lesson_id)
+        logger.info(f"Updated activity {number} of lesson {lesson_id}")
+        return activity
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating activity {number} of lesson {lesson_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to update activity: {str(e)}")
+
+@app.delete("/api/lessons/{lesson_id}")
+async def delete_lesson_by_id(lesson_id: int):
+    """
+    Delete a lesson and any files rendered from it.
+    Returns 404 if lesson not found.
+    """
+    try:
+        if not db.delete_lesson(lesson_id):
+            raise HTTPException(status_code=404, detail=f"Lesson with ID {lesson_id} not found")
+        await asyncio.to_thread(artifact_cache.invalidate_lesson, lesson_id)
+        logger.info(f"Deleted lesson with ID: {lesson_id}")
+        return {"id": lesson_id, "deleted": True}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting lesson {lesson_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete lesson: {str(e)}")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
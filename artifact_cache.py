@@ -0,0 +1,150 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from database import ConnectionPool
+
+class ArtifactCache:
+    """
+    Persistent cache of rendered lesson files (e.g. DOCX downloads).
+    Entries live in the artifact_cache table (by default next to the lessons table
+    in lessons.db) and are keyed by the lesson id, a hash of the lesson text and the
+    renderer version, so a changed lesson or renderer never serves a stale file.
+    The key doubles as the strong ETag of the artifact. Eviction is
+    least-recently-used once the stored artifacts exceed max_bytes. Each thread
+    reuses one connection, so callers on an event loop can run the methods (which
+    all write) in a worker thread.
+    """
+    
+    def __init__(self, db_path: str = "lessons.db", max_bytes: int = 64 * 1024 * 1024):
+        """Initialize the artifact cache"""
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._pool = ConnectionPool(db_path)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "stores": 0, "invalidations": 0}
+        self.init_cache()
+    
+    def init_cache(self):
+        """Create the artifact_cache table if it doesn't exist"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS artifact_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    lesson_id INTEGER NOT NULL,
+                    content BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_artifact_cache_lesson
+                ON artifact_cache (lesson_id)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_artifact_cache_last_accessed
+                ON artifact_cache (last_accessed)
+            ''')
+            conn.commit()
+    
+    def _connect(self) -> sqlite3.Connection:
+        return self._pool.connect()
+    
+    def close(self):
+        """Close every connection opened by this cache"""
+        self._pool.close()
+    
+    @staticmethod
+    def make_key(lesson_id: int, text_hash: str, renderer_version: str) -> str:
+        """Build the cache key (and ETag value) for one rendering of a lesson"""
+        material = f"{lesson_id}:{text_hash}:{renderer_version}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+    
+    def get(self, cache_key: str) -> Optional[bytes]:
+        """Return the cached artifact for a key, or None on a miss"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT content FROM artifact_cache WHERE cache_key = ?', (cache_key,))
+            row = cursor.fetchone()
+            
+            if row is None:
+                self._count("misses")
+                return None
+            
+            cursor.execute('''
+                UPDATE artifact_cache SET last_accessed = ?, hit_count = hit_count + 1
+                WHERE cache_key = ?
+            ''', (time.time(), cache_key))
+            conn.commit()
+        
+        self._count("hits")
+        return row[0]
+    
+    def set(self, cache_key: str, lesson_id: int, content: bytes):
+        """Store an artifact and evict the least recently used ones beyond max_bytes"""
+        if len(content) > self.max_bytes:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO artifact_cache
+                    (cache_key, lesson_id, content, size, created_at, last_accessed, hit_count)
+                VALUES (?, ?, ?, ?, ?, ?, 0)
+            ''', (cache_key, lesson_id, content, len(content), now, now))
+            
+            # Keep the most recently used artifacts that fit in max_bytes
+            cursor.execute('''
+                DELETE FROM artifact_cache WHERE cache_key IN (
+                    SELECT cache_key FROM (
+                        SELECT cache_key, SUM(size) OVER (
+                            ORDER BY last_accessed DESC, cache_key
+                        ) AS running_size
+                        FROM artifact_cache
+                    ) WHERE running_size > ?
+                )
+            ''', (self.max_bytes,))
+            self._count("evictions", cursor.rowcount)
+            conn.commit()
+        self._count("stores")
+    
+    def invalidate_lesson(self, lesson_id: int) -> int:
+        """Remove every artifact rendered from a lesson. Returns how many were removed."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM artifact_cache WHERE lesson_id = ?', (lesson_id,))
+            conn.commit()
+            removed = cursor.rowcount
+        self._count("invalidations", removed)
+        return removed
+    
+    def clear(self):
+        """Remove every cached artifact"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM artifact_cache')
+            conn.commit()
+    
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current number and size of artifacts"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifact_cache')
+            entries, size = cursor.fetchone()
+        
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        counters["entries"] = entries
+        counters["bytes"] = size
+        counters["max_bytes"] = self.max_bytes
+        return counters
+    
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
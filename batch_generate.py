@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from prompt_builder import build_grammar_lesson_prompt
+from openai_client import rate_limiter, track_token_usage
+from rate_limiter import BATCH, priority_scope
+from lesson_pipeline import generate_validated_lesson
+from database import LessonDatabase
+from generate_lesson import load_grade_topics
+
+logger = logging.getLogger(__name__)
+
+def build_batch_jobs(grade_topics: Dict[str, List[str]], grades: Optional[List[int]] = None) -> List[Tuple[int, str]]:
+    """List the (grade, topic) pairs to generate, for the given grades or every grade"""
+    selected = [str(grade) for grade in grades] if grades else sorted(grade_topics, key=int)
+    jobs = []
+    for grade in selected:
+        for topic in grade_topics.get(grade, []):
+            jobs.append((int(grade), topic.strip()))
+    return jobs
+
+async def run_batch(jobs: List[Tuple[int, str]], db: LessonDatabase, subject: str = "Grammar",
+                    questions_per_section: int = 6, concurrency: int = 4,
+                    tokens_per_minute: int = 40000) -> Dict:
+    """
+    Generate a lesson for every (grade, topic) job that is not already stored.
+    Each finished lesson is saved immediately, so an interrupted run can simply be
+    started again. Calls go through the shared rate limiter at batch priority,
+    budgeted to tokens_per_minute. Returns a summary with counts and throughput.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    rate_limiter.configure(tokens_per_minute=tokens_per_minute)
+    summary = {"total": len(jobs), "generated": 0, "skipped": 0, "failed": 0, "tokens": 0}
+    start = time.perf_counter()
+    
+    async def generate_one(grade: int, topic: str):
+        if db.has_lesson([topic], grade):
+            summary["skipped"] += 1
+            return
+        
+        lesson_config = {
+            "grade_level": grade,
+            "section_a_questions": questions_per_section,
+            "section_b_questions": questions_per_section,
+            "section_c_questions": questions_per_section,
+            "section_d_questions": questions_per_section
+        }
+        prompt = build_grammar_lesson_prompt(topic, lesson_config)
+        
+        async with semaphore:
+            try:
+                with priority_scope(BATCH), track_token_usage() as usage:
+                    result = await generate_validated_lesson(prompt, subject, [topic], lesson_config)
+                lesson_id = db.save_lesson([topic], grade, result["lessonText"], tags=["batch"], lesson=result["lesson"])
+            except Exception as e:
+                summary["failed"] += 1
+                logger.error(f"Batch generation failed for grade {grade}, topic {topic}: {str(e)}")
+                print(f"❌ Grade {grade} — {topic}: {e}")
+                return
+        
+        summary["generated"] += 1
+        summary["tokens"] += usage["total_tokens"]
+        print(f"✅ Grade {grade} — {topic} (ID {lesson_id}, {usage['total_tokens']} tokens)")
+    
+    await asyncio.gather(*(generate_one(grade, topic) for grade, topic in jobs))
+    
+    elapsed = time.perf_counter() - start
+    minutes = elapsed / 60 if elapsed > 0 else 1
+    summary["elapsed_seconds"] = round(elapsed, 2)
+    summary["lessons_per_minute"] = round(summary["generated"] / minutes, 2)
+    summary["tokens_per_minute"] = round(summary["tokens"] / minutes, 1)
+    return summary
+
+def print_summary(summary: Dict):
+    """Print the batch results and throughput"""
+    print("\n📊 Batch generation summary")
+    print("=" * 50)
+    print(f"Lessons requested:  {summary['total']}")
+    print(f"Generated:          {summary['generated']}")
+    print(f"Skipped (stored):   {summary['skipped']}")
+    print(f"Failed:             {summary['failed']}")
+    print(f"Elapsed:            {summary['elapsed_seconds']}s")
+    print(f"Throughput:         {summary['lessons_per_minute']} lessons/min, {summary['tokens_per_minute']} tokens/min")
+    print("=" * 50)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pre-generate curriculum lessons in bulk from grade_topics.json",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python batch_generate.py --grade 3  # Every topic for grade 3
+  python batch_generate.py --grade 1 2 --concurrency 8 --tokens-per-minute 80000
+  python batch_generate.py --all-grades  # Every topic for every grade
+
+Lessons that are already stored for a grade and topic are skipped, so an
+interrupted run can be resumed by running the same command again.
+        """
+    )
+    
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--grade", type=int, nargs="+", help="Grade level(s) to generate")
+    target.add_argument("--all-grades", action="store_true", help="Generate every grade in grade_topics.json")
+    
+    parser.add_argument("--subject", default="Grammar", help="Subject used in lesson titles (default: Grammar)")
+    parser.add_argument("--questions-per-section", type=int, default=6, help="Questions per activity (default: 6)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Lessons generated at the same time (default: 4)")
+    parser.add_argument("--tokens-per-minute", type=int, default=40000, help="Token budget per minute (default: 40000)")
+    parser.add_argument("--topics-file", help="Path to grade_topics.json (default: the frontend's copy)")
+    parser.add_argument("--db", default="lessons.db", help="SQLite database path (default: lessons.db)")
+    
+    args = parser.parse_args()
+    
+    grade_topics = load_grade_topics(args.topics_file)
+    if not grade_topics:
+        print("No curriculum topics available. Exiting.")
+        return
+    
+    jobs = build_batch_jobs(grade_topics, None if args.all_grades else args.grade)
+    if not jobs:
+        print("No topics found for the selected grade(s).")
+        return
+    
+    print(f"Generating up to {len(jobs)} lesson(s) with concurrency {args.concurrency} "
+          f"and {args.tokens_per_minute} tokens/min...")
+    
+    db = LessonDatabase(args.db)
+    summary = asyncio.run(run_batch(
+        jobs,
+        db,
+        subject=args.subject,
+        questions_per_section=args.questions_per_section,
+        concurrency=args.concurrency,
+        tokens_per_minute=args.tokens_per_minute
+    ))
+    print_summary(summary)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
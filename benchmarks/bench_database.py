@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark LessonDatabase operations with per-call connections (the old
+behaviour: a new connection per method call, default rollback journal) against
+the persistent, WAL-tuned per-thread connections.
+
+    python benchmarks/bench_database.py --rows 2000 --ops 2000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import LessonDatabase, register_functions
+
+SAMPLE_TEXT = "Grammar — Nouns\n\nA noun names a person, place or thing.\n\n" + "\n".join(
+    f"{n}. Underline the noun in sentence {n}." for n in range(1, 25)
+)
+
+class PerCallConnectionDatabase(LessonDatabase):
+    """LessonDatabase as it was: a fresh, untuned connection for every call"""
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        register_functions(conn)
+        return conn
+
+def ops_per_second(fn, ops: int) -> float:
+    start = time.perf_counter()
+    for n in range(ops):
+        fn(n)
+    return ops / (time.perf_counter() - start)
+
+def run(db: LessonDatabase, rows: int, ops: int) -> dict:
+    """Seed the database, then time save_lesson, get_lesson and list_lessons"""
+    ids = [db.save_lesson(["Nouns"], 1 + n % 8, SAMPLE_TEXT) for n in range(rows)]
+    return {
+        "save_lesson": ops_per_second(lambda n: db.save_lesson(["Verbs"], 3, SAMPLE_TEXT), ops),
+        "get_lesson": ops_per_second(lambda n: db.get_lesson(ids[n % len(ids)]), ops),
+        "list_lessons": ops_per_second(lambda n: db.list_lessons(), max(1, ops // 100))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LessonDatabase connection handling")
+    parser.add_argument("--rows", type=int, default=2000, help="Lessons stored before timing (default: 2000)")
+    parser.add_argument("--ops", type=int, default=2000, help="Operations timed per method (default: 2000)")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        before = run(PerCallConnectionDatabase(os.path.join(tmp_dir, "before.db")), args.rows, args.ops)
+        pooled = LessonDatabase(os.path.join(tmp_dir, "after.db"))
+        after = run(pooled, args.rows, args.ops)
+        pooled.close()
+    
+    print(f"{'Operation':<14} {'Before (ops/s)':>15} {'After (ops/s)':>15} {'Speedup':>8}")
+    print("=" * 55)
+    for name in before:
+        print(f"{name:<14} {before[name]:>15.1f} {after[name]:>15.1f} {after[name] / before[name]:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
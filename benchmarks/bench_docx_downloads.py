@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent DOCX downloads with rendering inline on the event loop (the
+old behaviour) against rendering in the warmed process pool. While the downloads
+run, a probe keeps calling /health to show how long other requests wait.
+
+    python benchmarks/bench_docx_downloads.py --downloads 40
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+SAMPLE_TEXT = "Grammar — Nouns\n\nRule Explanation:\nA noun names a person, place or thing.\n\n" + "\n".join(
+    f"{n}. Underline the noun in **sentence** {n}.\n\n" for n in range(1, 41)
+)
+
+PROBE_INTERVAL = 0.005
+
+class InlineRenderPool:
+    """Render pool stand-in that renders on the event loop, as downloads used to"""
+    
+    async def render(self, lesson, grade, topics, wait_for_slot=False):
+        from docx_renderer import render_docx
+        return render_docx(lesson, grade, topics)
+
+async def asgi_get(app, path: str) -> float:
+    """Send one GET through the ASGI app and return its latency in seconds"""
+    start = time.perf_counter()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("bench", 1), "server": ("bench", 80)
+    }
+    status = {}
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+    
+    await app(scope, receive, send)
+    assert status["code"] == 200, f"{path} returned {status['code']}"
+    return time.perf_counter() - start
+
+async def run(app_module, lesson_ids, concurrency: int) -> dict:
+    """Download every lesson (cache cleared) with limited concurrency while probing /health"""
+    app_module.artifact_cache.clear()
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+    probes = []
+    
+    async def download(lesson_id):
+        # Every download is requested at the start, so latency includes queueing
+        async with semaphore:
+            await asgi_get(app_module.app, f"/api/lessons/{lesson_id}/docx")
+        return time.perf_counter() - start
+    
+    async def probe():
+        # Time from when a /health request is due until it has been answered
+        while not done.is_set():
+            due = time.perf_counter() + PROBE_INTERVAL
+            await asyncio.sleep(PROBE_INTERVAL)
+            await asgi_get(app_module.app, "/health")
+            probes.append(time.perf_counter() - due)
+    
+    start = time.perf_counter()
+    prober = asyncio.create_task(probe())
+    latencies = await asyncio.gather(*(download(lesson_id) for lesson_id in lesson_ids))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await prober
+    
+    def percentile(values, fraction):
+        return sorted(values)[min(len(values) - 1, int(len(values) * fraction))] * 1000
+    
+    return {
+        "total_s": elapsed,
+        "download_p50_ms": percentile(latencies, 0.5),
+        "download_p95_ms": percentile(latencies, 0.95),
+        "health_p50_ms": percentile(probes, 0.5),
+        "health_p95_ms": percentile(probes, 0.95),
+        "health_max_ms": max(probes) * 1000,
+        "health_answered": len(probes)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent DOCX downloads")
+    parser.add_argument("--downloads", type=int, default=40, help="Distinct lessons downloaded (default: 40)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Downloads in flight at once (default: 8)")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)  # app.py opens lessons.db in the working directory
+        import app as app_module
+        
+        lesson_ids = [app_module.db.save_lesson(["Nouns"], 3, f"{SAMPLE_TEXT}\n{n}") for n in range(args.downloads)]
+        pool = app_module.render_pool
+        
+        app_module.render_pool = InlineRenderPool()
+        before = asyncio.run(run(app_module, lesson_ids, args.concurrency))
+        
+        app_module.render_pool = pool
+        for warmup in pool.start():
+            warmup.result()
+        after = asyncio.run(run(app_module, lesson_ids, args.concurrency))
+        pool.shutdown()
+        app_module.db.close()
+    
+    print(f"{args.downloads} downloads, {args.concurrency} concurrent, {pool.workers} render workers\n")
+    print(f"{'Metric':<18} {'Inline':>10} {'Pool':>10}")
+    print("=" * 40)
+    for name in before:
+        print(f"{name:<18} {before[name]:>10.1f} {after[name]:>10.1f}")
+
+if __name__ == "__main__":
+    main()
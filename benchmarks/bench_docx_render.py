@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of DOCX rendering: the original python-docx renderer, which builds
+every worksheet from Document(), against the pre-built worksheet template. Also
+checks that both produce the same paragraphs, styles and run formatting.
+    
+    python benchmarks/bench_docx_render.py --renders 200
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.shared import Inches
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+from docx_renderer import get_template, parse_worksheet
+
+SAMPLE_TEXT = "\n".join(
+    ["Grammar — Nouns", "", "Rule Explanation:", "A **noun** names a person, place or thing.", "",
+     "Instructions: Underline the noun in each sentence.", "- Common nouns", "- Proper nouns", ""]
+    + [line for n in range(1, 4) for line in
+       [f"Activity {n}", ""] + [f"{item}. The dog number {item} ran to the park." for item in range(1, 9)] + ["", ""]]
+    + ["Write a sentence using two nouns.", "", "", "THE END"]
+)
+
+def create_docx_legacy(lesson_text: str, grade: int, topics: List[str]) -> BytesIO:
+    """
+    The renderer as it was: a fresh Document() and the header rebuilt for every render.
+    """
+    doc = Document()
+    
+    # Set up document margins
+    sections = doc.sections
+    for section in sections:
+        section.top_margin = Inches(1)
+        section.bottom_margin = Inches(1)
+        section.left_margin = Inches(1)
+        section.right_margin = Inches(1)
+    
+    # Add header
+    header = doc.add_heading('Coding Cat Club', 0)
+    header.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    # Add grade and topic info
+    topic_text = ', '.join(topics)
+    grade_topic = doc.add_paragraph(f'Grade {grade} — Topic: {topic_text}')
+    grade_topic.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    # Add Name and Date lines
+    name_date = doc.add_paragraph()
+    name_date.add_run('Name: ').bold = True
+    name_date.add_run('_' * 30)
+    name_date.add_run('    Date: ').bold = True
+    name_date.add_run('_' * 30)
+    
+    # Add title
+    title = doc.add_heading('Lesson Worksheet', level=1)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    # Process lesson text line by line
+    lines = lesson_text.split('\n')
+    i = 0
+    
+    # Skip the first line if it's the subject-topic title (already handled in header)
+    if lines and ' — ' in lines[0]:
+        i = 2  # Skip title and empty line
+    
+    while i < len(lines):
+        line = lines[i].strip()
+        
+        if not line:
+            # Empty line - add paragraph break
+            doc.add_paragraph()
+            i += 1
+            continue
+        
+        # Check for section headers (previously bold text, now plain text)
+        # Look for lines that are likely section headers (all caps, short, or end with colon)
+        if (line.isupper() and len(line) < 50) or line.endswith(':') and len(line) < 100:
+            # Section header
+            doc.add_heading(line, level=2)
+            i += 1
+            continue
+        
+        # Check for numbered lists
+        numbered_match = re.match(r'^(\d+)\.\s*(.+)$', line)
+        if numbered_match:
+            # Start numbered list
+            list_items = []
+            while i < len(lines) and re.match(r'^\d+\.\s*(.+)$', lines[i].strip()):
+                match = re.match(r'^\d+\.\s*(.+)$', lines[i].strip())
+                if match:
+                    list_items.append(match.group(1))
+                i += 1
+            
+            # Add numbered list with manual numbering (restarts at 1 for each block)
+            for idx, item in enumerate(list_items, 1):
+                p = doc.add_paragraph(f"{idx}. {item}")
+                # Check if next line is an answer line
+                if i < len(lines) and lines[i].strip() == '':
+                    i += 1
+                    if i < len(lines) and lines[i].strip() == '':
+                        # Add answer line
+                        answer_p = doc.add_paragraph()
+                        answer_run = answer_p.add_run('_' * 50)
+                        answer_run.underline = True
+                        i += 1
+            continue
+        
+        # Check for bullet points
+        bullet_match = re.match(r'^[-•]\s*(.+)$', line)
+        if bullet_match:
+            # Start bullet list
+            list_items = []
+            while i < len(lines) and re.match(r'^[-•]\s*(.+)$', lines[i].strip()):
+                match = re.match(r'^[-•]\s*(.+)$', lines[i].strip())
+                if match:
+                    list_items.append(match.group(1))
+                i += 1
+            
+            # Add bullet list
+            for item in list_items:
+                doc.add_paragraph(item, style='List Bullet')
+            continue
+        
+        # Check for instructions
+        if line.startswith('Instructions:'):
+            p = doc.add_paragraph()
+            p.add_run('Instructions: ').bold = True
+            p.add_run(line.replace('Instructions:', '').strip()).italic = True
+            i += 1
+            continue
+        
+        # Regular paragraph with markdown processing
+        p = doc.add_paragraph()
+        
+        # Process bold text within the line
+        parts = re.split(r'(\*\*.*?\*\*)', line)
+        for part in parts:
+            if part.startswith('**') and part.endswith('**'):
+                # Bold text
+                run = p.add_run(part.replace('**', ''))
+                run.bold = True
+            else:
+                # Regular text
+                p.add_run(part)
+        
+        # Check if next line should be an answer line
+        if i + 1 < len(lines) and lines[i + 1].strip() == '':
+            i += 1
+            if i + 1 < len(lines) and lines[i + 1].strip() == '':
+                # Add answer line
+                answer_p = doc.add_paragraph()
+                answer_run = answer_p.add_run('_' * 50)
+                answer_run.underline = True
+                i += 1
+        
+        i += 1
+    
+    # Save to BytesIO
+    docx_buffer = BytesIO()
+    doc.save(docx_buffer)
+    docx_buffer.seek(0)
+    return docx_buffer
+
+def render_template(lesson_text: str, grade: int, topics: List[str]) -> bytes:
+    """The template renderer, fed the same scan of the whole text as the legacy build"""
+    return get_template().render(grade, topics, parse_worksheet(lesson_text))
+
+def document_outline(content: bytes) -> List[tuple]:
+    """Paragraph styles, text and non-empty run formatting, for comparing renders"""
+    doc = Document(BytesIO(content))
+    outline = [(section.top_margin, section.left_margin) for section in doc.sections]
+    for paragraph in doc.paragraphs:
+        runs = [(run.text, bool(run.bold), bool(run.italic), bool(run.underline)) for run in paragraph.runs if run.text]
+        outline.append((paragraph.style.name, paragraph.alignment, paragraph.text, runs))
+    return outline
+
+def measure(render, renders: int) -> dict:
+    """Mean time and peak allocations per render"""
+    render()  # warm up (builds the template / loads python-docx's default template)
+    start = time.perf_counter()
+    for _ in range(renders):
+        render()
+    elapsed = time.perf_counter() - start
+    
+    tracemalloc.start()
+    render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms_per_render": elapsed / renders * 1000, "peak_alloc_kb": peak / 1024}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DOCX rendering")
+    parser.add_argument("--renders", type=int, default=200, help="Renders timed per renderer (default: 200)")
+    args = parser.parse_args()
+    
+    legacy = create_docx_legacy(SAMPLE_TEXT, 3, ["Nouns"]).getvalue()
+    templated = render_template(SAMPLE_TEXT, 3, ["Nouns"])
+    assert document_outline(legacy) == document_outline(templated), "Renderers disagree on document structure"
+    print("✅ Both renderers produce the same document structure\n")
+    
+    get_template()
+    before = measure(lambda: create_docx_legacy(SAMPLE_TEXT, 3, ["Nouns"]), args.renders)
+    after = measure(lambda: render_template(SAMPLE_TEXT, 3, ["Nouns"]), args.renders)
+    
+    print(f"{'Metric':<16} {'Document()':>12} {'Template':>12} {'Change':>8}")
+    print("=" * 51)
+    for name in before:
+        print(f"{name:<16} {before[name]:>12.2f} {after[name]:>12.2f} {before[name] / after[name]:>7.1f}x")
+    print(f"\nOutput size: {len(legacy)} bytes before, {len(templated)} bytes after")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the hot paths: lesson text post-processing, DOCX rendering
+and every LessonDatabase method, run on synthetic lesson corpora without the
+network. Results can be saved as JSON and compared against a saved baseline;
+the comparison exits with status 1 when a benchmark slowed down by more than
+the threshold.
+
+    python benchmarks/bench_suite.py --json baseline.json
+    python benchmarks/bench_suite.py --compare baseline.json --threshold 0.15
+    python benchmarks/bench_suite.py --filter db. --sizes small --json -
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from database import LessonDatabase
+from docx_renderer import create_docx_from_lesson
+from lesson_corpus import CORPUS_SIZES, NOUNS, lesson_config, make_corpus
+from lesson_pipeline import clean_lesson_text, parse_lesson_sections, validate_counts, validate_lesson
+from lesson_parser import tokenize_lesson
+
+SUBJECT = "Grammar"
+TOPIC = "Nouns"
+TOPICS = ["Nouns", "Verbs", "Adjectives", "Pronouns", "Adverbs", "Prepositions"]
+
+# Distinct lessons each text benchmark cycles through
+CORPUS_LESSONS = 50
+# Calls timed by benchmarks that consume prepared state (deletes, inserts)
+FIXED_ITERATIONS = 200
+MAX_ITERATIONS = 100000
+
+class Benchmark:
+    """A named operation; iterations is fixed for operations that use up prepared state"""
+    
+    def __init__(self, name: str, fn: Callable[[], object], iterations: Optional[int] = None):
+        self.name = name
+        self.fn = fn
+        self.iterations = iterations
+
+def cycling(items: List) -> Callable[[], object]:
+    """Return a function handing out items round-robin"""
+    iterator = itertools.cycle(items)
+    return lambda: next(iterator)
+
+def calibrate(fn: Callable[[], object], min_time: float) -> int:
+    """Smallest power-of-two call count that takes at least min_time seconds"""
+    iterations = 1
+    while iterations < MAX_ITERATIONS:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        if time.perf_counter() - start >= min_time:
+            break
+        iterations *= 2
+    return iterations
+
+def run_benchmark(benchmark: Benchmark, repeats: int, min_time: float) -> Dict:
+    """Time a benchmark and return per-call microseconds over the repeats"""
+    fn = benchmark.fn
+    fn()  # warm up (imports, templates, statement cache)
+    iterations = benchmark.iterations or calibrate(fn, min_time)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - start) / iterations * 1e6)
+    return {
+        "median_us": statistics.median(samples),
+        "min_us": min(samples),
+        "max_us": max(samples),
+        "iterations": iterations,
+        "repeats": repeats
+    }
+
+def text_benchmarks(size: str) -> List[Benchmark]:
+    """Lesson post-processing and rendering on one corpus size"""
+    raw_lessons = make_corpus(size, CORPUS_LESSONS)
+    cleaned_lessons = [clean_lesson_text(text, SUBJECT, TOPIC) for text in raw_lessons]
+    sections = [parse_lesson_sections(text) for text in cleaned_lessons]
+    config = lesson_config(size)
+    
+    next_raw, next_cleaned, next_sections = cycling(raw_lessons), cycling(cleaned_lessons), cycling(sections)
+    next_raw_for_validation, next_raw_for_tokenizer = cycling(raw_lessons), cycling(raw_lessons)
+    next_cleaned_for_docx = cycling(cleaned_lessons)
+    return [
+        Benchmark(f"text.clean_lesson_text[{size}]", lambda: clean_lesson_text(next_raw(), SUBJECT, TOPIC)),
+        Benchmark(f"text.parse_lesson_sections[{size}]", lambda: parse_lesson_sections(next_cleaned())),
+        Benchmark(f"text.validate_counts[{size}]", lambda: validate_counts(next_sections(), config)),
+        Benchmark(f"text.validate_lesson[{size}]", lambda: validate_lesson(next_raw_for_validation(), TOPIC)),
+        Benchmark(f"text.tokenize_lesson[{size}]", lambda: tokenize_lesson(next_raw_for_tokenizer(), SUBJECT, TOPIC)),
+        Benchmark(f"docx.create_docx_from_lesson[{size}]",
+                  lambda: create_docx_from_lesson(next_cleaned_for_docx(), 3, [TOPIC])),
+    ]
+
+class DatabaseFixture:
+    """A LessonDatabase filled with medium lessons, and a benchmark for each of its methods"""
+    
+    def __init__(self, db: LessonDatabase):
+        self.db = db
+        self.texts = [clean_lesson_text(text, SUBJECT, TOPIC) for text in make_corpus("medium", CORPUS_LESSONS)]
+    
+    def fill(self, rows: int, repeats: int):
+        """Store `rows` lessons, plus one per timed call for the benchmark that deletes them"""
+        rng = random.Random(0)
+        self.lesson_ids = [
+            self.db.save_lesson([TOPICS[n % len(TOPICS)]], 1 + n % 6, self.texts[n % len(self.texts)], tags=["benchmark"])
+            for n in range(rows)
+        ]
+        self.next_id = cycling(rng.sample(self.lesson_ids, min(rows, 500)))
+        self.id_batch = rng.sample(self.lesson_ids, min(rows, 50))
+        self.cursor = self.db.list_lessons_page(limit=20)["next_cursor"]
+        self.deletable = iter([
+            self.db.save_lesson([TOPIC], 3, text)
+            for text in itertools.islice(itertools.cycle(self.texts), FIXED_ITERATIONS * repeats + 1)
+        ])
+        self.next_text = cycling(self.texts)
+        self.next_word = cycling(NOUNS)
+        self.next_edit = cycling(["1. The dog ran.\n2. The cat sat.", "1. The bird sang."])
+    
+    def benchmarks(self) -> List[Benchmark]:
+        db = self.db
+        return [
+            Benchmark("db.save_lesson", lambda: db.save_lesson([TOPIC], 3, self.next_text()), FIXED_ITERATIONS),
+            Benchmark("db.get_lesson", lambda: db.get_lesson(self.next_id())),
+            Benchmark("db.has_lesson", lambda: db.has_lesson([TOPIC], 3)),
+            Benchmark("db.get_existing_ids", lambda: db.get_existing_ids(self.id_batch)),
+            Benchmark("db.list_lessons", lambda: db.list_lessons(limit=20)),
+            Benchmark("db.list_lessons_page", lambda: db.list_lessons_page(limit=20, cursor=self.cursor, include_total=True)),
+            Benchmark("db.find_lessons", lambda: db.find_lessons(grade=3, topic="nouns", limit=20)),
+            Benchmark("db.count_lessons", lambda: db.count_lessons(grade=3)),
+            Benchmark("db.get_topic_counts", lambda: db.get_topic_counts()),
+            Benchmark("db.search_lessons", lambda: db.search_lessons(self.next_word(), limit=20)),
+            Benchmark("db.get_activity", lambda: db.get_activity(self.next_id(), 2)),
+            Benchmark("db.get_activity_counts", lambda: db.get_activity_counts(self.next_id())),
+            Benchmark("db.update_activity", lambda: db.update_activity(self.lesson_ids[0], 2, self.next_edit()),
+                      FIXED_ITERATIONS),
+            Benchmark("db.delete_lesson", lambda: db.delete_lesson(next(self.deletable)), FIXED_ITERATIONS),
+            Benchmark("db.get_storage_stats", lambda: db.get_storage_stats()),
+            Benchmark("db.get_lesson_count", lambda: db.get_lesson_count()),
+        ]
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: Dict, baseline: Dict, threshold: float, metric: str, out) -> List[str]:
+    """Print the change against a baseline and return the names of regressed benchmarks"""
+    regressions = []
+    print(f"\n{'Benchmark':<40} {'Baseline':>11} {'Current':>11} {'Change':>9}", file=out)
+    print("=" * 74, file=out)
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<40} {'-':>11} {result[metric]:>11.1f} {'new':>9}", file=out)
+            continue
+        before, after = baseline[name][metric], result[metric]
+        change = after / before - 1 if before else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<40} {before:>11.1f} {after:>11.1f} {change:>+8.1%}{flag}", file=out)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lesson pipeline, DOCX rendering and database")
+    parser.add_argument("--sizes", default=",".join(CORPUS_SIZES),
+                        help=f"Corpus sizes for the text benchmarks (default: {','.join(CORPUS_SIZES)})")
+    parser.add_argument("--rows", type=int, default=1000, help="Lessons stored before the database benchmarks (default: 1000)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repeats per benchmark (default: 5)")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="Minimum seconds per repeat, used to pick the call count (default: 0.05)")
+    parser.add_argument("--filter", action="append", default=[], help="Only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--json", metavar="PATH", help="Write results as JSON to PATH ('-' for stdout)")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a JSON baseline and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Allowed slowdown before a benchmark counts as regressed (default: 0.15 = 15%%)")
+    parser.add_argument("--metric", choices=["median_us", "min_us"], default="median_us",
+                        help="Statistic compared against the baseline (default: median_us)")
+    args = parser.parse_args()
+    
+    # Keep stdout clean for the JSON when it goes there
+    out = sys.stderr if args.json == "-" else sys.stdout
+    sizes = [size for size in args.sizes.split(",") if size]
+    for size in sizes:
+        if size not in CORPUS_SIZES:
+            parser.error(f"Unknown corpus size: {size}")
+    
+    def selected(benchmarks: List[Benchmark]) -> List[Benchmark]:
+        if not args.filter:
+            return benchmarks
+        return [benchmark for benchmark in benchmarks if any(part in benchmark.name for part in args.filter)]
+    
+    results = {}
+    print(f"{'Benchmark':<40} {'Median (us)':>12} {'Min (us)':>10} {'Calls':>7}", file=out)
+    print("=" * 72, file=out)
+    
+    def run_all(benchmarks: List[Benchmark]):
+        for benchmark in selected(benchmarks):
+            result = run_benchmark(benchmark, args.repeats, args.min_time)
+            results[benchmark.name] = result
+            print(f"{benchmark.name:<40} {result['median_us']:>12.1f} {result['min_us']:>10.1f} {result['iterations']:>7}",
+                  file=out, flush=True)
+    
+    for size in sizes:
+        run_all(text_benchmarks(size))
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = LessonDatabase(os.path.join(tmp_dir, "bench.db"))
+        try:
+            fixture = DatabaseFixture(db)
+            if selected(fixture.benchmarks()):
+                fixture.fill(args.rows, args.repeats)
+                run_all(fixture.benchmarks())
+        finally:
+            db.close()
+    
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "sizes": sizes,
+            "rows": args.rows,
+            "repeats": args.repeats,
+            "min_time": args.min_time
+        },
+        "results": results
+    }
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}", file=out)
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold, args.metric, out)
+        if regressions:
+            print(f"\n❌ {len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}: "
+                  f"{', '.join(regressions)}", file=out)
+            sys.exit(1)
+        print(f"\n✅ No benchmark slower than the baseline by more than {args.threshold:.0%}", file=out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Synthetic lessons shaped like raw model output (markdown, "Rule Heading",
+# "Activity Section A" headers, bullets), for benchmarks that must not call the
+# network. Texts are generated from a seed, so runs are repeatable.
+
+import random
+from typing import Dict, List
+
+NOUNS = ["dog", "cat", "teacher", "river", "city", "apple", "book", "bird", "garden", "train",
+         "friend", "school", "pencil", "mountain", "library", "kitten", "bridge", "island"]
+VERBS = ["ran", "sat", "jumped", "sang", "read", "painted", "climbed", "found", "carried", "watched"]
+ADJECTIVES = ["happy", "tall", "quiet", "bright", "small", "brave", "shiny", "busy"]
+
+# name -> (items per activity, explanation lines)
+CORPUS_SIZES = {
+    "small": (4, 3),
+    "medium": (8, 8),
+    "large": (25, 30),
+}
+
+def make_sentence(rng: random.Random) -> str:
+    return f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(VERBS)} to the {rng.choice(NOUNS)}."
+
+def make_raw_lesson(rng: random.Random, topic: str = "Nouns", items: int = 8, explanation_lines: int = 8,
+                    short_activities: int = 0) -> str:
+    """
+    One raw lesson with four activities of `items` numbered questions each.
+    The first `short_activities` activities are missing two items, as model
+    output sometimes is, so count validation fails for them.
+    """
+    lines = [f"**{topic}**", "", "Rule Heading"]
+    lines += [f"A **{topic.lower()}** is used here: _{make_sentence(rng)}_" for _ in range(explanation_lines)]
+    lines += ["## Examples", f"- {rng.choice(NOUNS)}", f"• {rng.choice(NOUNS)}", "", ""]
+    for index, letter in enumerate("ABCD"):
+        count = max(1, items - 2) if index < short_activities else items
+        lines += [f"**Activity Section {letter}**", f"Instructions: Underline the {topic.lower()} in each sentence."]
+        lines += [f"{n}. {make_sentence(rng)}" for n in range(1, count + 1)]
+        lines += ["", ""]
+    return "\n".join(lines)
+
+def make_corpus(size: str = "medium", count: int = 50, seed: int = 0, short_activities: int = 0) -> List[str]:
+    """`count` distinct raw lessons of the given CORPUS_SIZES entry"""
+    items, explanation_lines = CORPUS_SIZES[size]
+    rng = random.Random(f"{size}-{seed}")
+    return [make_raw_lesson(rng, items=items, explanation_lines=explanation_lines,
+                            short_activities=short_activities) for _ in range(count)]
+
+def lesson_config(size: str) -> Dict[str, int]:
+    """The generation config whose activity counts a CORPUS_SIZES lesson matches"""
+    items, _ = CORPUS_SIZES[size]
+    return {f"section_{section}_questions": items for section in "abcd"}
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Load-test the API end to end against the fake OpenAI backend (fake_openai.py),
+so no tokens are spent. Workers drive the ASGI app in-process at the target
+concurrency with a weighted mix of endpoints, and the report gives throughput,
+error counts and p50/p95/p99 latency per endpoint.
+    
+    python benchmarks/load_test.py --concurrency 16 --duration 30
+    python benchmarks/load_test.py --requests 500 --latency lognormal:0.8,0.6 \\
+        --short-rate 0.3 --malformed-rate 0.1 --error-rate 0.05 --json load.json
+
+The fake backend's behaviour can also be set with the FAKE_OPENAI_* variables
+(see fake_openai.FakeBackend.from_env); flags take precedence.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TOPICS = ["Nouns", "Verbs", "Adjectives", "Adverbs", "Pronouns", "Prepositions", "Conjunctions", "Commas"]
+
+ENDPOINTS = {
+    "generate": "POST /api/generate-lesson",
+    "stream": "POST /api/generate-lesson/stream",
+    "list": "GET /api/lessons",
+    "get": "GET /api/lessons/{id}",
+    "docx": "GET /api/lessons/{id}/docx",
+    "search": "GET /api/lessons/search"
+}
+
+DEFAULT_MIX = "generate=3,stream=1,list=3,get=3,docx=1,search=2"
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    """Parse "name=weight,..." into endpoint weights"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {name!r}; choose from {', '.join(ENDPOINTS)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+async def asgi_request(app, method: str, path: str, query: str = "", body: Optional[dict] = None) -> Tuple[int, bytes]:
+    """Send one request through the ASGI app and return (status, body), reading streamed bodies to the end"""
+    payload = json.dumps(body).encode() if body is not None else b""
+    headers = [(b"host", b"loadtest")]
+    if body is not None:
+        headers.append((b"content-type", b"application/json"))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": headers, "client": ("loadtest", 1), "server": ("loadtest", 80)
+    }
+    response = {"status": 0, "body": []}
+    sent = False
+    finished = asyncio.Event()
+    
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+    
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+            if not message.get("more_body"):
+                finished.set()
+    
+    await app(scope, receive, send)
+    finished.set()
+    return response["status"], b"".join(response["body"])
+
+class LoadTest:
+    """Runs the endpoint mix against the app and records per-endpoint latencies"""
+    
+    def __init__(self, app, lesson_ids: List[int], mix: Dict[str, int], questions: int, seed: int):
+        self.app = app
+        self.lesson_ids = lesson_ids
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.questions = questions
+        self.rng = random.Random(seed)
+        self.latencies: Dict[str, List[float]] = {name: [] for name in self.names}
+        self.errors: Dict[str, Dict[str, int]] = {name: {} for name in self.names}
+    
+    def lesson_body(self) -> dict:
+        return {"grade": self.rng.randint(1, 8), "subject": "Grammar", "topic": self.rng.choice(TOPICS),
+                "questions_per_section": self.questions, "fresh": True}
+    
+    async def generate(self) -> Tuple[int, bytes]:
+        status, body = await asgi_request(self.app, "POST", "/api/generate-lesson", body=self.lesson_body())
+        if status == 200:
+            self.lesson_ids.append(json.loads(body)["lessonId"])
+        return status, body
+    
+    async def stream(self) -> Tuple[int, bytes]:
+        status, body = await asgi_request(self.app, "POST", "/api/generate-lesson/stream", body=self.lesson_body())
+        # Streams always answer 200; a failed generation ends with an error event instead
+        if status == 200 and b"event: error" in body:
+            return 599, body
+        return status, body
+    
+    async def list(self) -> Tuple[int, bytes]:
+        return await asgi_request(self.app, "GET", "/api/lessons", "limit=20")
+    
+    async def get(self) -> Tuple[int, bytes]:
+        return await asgi_request(self.app, "GET", f"/api/lessons/{self.rng.choice(self.lesson_ids)}")
+    
+    async def docx(self) -> Tuple[int, bytes]:
+        return await asgi_request(self.app, "GET", f"/api/lessons/{self.rng.choice(self.lesson_ids)}/docx")
+    
+    async def search(self) -> Tuple[int, bytes]:
+        return await asgi_request(self.app, "GET", "/api/lessons/search", f"q={self.rng.choice(TOPICS).lower()}")
+    
+    async def worker(self, deadline: float, remaining: List[int]):
+        while time.perf_counter() < deadline and remaining[0] > 0:
+            remaining[0] -= 1
+            name = self.rng.choices(self.names, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                status, _ = await getattr(self, name)()
+            except Exception as e:
+                status = type(e).__name__
+            self.latencies[name].append(time.perf_counter() - start)
+            if status != 200:
+                self.errors[name][str(status)] = self.errors[name].get(str(status), 0) + 1
+    
+    async def run(self, concurrency: int, requests: int, duration: float) -> float:
+        deadline = time.perf_counter() + duration
+        remaining = [requests]
+        start = time.perf_counter()
+        await asyncio.gather(*(self.worker(deadline, remaining) for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+def percentile(values: List[float], fraction: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+def summarize(load_test: LoadTest, elapsed: float) -> Dict[str, Dict]:
+    """Throughput, errors and latency percentiles (ms) per endpoint, plus an "all" row"""
+    rows = {}
+    groups = [(name, load_test.latencies[name], load_test.errors[name]) for name in load_test.names]
+    all_errors: Dict[str, int] = {}
+    for _, _, errors in groups:
+        for status, count in errors.items():
+            all_errors[status] = all_errors.get(status, 0) + count
+    groups.append(("all", [value for name in load_test.names for value in load_test.latencies[name]], all_errors))
+    for name, values, errors in groups:
+        if not values:
+            continue
+        rows[name] = {
+            "requests": len(values),
+            "errors": sum(errors.values()),
+            "errors_by_status": errors,
+            "throughput_rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 0.50),
+            "p95_ms": percentile(values, 0.95),
+            "p99_ms": percentile(values, 0.99),
+            "max_ms": max(values) * 1000
+        }
+    return rows
+
+def configure_environment(args):
+    # Everything here must be set before app / openai_client are imported
+    os.environ["OPENAI_BACKEND"] = "fake"
+    os.environ.setdefault("OPENAI_API_KEY", "loadtest")
+    flags = {
+        "FAKE_OPENAI_LATENCY": args.latency,
+        "FAKE_OPENAI_ERROR_RATE": args.error_rate,
+        "FAKE_OPENAI_SHORT_RATE": args.short_rate,
+        "FAKE_OPENAI_MALFORMED_RATE": args.malformed_rate,
+        "FAKE_OPENAI_BANNED_RATE": args.banned_rate,
+        "FAKE_OPENAI_SEED": args.seed
+    }
+    for name, value in flags.items():
+        if value is not None:
+            os.environ[name] = str(value)
+    # The client-side limits are sized for the real API; lift them unless set explicitly
+    os.environ.setdefault("OPENAI_REQUESTS_PER_MINUTE", "1000000")
+    os.environ.setdefault("OPENAI_TOKENS_PER_MINUTE", "1000000000")
+    os.environ.setdefault("OPENAI_MAX_CONCURRENCY", str(max(8, args.concurrency * 2)))
+    os.environ.setdefault("OPENAI_RETRY_BASE_DELAY", "0.05")
+
+async def run(args, mix: Dict[str, int]) -> Dict:
+    import app as app_module
+    import openai_client
+    from fake_openai import FakeBackend
+    
+    # Keep a handle on the backend so its stats can be reported
+    backend = FakeBackend.from_env()
+    openai_client.use_clients(backend.client(), backend.async_client())
+    
+    # Per-request INFO logs would dominate the run's own cost
+    logging.disable(logging.INFO)
+    async with app_module.app.router.lifespan_context(app_module.app):
+        seed_backend = FakeBackend(seed=args.seed)
+        lesson_ids = []
+        for n in range(args.seed_lessons):
+            topic = TOPICS[n % len(TOPICS)]
+            _, text = seed_backend.respond(f'grammar rule: "{topic}"')
+            lesson_ids.append(app_module.db.save_lesson([topic], 1 + n % 8, text))
+        
+        load_test = LoadTest(app_module.app, lesson_ids, mix, args.questions, args.seed or 0)
+        elapsed = await load_test.run(args.concurrency, args.requests or sys.maxsize, args.duration or float("inf"))
+    
+    return {
+        "config": {
+            "concurrency": args.concurrency, "mix": mix, "questions_per_section": args.questions,
+            "latency": backend.latency_spec, "error_rate": backend.error_rate, "short_rate": backend.short_rate,
+            "malformed_rate": backend.malformed_rate, "banned_rate": backend.banned_rate
+        },
+        "elapsed_s": elapsed,
+        "endpoints": summarize(load_test, elapsed),
+        "backend": backend.stats(),
+        "retries": dict(openai_client.retry_stats)
+    }
+
+def print_report(report: Dict):
+    config = report["config"]
+    print(f"{report['endpoints'].get('all', {}).get('requests', 0)} requests in {report['elapsed_s']:.1f}s, "
+          f"concurrency {config['concurrency']}, fake latency {config['latency']}\n")
+    print(f"{'Endpoint':<32} {'Reqs':>6} {'Errs':>5} {'Req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    print("=" * 82)
+    for name, row in report["endpoints"].items():
+        label = ENDPOINTS.get(name, "all")
+        print(f"{label:<32} {row['requests']:>6} {row['errors']:>5} {row['throughput_rps']:>8.2f} "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}")
+    backend = report["backend"]
+    calls = ", ".join(f"{kind} {count}" for kind, count in sorted(backend["calls"].items()))
+    print(f"\nUpstream calls: {calls or 'none'}")
+    print(f"Injected: {backend['errors']} errors, {backend['short']} short, "
+          f"{backend['malformed']} malformed, {backend['banned']} banned")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API against the fake OpenAI backend")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once (default: 8)")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds (default: 30 without --requests)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Endpoint weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--questions", type=int, default=6, help="Questions per section in generated lessons (default: 6)")
+    parser.add_argument("--seed-lessons", type=int, default=50, help="Lessons saved before the run for reads (default: 50)")
+    parser.add_argument("--latency", help="Fake upstream latency: fixed:S, uniform:LO,HI, lognormal:MEDIAN,SIGMA or exponential:MEAN")
+    parser.add_argument("--error-rate", type=float, help="Fraction of upstream calls that fail with a retryable error")
+    parser.add_argument("--short-rate", type=float, help="Fraction of upstream outputs missing items in one activity")
+    parser.add_argument("--malformed-rate", type=float, help="Fraction of upstream outputs with an unnumbered activity")
+    parser.add_argument("--banned-rate", type=float, help="Fraction of lessons mentioning pictures (forces regeneration)")
+    parser.add_argument("--seed", type=int, help="Seed for the fake backend and the request mix")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON to PATH ('-' for stdout)")
+    args = parser.parse_args()
+    if args.requests is None and args.duration is None:
+        args.duration = 30.0
+    if args.seed_lessons < 1:
+        parser.error("--seed-lessons must be at least 1")
+    mix = parse_mix(args.mix)
+    
+    configure_environment(args)
+    json_path = os.path.abspath(args.json) if args.json and args.json != "-" else args.json
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)  # app.py opens lessons.db in the working directory
+        report = asyncio.run(run(args, mix))
+    
+    if json_path == "-":
+        print(json.dumps(report, indent=2))
+        return
+    print_report(report)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import threading
+import time
+from typing import Dict
+
+# Breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a call while the circuit breaker is open"""
+    
+    def __init__(self, retry_after: float):
+        super().__init__(f"Upstream is failing; not sending requests for another {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    After failure_threshold failures in a row the breaker opens and before_call()
+    raises CircuitOpenError for reset_timeout seconds. It then lets a single trial
+    call through (half-open): success closes the breaker, failure opens it again.
+    Thread-safe, so the sync and async clients can share one breaker.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """Initialize the circuit breaker"""
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._counters = {"opened": 0, "rejected": 0, "failures": 0, "successes": 0}
+    
+    def before_call(self):
+        """Raise CircuitOpenError if the call should not be attempted"""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    self._counters["rejected"] += 1
+                    raise CircuitOpenError(remaining)
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == HALF_OPEN:
+                if self._trial_in_flight:
+                    self._counters["rejected"] += 1
+                    raise CircuitOpenError(self.reset_timeout)
+                self._trial_in_flight = True
+    
+    def record_success(self):
+        """Record a successful call"""
+        with self._lock:
+            self._counters["successes"] += 1
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+            self.state = CLOSED
+    
+    def record_failure(self):
+        """Record a failed call, opening the breaker if the threshold is reached"""
+        with self._lock:
+            self._counters["failures"] += 1
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self._counters["opened"] += 1
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+    
+    def release(self):
+        """Give back a half-open trial slot for a call that neither succeeded nor failed"""
+        with self._lock:
+            self._trial_in_flight = False
+    
+    def stats(self) -> Dict:
+        """Return the breaker state and counters"""
+        with self._lock:
+            open_for = self._opened_at + self.reset_timeout - time.monotonic() if self.state == OPEN else 0.0
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "retry_in_seconds": round(max(0.0, open_for), 2),
+                **self._counters
+            }
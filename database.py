@@ -1,18 +1,371 @@
 import sqlite3
+import base64
 import json
 import os
+import re
+import threading
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
+
+from lesson_compression import CURRENT_CODEC, body_hash, compress_body, decompress_body
+from lesson_parser import ACTIVITY_NUMBERS, Activity, Lesson, assemble_lesson_text, count_items, parse_lesson
+from metrics import timed_db_method
+
+# Applied to every connection when it is opened
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",       # readers no longer block on the writer
+    "PRAGMA synchronous = NORMAL",     # safe with WAL, avoids an fsync per commit
+    "PRAGMA cache_size = -16000",      # ~16 MB page cache
+    "PRAGMA mmap_size = 268435456",    # memory-map up to 256 MB of the file
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000"
+)
+
+# Prepared statements kept per connection (sqlite3 reuses them by SQL text)
+STATEMENT_CACHE_SIZE = 128
+
+# A lesson's text: its compressed, deduplicated body if it has one (see
+# lesson_compression), otherwise whatever is stored in lessons.lesson_text
+LESSON_BODY_SQL = '''COALESCE((
+    SELECT lesson_body(lesson_blobs.codec, lesson_blobs.data)
+    FROM lesson_bodies JOIN lesson_blobs ON lesson_blobs.hash = lesson_bodies.body_hash
+    WHERE lesson_bodies.lesson_id = lessons.id
+), lessons.lesson_text)'''
+
+def register_functions(conn: sqlite3.Connection):
+    """Register the SQL functions the schema relies on (body compression) on a connection"""
+    conn.create_function("lesson_body", 2, decompress_body, deterministic=True)
+    conn.create_function("compress_lesson_body", 1, compress_body, deterministic=True)
+    conn.create_function("lesson_body_hash", 1, body_hash, deterministic=True)
+    conn.create_function("lesson_body_codec", 0, lambda: CURRENT_CODEC)
+
+# Section number of a lesson's explanation in lesson_sections; activities use their own number
+EXPLANATION_SECTION = 0
+
+def section_rows(lesson_id: int, lesson: Lesson) -> List[tuple]:
+    """Rows of lesson_sections for a parsed lesson: the explanation and each activity, compressed"""
+    sections = [(EXPLANATION_SECTION, lesson.explanation, 0)] + [
+        (number, activity.content, activity.item_count) for number, activity in lesson.activities.items()
+    ]
+    return [
+        (lesson_id, number, CURRENT_CODEC, compress_body(content), item_count)
+        for number, content, item_count in sections
+    ]
+
+def backfill_lesson_sections(conn: sqlite3.Connection):
+    """Parse every stored lesson that has no sections yet and store them"""
+    cursor = conn.execute(f'''
+        SELECT id, {LESSON_BODY_SQL} FROM lessons
+        WHERE id NOT IN (SELECT DISTINCT lesson_id FROM lesson_sections)
+    ''')
+    for lesson_id, lesson_text in cursor.fetchall():
+        conn.executemany('''
+            INSERT OR REPLACE INTO lesson_sections (lesson_id, section, codec, data, item_count) VALUES (?, ?, ?, ?, ?)
+        ''', section_rows(lesson_id, parse_lesson(lesson_text)))
+
+def store_lesson_body(cursor: sqlite3.Cursor, lesson_id: int, lesson_text: str):
+    """
+    Point a lesson at the blob for its text, compressing it only if no other
+    lesson has stored the same text already
+    """
+    text_hash = body_hash(lesson_text)
+    cursor.execute('SELECT 1 FROM lesson_blobs WHERE hash = ?', (text_hash,))
+    if cursor.fetchone() is None:
+        cursor.execute('''
+            INSERT INTO lesson_blobs (hash, codec, data, size) VALUES (?, ?, ?, ?)
+        ''', (text_hash, CURRENT_CODEC, compress_body(lesson_text), len(lesson_text.encode('utf-8'))))
+    cursor.execute('''
+        INSERT OR REPLACE INTO lesson_bodies (lesson_id, body_hash) VALUES (?, ?)
+    ''', (lesson_id, text_hash))
+
+def release_lesson_blob(cursor: sqlite3.Cursor, text_hash: str):
+    """Drop a body blob once no lesson points at it"""
+    cursor.execute('''
+        DELETE FROM lesson_blobs
+        WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM lesson_bodies WHERE body_hash = ?)
+    ''', (text_hash, text_hash))
+
+def rebuild_lesson_body(cursor: sqlite3.Cursor, lesson_id: int):
+    """
+    Reassemble one lesson's body from its stored sections and update its
+    full-text entry, if the text changed
+    """
+    cursor.execute('SELECT section, codec, data FROM lesson_sections WHERE lesson_id = ?', (lesson_id,))
+    sections = {section: decompress_body(codec, data) for section, codec, data in cursor.fetchall()}
+    explanation = sections.pop(EXPLANATION_SECTION, '')
+    lesson_text = assemble_lesson_text(explanation, sections)
+    
+    cursor.execute(f'''
+        SELECT lessons.topics, {LESSON_BODY_SQL}, lessons.tags, lesson_bodies.body_hash
+        FROM lessons LEFT JOIN lesson_bodies ON lesson_bodies.lesson_id = lessons.id
+        WHERE lessons.id = ?
+    ''', (lesson_id,))
+    row = cursor.fetchone()
+    if row is None or lesson_text == row[1]:
+        return
+    topics_json, old_text, tags_json, old_hash = row
+    cursor.execute('''
+        INSERT INTO lessons_fts (lessons_fts, rowid, topics, lesson_text, tags) VALUES ('delete', ?, ?, ?, ?)
+    ''', (lesson_id, topics_json, old_text, tags_json))
+    store_lesson_body(cursor, lesson_id, lesson_text)
+    if old_hash is not None:
+        release_lesson_blob(cursor, old_hash)
+    cursor.execute('''
+        INSERT INTO lessons_fts (rowid, topics, lesson_text, tags) VALUES (?, ?, ?, ?)
+    ''', (lesson_id, topics_json, lesson_text, tags_json))
+
+def rebuild_stale_lesson_bodies(conn: sqlite3.Connection):
+    """Rebuild the bodies left waiting in stale_lesson_bodies by earlier versions"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT lesson_id FROM stale_lesson_bodies')
+    for (lesson_id,) in cursor.fetchall():
+        rebuild_lesson_body(cursor, lesson_id)
+
+# Schema migrations applied after the base lessons table, in order. Each is an
+# SQL script, or a list of single SQL statements and functions taking the
+# connection (for steps SQL cannot do) run in one transaction.
+# PRAGMA user_version records how many have been applied to a database file.
+MIGRATIONS = [
+    # 1: normalized topic index, secondary indexes and backfill of existing lessons
+    '''
+    CREATE TABLE IF NOT EXISTS lesson_topics (
+        lesson_id INTEGER NOT NULL,
+        topic TEXT NOT NULL,
+        PRIMARY KEY (lesson_id, topic)
+    );
+    CREATE INDEX IF NOT EXISTS idx_lesson_topics_topic ON lesson_topics (topic, lesson_id);
+    CREATE INDEX IF NOT EXISTS idx_lessons_date ON lessons (date_generated, id);
+    CREATE INDEX IF NOT EXISTS idx_lessons_grade ON lessons (grade, date_generated);
+    
+    CREATE TRIGGER IF NOT EXISTS lessons_topics_insert AFTER INSERT ON lessons BEGIN
+        INSERT OR IGNORE INTO lesson_topics (lesson_id, topic)
+        SELECT new.id, lower(trim(value)) FROM json_each(new.topics);
+    END;
+    CREATE TRIGGER IF NOT EXISTS lessons_topics_delete AFTER DELETE ON lessons BEGIN
+        DELETE FROM lesson_topics WHERE lesson_id = old.id;
+    END;
+    
+    INSERT OR IGNORE INTO lesson_topics (lesson_id, topic)
+    SELECT lessons.id, lower(trim(topic.value)) FROM lessons, json_each(lessons.topics) AS topic;
+    ''',
+    # 2: full-text index over topics, lesson text and tags, kept in sync by triggers
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS lessons_fts USING fts5(
+        topics, lesson_text, tags,
+        content = 'lessons', content_rowid = 'id', tokenize = 'porter unicode61'
+    );
+    
+    CREATE TRIGGER IF NOT EXISTS lessons_fts_insert AFTER INSERT ON lessons BEGIN
+        INSERT INTO lessons_fts (rowid, topics, lesson_text, tags)
+        VALUES (new.id, new.topics, new.lesson_text, new.tags);
+    END;
+    CREATE TRIGGER IF NOT EXISTS lessons_fts_delete AFTER DELETE ON lessons BEGIN
+        INSERT INTO lessons_fts (lessons_fts, rowid, topics, lesson_text, tags)
+        VALUES ('delete', old.id, old.topics, old.lesson_text, old.tags);
+    END;
+    CREATE TRIGGER IF NOT EXISTS lessons_fts_update AFTER UPDATE ON lessons BEGIN
+        INSERT INTO lessons_fts (lessons_fts, rowid, topics, lesson_text, tags)
+        VALUES ('delete', old.id, old.topics, old.lesson_text, old.tags);
+        INSERT INTO lessons_fts (rowid, topics, lesson_text, tags)
+        VALUES (new.id, new.topics, new.lesson_text, new.tags);
+    END;
+    
+    INSERT INTO lessons_fts (lessons_fts) VALUES ('rebuild');
+    ''',
+    # 3: compressed, content-addressed lesson bodies. Identical texts share one
+    # blob and lessons.lesson_text is left empty. The full-text index now reads
+    # its content through the lesson_documents view and is maintained by
+    # LessonDatabase instead of triggers, since the body is stored after the row.
+    f'''
+    DROP TRIGGER IF EXISTS lessons_fts_insert;
+    DROP TRIGGER IF EXISTS lessons_fts_delete;
+    DROP TRIGGER IF EXISTS lessons_fts_update;
+    DROP TABLE IF EXISTS lessons_fts;
+    
+    CREATE TABLE IF NOT EXISTS lesson_blobs (
+        hash TEXT PRIMARY KEY,
+        codec TEXT NOT NULL,
+        data BLOB NOT NULL,
+        size INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS lesson_bodies (
+        lesson_id INTEGER PRIMARY KEY,
+        body_hash TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_lesson_bodies_hash ON lesson_bodies (body_hash);
+    
+    INSERT OR IGNORE INTO lesson_blobs (hash, codec, data, size)
+    SELECT lesson_body_hash(lesson_text), lesson_body_codec(), compress_lesson_body(lesson_text),
+           length(CAST(lesson_text AS BLOB))
+    FROM lessons WHERE id NOT IN (SELECT lesson_id FROM lesson_bodies);
+    INSERT OR IGNORE INTO lesson_bodies (lesson_id, body_hash)
+    SELECT id, lesson_body_hash(lesson_text) FROM lessons;
+    UPDATE lessons SET lesson_text = '' WHERE lesson_text != '';
+    
+    CREATE VIEW IF NOT EXISTS lesson_documents AS
+    SELECT lessons.id AS id, lessons.topics AS topics, {LESSON_BODY_SQL} AS lesson_text, lessons.tags AS tags
+    FROM lessons;
+    CREATE VIRTUAL TABLE lessons_fts USING fts5(
+        topics, lesson_text, tags,
+        content = 'lesson_documents', content_rowid = 'id', tokenize = 'porter unicode61'
+    );
+    INSERT INTO lessons_fts (lessons_fts) VALUES ('rebuild');
+    ''',
+    # 4: parsed sections stored next to the body (section 0 is the explanation,
+    # N is Activity N) with their item counts, so one activity can be read or
+    # updated without parsing the whole lesson
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS lesson_sections (
+            lesson_id INTEGER NOT NULL,
+            section INTEGER NOT NULL,
+            codec TEXT NOT NULL,
+            data BLOB NOT NULL,
+            item_count INTEGER NOT NULL,
+            PRIMARY KEY (lesson_id, section)
+        ) WITHOUT ROWID
+        ''',
+        backfill_lesson_sections,
+    ],
+    # 5: lessons whose body (and full-text entry) is older than their sections.
+    # update_activity only rewrites the section and adds the lesson here; the
+    # body is reassembled the next time it is read or searched
+    '''
+    CREATE TABLE IF NOT EXISTS stale_lesson_bodies (
+        lesson_id INTEGER PRIMARY KEY
+    );
+    ''',
+    # 6: update_activity now reassembles the body itself, so reads never write;
+    # rebuild whatever migration 5 left stale and drop the table
+    [
+        rebuild_stale_lesson_bodies,
+        'DROP TABLE IF EXISTS stale_lesson_bodies',
+    ],
+]
+
+# Migrations that free a lot of pages; the file is rebuilt (VACUUM) after them
+VACUUM_AFTER_MIGRATIONS = {3}
+
+# Projections for the list and search methods: "summary" leaves out the lesson
+# body (and tags, which are stored after it), "full" includes both
+SUMMARY_FIELDS = "summary"
+FULL_FIELDS = "full"
+LESSON_FIELDS = (SUMMARY_FIELDS, FULL_FIELDS)
+
+# Column weights for bm25 ranking (topics, lesson_text, tags)
+SEARCH_WEIGHTS = (5.0, 1.0, 2.0)
+
+# Markers placed around matched terms in search snippets
+SNIPPET_START = "["
+SNIPPET_END = "]"
+
+# "quoted phrases", then bare words with an optional trailing * for prefix matching
+_QUERY_TERM_PATTERN = re.compile(r'"([^"]*)"|([^\s"]+)')
+
+def build_fts_query(query: str) -> str:
+    """
+    Turn user search input into an FTS5 query that always parses.
+    "quoted text" is matched as a phrase, word* as a prefix, and every term
+    has to match. Returns an empty string if the input has no searchable words.
+    """
+    terms = []
+    for phrase, word in _QUERY_TERM_PATTERN.findall(query):
+        if phrase:
+            words = re.findall(r'\w+', phrase)
+            if words:
+                terms.append('"' + ' '.join(words) + '"')
+            continue
+        prefix = word.endswith('*')
+        words = re.findall(r'\w+', word)
+        for n, part in enumerate(words):
+            is_last = n == len(words) - 1
+            terms.append(f'"{part}"' + ('*' if prefix and is_last else ''))
+    return ' '.join(terms)
+
+def encode_cursor(lesson: Dict) -> str:
+    """Opaque pagination cursor pointing just after this lesson in newest-first order"""
+    position = json.dumps([lesson['date_generated'], lesson['id']])
+    return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Return the (date_generated, id) position of a cursor. Raises ValueError if it is malformed."""
+    try:
+        date_generated, lesson_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not isinstance(date_generated, str) or not isinstance(lesson_id, int):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return date_generated, lesson_id
+
+class ConnectionPool:
+    """
+    One connection per thread to an SQLite file, opened on first use with
+    CONNECTION_PRAGMAS (WAL, busy_timeout, ...) and kept until close(). The
+    lessons database and the stores kept in the same file (job queue, lesson
+    and artifact caches) each use one, so they all get the same tuning.
+    Each thread only uses its own connection; check_same_thread is off so
+    close() and the cleanup of finished threads' connections can run from any
+    thread.
+    """
+    
+    def __init__(self, db_path: str, setup: Optional[Callable[[sqlite3.Connection], None]] = None):
+        """setup, if given, is run on every new connection (e.g. to register functions)"""
+        self.db_path = db_path
+        self.setup = setup
+        self._local = threading.local()
+        self._connections: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._lock = threading.Lock()
+    
+    def connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening and tuning it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            if self.setup is not None:
+                self.setup(conn)
+            self._local.conn = conn
+            with self._lock:
+                self._close_finished_threads()
+                self._connections[threading.current_thread()] = conn
+        return conn
+    
+    def _close_finished_threads(self):
+        # Threads that have exited will never use their connection again
+        for thread in [thread for thread in self._connections if not thread.is_alive()]:
+            self._connections.pop(thread).close()
+    
+    def close(self):
+        """Close every connection opened by this pool"""
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections = {}
+        self._local = threading.local()
 
 class LessonDatabase:
     def __init__(self, db_path: str = "lessons.db"):
         """Initialize the lesson database"""
         self.db_path = db_path
+        self._pool = ConnectionPool(db_path, setup=register_functions)
         self.init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Return this thread's connection (see ConnectionPool). Connections stay
+        open for the life of the LessonDatabase, so the schema and prepared
+        statements are not reloaded on every call.
+        """
+        return self._pool.connect()
+    
+    def close(self):
+        """Close every connection opened by this LessonDatabase"""
+        self._pool.close()
+    
     def init_database(self):
         """Create the lessons table if it doesn't exist"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS lessons (
@@ -26,32 +379,70 @@ class LessonDatabase:
                 )
             ''')
             conn.commit()
+            self._migrate(conn)
+    
+    def _migrate(self, conn: sqlite3.Connection):
+        """Apply the MIGRATIONS this database file has not seen yet"""
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            if isinstance(migration, str):
+                conn.executescript(f'BEGIN IMMEDIATE; {migration}; PRAGMA user_version = {number}; COMMIT;')
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for step in migration:
+                    if isinstance(step, str):
+                        conn.execute(step)
+                    else:
+                        step(conn)
+                conn.execute(f'PRAGMA user_version = {number}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        if VACUUM_AFTER_MIGRATIONS.intersection(range(version + 1, len(MIGRATIONS) + 1)):
+            conn.execute('VACUUM')
     
+    @timed_db_method
     def save_lesson(self, topics: List[str], grade: int, lesson_text: str, 
-                   age: Optional[int] = None, tags: Optional[List[str]] = None) -> int:
-        """Save a lesson to the database and return the lesson ID"""
-        with sqlite3.connect(self.db_path) as conn:
+                   age: Optional[int] = None, tags: Optional[List[str]] = None,
+                   lesson: Optional[Lesson] = None) -> int:
+        """
+        Save a lesson to the database and return the lesson ID.
+        Pass the already parsed lesson (whose text is lesson_text) to skip parsing it again.
+        """
+        topics_json = json.dumps(topics)
+        tags_json = json.dumps(tags) if tags else None
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO lessons (topics, grade, age, date_generated, lesson_text, tags)
-                VALUES (?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, '', ?)
             ''', (
-                json.dumps(topics),
+                topics_json,
                 grade,
                 age,
                 datetime.now().isoformat(),
-                lesson_text,
-                json.dumps(tags) if tags else None
+                tags_json
             ))
+            lesson_id = cursor.lastrowid
+            store_lesson_body(cursor, lesson_id, lesson_text)
+            cursor.executemany('''
+                INSERT INTO lesson_sections (lesson_id, section, codec, data, item_count) VALUES (?, ?, ?, ?, ?)
+            ''', section_rows(lesson_id, lesson if lesson is not None else parse_lesson(lesson_text)))
+            cursor.execute('''
+                INSERT INTO lessons_fts (rowid, topics, lesson_text, tags) VALUES (?, ?, ?, ?)
+            ''', (lesson_id, topics_json, lesson_text, tags_json))
             conn.commit()
-            return cursor.lastrowid
+            return lesson_id
     
+    @timed_db_method
     def get_lesson(self, lesson_id: int) -> Optional[Dict]:
         """Retrieve a lesson by ID"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, topics, grade, age, date_generated, lesson_text, tags
+            cursor.execute(f'''
+                SELECT id, topics, grade, age, date_generated, {LESSON_BODY_SQL}, tags
                 FROM lessons WHERE id = ?
             ''', (lesson_id,))
             
@@ -68,62 +459,357 @@ class LessonDatabase:
                 }
             return None
     
-    def list_lessons(self) -> List[Dict]:
-        """List all lessons with summary information"""
-        with sqlite3.connect(self.db_path) as conn:
+    @timed_db_method
+    def has_lesson(self, topics: List[str], grade: int) -> bool:
+        """
+        Check whether a lesson for this grade with exactly these topics is already
+        stored. Topics are compared the way find_lessons filters them (ignoring
+        case and surrounding whitespace). Candidates come from the topic index
+        (CROSS JOIN keeps lesson_topics first), then are checked by grade.
+        """
+        if not topics:
+            return False
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT id, topics, grade, age, date_generated
-                FROM lessons
-                ORDER BY date_generated DESC
-            ''')
-            
-            lessons = []
-            for row in cursor.fetchall():
-                lessons.append({
-                    'id': row[0],
-                    'topics': json.loads(row[1]),
-                    'grade': row[2],
-                    'age': row[3],
-                    'date_generated': row[4]
-                })
-            return lessons
+                WITH wanted (topic) AS (SELECT DISTINCT lower(trim(value)) FROM json_each(?))
+                SELECT 1 FROM lesson_topics
+                CROSS JOIN lessons ON lessons.id = lesson_topics.lesson_id
+                WHERE lesson_topics.topic = (SELECT MIN(topic) FROM wanted) AND lessons.grade = ?
+                  AND (SELECT COUNT(*) FROM lesson_topics AS other WHERE other.lesson_id = lessons.id)
+                      = (SELECT COUNT(*) FROM wanted)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM lesson_topics AS other
+                      WHERE other.lesson_id = lessons.id AND other.topic NOT IN (SELECT topic FROM wanted)
+                  )
+                LIMIT 1
+            ''', (json.dumps(topics), grade))
+            return cursor.fetchone() is not None
     
-    def search_lessons(self, keyword: str) -> List[Dict]:
-        """Search lessons by keyword in topics, lesson text, or tags"""
-        with sqlite3.connect(self.db_path) as conn:
+    @timed_db_method
+    def get_existing_ids(self, lesson_ids: List[int]) -> List[int]:
+        """Return which of the given lesson IDs exist, in the order given"""
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT id, topics, grade, age, date_generated, lesson_text, tags
-                FROM lessons
-                WHERE topics LIKE ? OR lesson_text LIKE ? OR tags LIKE ?
-                ORDER BY date_generated DESC
-            ''', (f'%{keyword}%', f'%{keyword}%', f'%{keyword}%'))
+                SELECT id FROM lessons WHERE id IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(lesson_ids),))
+            existing = {row[0] for row in cursor.fetchall()}
+            return [lesson_id for lesson_id in lesson_ids if lesson_id in existing]
+    
+    def _projection(self, fields: str) -> str:
+        # Columns selected for a list/search projection, parsed by _row_to_lesson
+        if fields not in LESSON_FIELDS:
+            raise ValueError(f"fields must be one of: {', '.join(LESSON_FIELDS)}")
+        columns = 'lessons.id, lessons.topics, lessons.grade, lessons.age, lessons.date_generated'
+        if fields == FULL_FIELDS:
+            columns += f', {LESSON_BODY_SQL}, lessons.tags'
+        return columns
+    
+    def _row_to_lesson(self, row: tuple, fields: str) -> Dict:
+        lesson = {
+            'id': row[0],
+            'topics': json.loads(row[1]),
+            'grade': row[2],
+            'age': row[3],
+            'date_generated': row[4]
+        }
+        if fields == FULL_FIELDS:
+            lesson['lesson_text'] = row[5]
+            lesson['tags'] = json.loads(row[6]) if row[6] else None
+        return lesson
+    
+    @timed_db_method
+    def list_lessons(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                     fields: str = SUMMARY_FIELDS) -> List[Dict]:
+        """
+        List lessons with summary information (or everything, with fields="full"), newest first.
+        limit and cursor (from encode_cursor) select a page; by default every lesson is returned.
+        """
+        return self.find_lessons(limit=limit, cursor=cursor, fields=fields)
+    
+    @timed_db_method
+    def list_lessons_page(self, limit: int = 20, cursor: Optional[str] = None, include_total: bool = False,
+                          fields: str = SUMMARY_FIELDS, **filters) -> Dict:
+        """
+        Return one page of lesson summaries, newest first, as
+        {'lessons', 'next_cursor', 'total'}. Pass next_cursor back to get the
+        following page; it is None on the last page. filters are the
+        find_lessons filters. total is only counted when include_total is set.
+        Raises ValueError if limit is less than 1.
+        """
+        if limit < 1:
+            raise ValueError(f"limit must be at least 1, got {limit}")
+        lessons = self.find_lessons(limit=limit + 1, cursor=cursor, fields=fields, **filters)
+        has_more = len(lessons) > limit
+        lessons = lessons[:limit]
+        return {
+            'lessons': lessons,
+            'next_cursor': encode_cursor(lessons[-1]) if has_more else None,
+            'total': self.count_lessons(**filters) if include_total else None
+        }
+    
+    def _filter_clause(self, grade: Optional[int], topic: Optional[str],
+                       date_from: Optional[str], date_to: Optional[str]) -> Tuple[str, List[str], List]:
+        # Returns (join, conditions, params) for the lesson list filters
+        joins = ''
+        conditions = []
+        params = []
+        if topic is not None:
+            joins = 'JOIN lesson_topics ON lesson_topics.lesson_id = lessons.id'
+            conditions.append('lesson_topics.topic = lower(trim(?))')
+            params.append(topic)
+        if grade is not None:
+            conditions.append('lessons.grade = ?')
+            params.append(grade)
+        if date_from is not None:
+            conditions.append('lessons.date_generated >= ?')
+            params.append(date_from)
+        if date_to is not None:
+            # A bare date includes the whole day
+            conditions.append('lessons.date_generated <= ?')
+            params.append(date_to + 'T23:59:59.999999' if len(date_to) == 10 else date_to)
+        return joins, conditions, params
+    
+    @timed_db_method
+    def find_lessons(self, grade: Optional[int] = None, topic: Optional[str] = None,
+                     date_from: Optional[str] = None, date_to: Optional[str] = None,
+                     limit: Optional[int] = None, cursor: Optional[str] = None,
+                     fields: str = SUMMARY_FIELDS) -> List[Dict]:
+        """
+        List lessons matching every given filter, newest first.
+        fields="summary" leaves out lesson_text and tags; fetch those per lesson
+        with get_lesson, or pass fields="full" for small pages.
+        topic matches any of a lesson's topics, ignoring case and surrounding
+        whitespace; date_from/date_to are inclusive ISO timestamps or dates.
+        cursor continues after the lesson it was made from (keyset pagination on
+        date_generated, id), so later pages cost the same as the first.
+        """
+        columns = self._projection(fields)
+        joins, conditions, params = self._filter_clause(grade, topic, date_from, date_to)
+        if cursor is not None:
+            conditions.append('(lessons.date_generated, lessons.id) < (?, ?)')
+            params.extend(decode_cursor(cursor))
+        where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+        if limit is not None:
+            params.append(limit)
+        
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {columns}
+                FROM lessons {joins}
+                {where}
+                ORDER BY lessons.date_generated DESC, lessons.id DESC
+                {'LIMIT ?' if limit is not None else ''}
+            ''', params)
+            return [self._row_to_lesson(row, fields) for row in cursor.fetchall()]
+    
+    @timed_db_method
+    def count_lessons(self, grade: Optional[int] = None, topic: Optional[str] = None,
+                      date_from: Optional[str] = None, date_to: Optional[str] = None) -> int:
+        """Count the lessons matching the find_lessons filters"""
+        joins, conditions, params = self._filter_clause(grade, topic, date_from, date_to)
+        where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT COUNT(*) FROM lessons {joins} {where}', params)
+            return cursor.fetchone()[0]
+    
+    @timed_db_method
+    def get_topic_counts(self, grade: Optional[int] = None) -> Dict[str, int]:
+        """Count stored lessons per (lower-cased) topic, optionally for one grade"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            if grade is None:
+                cursor.execute('SELECT topic, COUNT(*) FROM lesson_topics GROUP BY topic ORDER BY topic')
+            else:
+                cursor.execute('''
+                    SELECT lesson_topics.topic, COUNT(*)
+                    FROM lesson_topics JOIN lessons ON lessons.id = lesson_topics.lesson_id
+                    WHERE lessons.grade = ?
+                    GROUP BY lesson_topics.topic ORDER BY lesson_topics.topic
+                ''', (grade,))
+            return dict(cursor.fetchall())
+    
+    @timed_db_method
+    def search_lessons(self, keyword: str, limit: Optional[int] = 50, fields: str = SUMMARY_FIELDS) -> List[Dict]:
+        """
+        Full-text search over topics, lesson text and tags, best matches first.
+        Supports "exact phrases" and prefix* terms; every term has to match.
+        Each result carries a highlighted 'snippet' and its bm25 'score' (lower
+        is better). At most limit results are returned (every match with
+        limit=None). fields works as in find_lessons.
+        """
+        columns = self._projection(fields)
+        fts_query = build_fts_query(keyword)
+        if not fts_query:
+            return []
+        
+        # Rank every match on the index alone, then read rows and build snippets
+        # (which need the lesson body) for the top results only
+        bm25 = f"bm25(lessons_fts, {', '.join(str(weight) for weight in SEARCH_WEIGHTS)})"
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT rowid, {bm25} AS score FROM lessons_fts
+                WHERE lessons_fts MATCH ?
+                ORDER BY score
+                LIMIT ?
+            ''', (fts_query, -1 if limit is None else limit))  # a negative LIMIT means none
+            scores = dict(cursor.fetchall())
+            if not scores:
+                return []
+            
+            cursor.execute(f'''
+                SELECT {columns}, snippet(lessons_fts, 1, ?, ?, '…', 16)
+                FROM lessons_fts
+                JOIN lessons ON lessons.id = lessons_fts.rowid
+                WHERE lessons_fts MATCH ? AND lessons_fts.rowid IN (SELECT value FROM json_each(?))
+            ''', (SNIPPET_START, SNIPPET_END, fts_query, json.dumps(list(scores))))
             
             lessons = []
             for row in cursor.fetchall():
-                lessons.append({
-                    'id': row[0],
-                    'topics': json.loads(row[1]),
-                    'grade': row[2],
-                    'age': row[3],
-                    'date_generated': row[4],
-                    'lesson_text': row[5],
-                    'tags': json.loads(row[6]) if row[6] else None
-                })
+                lesson = self._row_to_lesson(row, fields)
+                lesson['snippet'] = row[-1]
+                lesson['score'] = scores[lesson['id']]
+                lessons.append(lesson)
+            lessons.sort(key=lambda lesson: lesson['score'])
             return lessons
     
+    @timed_db_method
+    def get_activity(self, lesson_id: int, number: int) -> Optional[Dict]:
+        """Retrieve one activity of a lesson (its content and item count) without loading the rest"""
+        if number == EXPLANATION_SECTION:
+            return None
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT codec, data, item_count FROM lesson_sections WHERE lesson_id = ? AND section = ?
+            ''', (lesson_id, number))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return {
+                'lesson_id': lesson_id,
+                'number': number,
+                'content': decompress_body(row[0], row[1]),
+                'item_count': row[2]
+            }
+    
+    @timed_db_method
+    def get_activity_counts(self, lesson_id: int) -> Optional[Dict[int, int]]:
+        """Return the numbered item count of each activity of a lesson, or None if it does not exist"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT section, item_count FROM lesson_sections WHERE lesson_id = ? ORDER BY section
+            ''', (lesson_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                return None
+            return {section: item_count for section, item_count in rows if section != EXPLANATION_SECTION}
+    
+    @timed_db_method
+    def get_lesson_sections(self, lesson_id: int) -> Optional[Lesson]:
+        """
+        Return a lesson as a Lesson built from its stored sections, without
+        parsing the body, or None if it does not exist.
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT section, codec, data, item_count FROM lesson_sections WHERE lesson_id = ? ORDER BY section
+            ''', (lesson_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                return None
+            explanation = ""
+            activities = {}
+            for section, codec, data, item_count in rows:
+                content = decompress_body(codec, data)
+                if section == EXPLANATION_SECTION:
+                    explanation = content
+                else:
+                    activities[section] = Activity(section, content, item_count)
+            lesson_text = assemble_lesson_text(explanation, {number: activity.content for number, activity in activities.items()})
+            return Lesson(text=lesson_text, explanation=explanation, activities=activities)
+    
+    @timed_db_method
+    def update_activity(self, lesson_id: int, number: int, content: str) -> Optional[Dict]:
+        """
+        Replace the content of one existing activity and return it as get_activity does,
+        or None if the lesson or activity does not exist. Only that activity's
+        section is parsed and recounted; the lesson body and its search entry are
+        reassembled from the stored sections in the same transaction, so reads and
+        searches never write.
+        """
+        if number not in ACTIVITY_NUMBERS:
+            return None
+        content = content.strip()
+        item_count = count_items(content.split('\n'))
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE lesson_sections SET codec = ?, data = ?, item_count = ?
+                WHERE lesson_id = ? AND section = ?
+            ''', (CURRENT_CODEC, compress_body(content), item_count, lesson_id, number))
+            if cursor.rowcount == 0:
+                return None
+            rebuild_lesson_body(cursor, lesson_id)
+            conn.commit()
+            return {'lesson_id': lesson_id, 'number': number, 'content': content, 'item_count': item_count}
+    
+    @timed_db_method
     def delete_lesson(self, lesson_id: int) -> bool:
         """Delete a lesson by ID. Returns True if successful, False if not found."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
+            cursor.execute(f'SELECT topics, {LESSON_BODY_SQL}, tags FROM lessons WHERE id = ?', (lesson_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return False
+            
             cursor.execute('DELETE FROM lessons WHERE id = ?', (lesson_id,))
+            cursor.execute('''
+                INSERT INTO lessons_fts (lessons_fts, rowid, topics, lesson_text, tags) VALUES ('delete', ?, ?, ?, ?)
+            ''', (lesson_id, *row))
+            
+            # Drop the body, and its blob once no other lesson shares it
+            cursor.execute('SELECT body_hash FROM lesson_bodies WHERE lesson_id = ?', (lesson_id,))
+            body = cursor.fetchone()
+            if body:
+                cursor.execute('DELETE FROM lesson_bodies WHERE lesson_id = ?', (lesson_id,))
+                release_lesson_blob(cursor, body[0])
+            cursor.execute('DELETE FROM lesson_sections WHERE lesson_id = ?', (lesson_id,))
             conn.commit()
-            return cursor.rowcount > 0
+            return True
+    
+    @timed_db_method
+    def get_storage_stats(self) -> Dict:
+        """Report how much space lesson bodies take before and after compression and deduplication"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COUNT(*), COALESCE(SUM(lesson_blobs.size), 0)
+                FROM lesson_bodies JOIN lesson_blobs ON lesson_blobs.hash = lesson_bodies.body_hash
+            ''')
+            bodies, logical_bytes = cursor.fetchone()
+            cursor.execute('SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(length(data)), 0) FROM lesson_blobs')
+            blobs, unique_bytes, stored_bytes = cursor.fetchone()
+            return {
+                "bodies": bodies,
+                "unique_bodies": blobs,
+                "text_bytes": logical_bytes,
+                "unique_text_bytes": unique_bytes,
+                "stored_bytes": stored_bytes,
+                "ratio": round(logical_bytes / stored_bytes, 2) if stored_bytes else None
+            }
     
+    @timed_db_method
     def get_lesson_count(self) -> int:
         """Get the total number of lessons in the database"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT COUNT(*) FROM lessons')
             return cursor.fetchone()[0]
\ No newline at end of file
@@ -0,0 +1,262 @@
+import re
+import threading
+import zipfile
+from io import BytesIO
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.shared import Inches
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+from lesson_parser import Lesson, parse_lesson
+
+# Bump whenever the rendered output changes so cached files (and the ETags
+# clients hold) are replaced.
+DOCX_RENDERER_VERSION = "3"
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Line patterns used to recognise worksheet structure
+NUMBERED_ITEM_PATTERN = re.compile(r'^\d+\.\s*(.+)$')
+BULLET_ITEM_PATTERN = re.compile(r'^[-•]\s*(.+)$')
+BOLD_PATTERN = re.compile(r'(\*\*.*?\*\*)')
+# Control characters XML 1.0 cannot contain
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+ANSWER_LINE = '_' * 50
+
+# Worksheet block kinds produced by worksheet_blocks
+BLANK = "blank"                # empty paragraph
+HEADING = "heading"            # section header (Heading 2)
+ITEM = "item"                  # numbered question, renumbered from 1 per list
+BULLET = "bullet"              # bullet point (List Bullet)
+INSTRUCTIONS = "instructions"  # "Instructions:" line
+PARAGRAPH = "paragraph"        # text with **bold** runs, payload is [(text, bold), ...]
+ANSWER = "answer"              # underlined answer line
+
+DOCUMENT_PART = "word/document.xml"
+_BODY_MARKER = "CODING-CAT-WORKSHEET-BODY"
+_GRADE_TOPIC_MARKER = "CODING-CAT-GRADE-TOPIC"
+
+def worksheet_blocks(lesson: Lesson) -> List[Tuple[str, object]]:
+    """
+    Turn a parsed lesson into the list of worksheet blocks the template renders:
+    the explanation, then each activity after its "Activity N" line. Only the text
+    inside each section is scanned for layout; the sections come from the Lesson,
+    and the blocks match what parse_worksheet gives for Lesson.to_text().
+    """
+    blocks = parse_worksheet(lesson.explanation) if lesson.explanation else []
+    for number in sorted(lesson.activities):
+        # Sections are separated by one blank line, which a question or paragraph
+        # before it absorbs
+        if blocks and blocks[-1][0] not in (ITEM, PARAGRAPH):
+            blocks.append((BLANK, None))
+        blocks.append((PARAGRAPH, [(f"Activity {number}", False)]))
+        blocks.extend(parse_worksheet(lesson.activities[number].content, skip_title=False))
+    return blocks
+
+def parse_worksheet(section_text: str, skip_title: bool = True) -> List[Tuple[str, object]]:
+    """
+    Turn the text of one lesson section into worksheet blocks.
+    Section headers are short all-caps lines or lines ending in a colon; two blank
+    lines after a question or paragraph leave room for an answer line.
+    """
+    lines = [line.strip() for line in section_text.split('\n')]
+    blocks = []
+    i = 0
+    
+    # Skip the first line if it's the subject-topic title (already in the header)
+    if skip_title and lines and ' — ' in lines[0]:
+        i = 2  # Skip title and empty line
+    
+    def answer_line_follows(position: int) -> int:
+        # Two blank lines at position mean an answer line; returns the next position
+        if position < len(lines) and lines[position] == '':
+            position += 1
+            if position < len(lines) and lines[position] == '':
+                blocks.append((ANSWER, None))
+                position += 1
+        return position
+    
+    while i < len(lines):
+        line = lines[i]
+        
+        if not line:
+            blocks.append((BLANK, None))
+            i += 1
+            continue
+        
+        if (line.isupper() and len(line) < 50) or line.endswith(':') and len(line) < 100:
+            blocks.append((HEADING, line))
+            i += 1
+            continue
+        
+        if NUMBERED_ITEM_PATTERN.match(line):
+            list_items = []
+            while i < len(lines):
+                match = NUMBERED_ITEM_PATTERN.match(lines[i])
+                if not match:
+                    break
+                list_items.append(match.group(1))
+                i += 1
+            
+            # Manual numbering restarts at 1 for each block
+            for idx, item in enumerate(list_items, 1):
+                blocks.append((ITEM, f"{idx}. {item}"))
+                i = answer_line_follows(i)
+            continue
+        
+        if BULLET_ITEM_PATTERN.match(line):
+            while i < len(lines):
+                match = BULLET_ITEM_PATTERN.match(lines[i])
+                if not match:
+                    break
+                blocks.append((BULLET, match.group(1)))
+                i += 1
+            continue
+        
+        if line.startswith('Instructions:'):
+            blocks.append((INSTRUCTIONS, line.replace('Instructions:', '').strip()))
+            i += 1
+            continue
+        
+        runs = []
+        for part in BOLD_PATTERN.split(line):
+            if part.startswith('**') and part.endswith('**'):
+                runs.append((part.replace('**', ''), True))
+            elif part:
+                runs.append((part, False))
+        blocks.append((PARAGRAPH, runs))
+        i = answer_line_follows(i + 1)
+    
+    return blocks
+
+def _run_xml(text: str, bold: bool = False, italic: bool = False, underline: bool = False) -> str:
+    properties = ('<w:b/>' if bold else '') + ('<w:i/>' if italic else '') + ('<w:u w:val="single"/>' if underline else '')
+    run_properties = f'<w:rPr>{properties}</w:rPr>' if properties else ''
+    if not text:
+        return f'<w:r>{run_properties}</w:r>'
+    text = escape(INVALID_XML_CHARS.sub('', text)).replace('\t', '</w:t><w:tab/><w:t xml:space="preserve">')
+    return f'<w:r>{run_properties}<w:t xml:space="preserve">{text}</w:t></w:r>'
+
+def _paragraph_xml(runs: str, style: str = None) -> str:
+    if style:
+        return f'<w:p><w:pPr><w:pStyle w:val="{style}"/></w:pPr>{runs}</w:p>'
+    return f'<w:p>{runs}</w:p>' if runs else '<w:p/>'
+
+def _block_xml(kind: str, payload) -> str:
+    if kind == ITEM:
+        return _paragraph_xml(_run_xml(payload))
+    if kind == ANSWER:
+        return _paragraph_xml(_run_xml(ANSWER_LINE, underline=True))
+    if kind == BLANK:
+        return _paragraph_xml('')
+    if kind == PARAGRAPH:
+        return _paragraph_xml(''.join(_run_xml(text, bold=bold) for text, bold in payload))
+    if kind == HEADING:
+        return _paragraph_xml(_run_xml(payload), style='Heading2')
+    if kind == BULLET:
+        return _paragraph_xml(_run_xml(payload), style='ListBullet')
+    if kind == INSTRUCTIONS:
+        return _paragraph_xml(_run_xml('Instructions: ', bold=True) + _run_xml(payload, italic=True))
+    raise ValueError(f"Unknown worksheet block: {kind}")
+
+class WorksheetTemplate:
+    """
+    Pre-built worksheet package that renders are cloned from.
+    The base document (margins, styles, the "Coding Cat Club" header, Name/Date
+    line and title) is built once with python-docx. Every other part of the
+    package is kept compressed in a base archive, so a render only writes the
+    document body and appends it to a copy of that archive.
+    """
+    
+    def __init__(self):
+        """Build the base worksheet"""
+        doc = Document()
+        for section in doc.sections:
+            section.top_margin = Inches(1)
+            section.bottom_margin = Inches(1)
+            section.left_margin = Inches(1)
+            section.right_margin = Inches(1)
+        
+        header = doc.add_heading('Coding Cat Club', 0)
+        header.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        grade_topic = doc.add_paragraph(_GRADE_TOPIC_MARKER)
+        grade_topic.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        name_date = doc.add_paragraph()
+        name_date.add_run('Name: ').bold = True
+        name_date.add_run('_' * 30)
+        name_date.add_run('    Date: ').bold = True
+        name_date.add_run('_' * 30)
+        
+        title = doc.add_heading('Lesson Worksheet', level=1)
+        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        doc.add_paragraph(_BODY_MARKER)
+        
+        package_buffer = BytesIO()
+        doc.save(package_buffer)
+        base_buffer = BytesIO()
+        with zipfile.ZipFile(package_buffer) as package, \
+                zipfile.ZipFile(base_buffer, 'w', zipfile.ZIP_DEFLATED) as base:
+            for info in package.infolist():
+                if info.filename == DOCUMENT_PART:
+                    document_xml = package.read(info).decode('utf-8')
+                else:
+                    base.writestr(info, package.read(info))
+        self._base_archive = base_buffer.getvalue()
+        
+        # Split the document around the body placeholder paragraph
+        marker_at = document_xml.index(_BODY_MARKER)
+        body_start = document_xml.rindex('<w:p>', 0, marker_at)
+        body_end = document_xml.index('</w:p>', marker_at) + len('</w:p>')
+        self._head = document_xml[:body_start]
+        self._tail = document_xml[body_end:]
+    
+    def render(self, grade: int, topics: List[str], blocks: List[Tuple[str, object]]) -> bytes:
+        """Render worksheet blocks into a complete .docx package"""
+        grade_topic = escape(INVALID_XML_CHARS.sub('', f"Grade {grade} — Topic: {', '.join(topics)}"))
+        document_xml = ''.join([
+            self._head.replace(_GRADE_TOPIC_MARKER, grade_topic, 1),
+            ''.join(_block_xml(kind, payload) for kind, payload in blocks),
+            self._tail
+        ])
+        
+        buffer = BytesIO(self._base_archive)
+        with zipfile.ZipFile(buffer, 'a') as package:
+            info = zipfile.ZipInfo(DOCUMENT_PART, date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            package.writestr(info, document_xml.encode('utf-8'))
+        return buffer.getvalue()
+
+_template = None
+_template_lock = threading.Lock()
+
+def get_template() -> WorksheetTemplate:
+    """Return the shared worksheet template, building it on first use"""
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = WorksheetTemplate()
+    return _template
+
+def render_docx(lesson: Lesson, grade: int, topics: List[str]) -> bytes:
+    """
+    Render a parsed lesson to DOCX bytes (picklable entry point for worker processes).
+    """
+    return get_template().render(grade, topics, worksheet_blocks(lesson))
+
+def create_docx_from_lesson(lesson_text: str, grade: int, topics: List[str]) -> BytesIO:
+    """
+    Create a Word document from lesson text with proper styling.
+    """
+    return BytesIO(render_docx(parse_lesson(lesson_text), grade, topics))
+
+def docx_filename(lesson: Dict) -> str:
+    """
+    Download filename for a lesson's worksheet.
+    """
+    topic_text = '_'.join(lesson['topics']).replace(' ', '_')
+    return f"Lesson_Grade{lesson['grade']}_{topic_text}.docx"
@@ -0,0 +1,231 @@
+import asyncio
+import math
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import openai
+
+# Local stand-in for the OpenAI chat API, selected with OPENAI_BACKEND=fake (see
+# openai_client.create_clients). It answers the prompts the app sends with
+# lesson-shaped text after a configurable delay, and can be told to fail, to
+# come back short on items, to return malformed lists or to use banned terms so
+# the regeneration and repair paths run without spending tokens.
+
+# Prompt kinds, told apart by the wording prompt_builder and lesson_pipeline use
+MAIN = "main"
+REGENERATE = "regenerate"
+TARGETED_FIX = "targeted-fix"
+SYNTHESIZE = "synthesize"
+
+TARGETED_PATTERN = re.compile(r'Regenerate ONLY Activity (\d+) for topic "(.*?)", exactly (\d+) items')
+SYNTHESIZE_PATTERN = re.compile(r'Generate exactly (\d+) more numbered items for Activity (\d+) about "(.*?)"')
+TOPIC_PATTERN = re.compile(r'grammar rule: "(.*?)"|provided topics: (.*?)\.')
+COUNT_PATTERN = re.compile(r'EXACTLY (\d+) numbered items')
+STRONGER_PROMPT_MARKER = "Your last output violated constraints"
+
+ERROR_KINDS = ("timeout", "connection", "server", "rate_limit")
+
+WORDS = ["dog", "teacher", "river", "garden", "library", "kitten", "bridge", "pencil", "island", "train"]
+VERBS = ["ran", "sat", "jumped", "sang", "read", "climbed", "found", "carried"]
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution into a sampler returning seconds:
+    "fixed:S", "uniform:LOW,HIGH", "lognormal:MEDIAN,SIGMA" or "exponential:MEAN".
+    """
+    name, _, args = spec.partition(":")
+    try:
+        values = [float(value) for value in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec: {spec}")
+    if name == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if name == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if name == "lognormal" and len(values) == 2:
+        mu = math.log(values[0]) if values[0] > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, values[1]) if values[0] > 0 else 0.0
+    if name == "exponential" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    raise ValueError(f"Invalid latency spec: {spec}")
+
+def classify_prompt(prompt: str) -> str:
+    """Which kind of call a prompt belongs to: MAIN, REGENERATE, TARGETED_FIX or SYNTHESIZE"""
+    if TARGETED_PATTERN.search(prompt):
+        return TARGETED_FIX
+    if SYNTHESIZE_PATTERN.search(prompt):
+        return SYNTHESIZE
+    if STRONGER_PROMPT_MARKER in prompt:
+        return REGENERATE
+    return MAIN
+
+class _FakeHTTPResponse:
+    # Just enough of an HTTP response for openai.APIStatusError and the rate limiter
+    def __init__(self, status_code: int, headers: Dict[str, str]):
+        self.status_code = status_code
+        self.headers = headers
+        self.request = None
+
+class FakeBackend:
+    """
+    Produces the responses (or errors) of the fake chat API.
+    Rates are per-call probabilities: error_rate raises a retryable error,
+    short_rate drops items from a list, malformed_rate returns a list without
+    numbering and banned_rate (main lessons only) mentions pictures.
+    """
+    
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0, short_rate: float = 0.0,
+                 malformed_rate: float = 0.0, banned_rate: float = 0.0, error_kinds: Tuple[str, ...] = ERROR_KINDS,
+                 seed: Optional[int] = None, stream_chunk_chars: int = 40):
+        """Initialize the fake backend"""
+        for kind in error_kinds:
+            if kind not in ERROR_KINDS:
+                raise ValueError(f"Unknown error kind: {kind}")
+        self.latency_spec = latency
+        self._sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.short_rate = short_rate
+        self.malformed_rate = malformed_rate
+        self.banned_rate = banned_rate
+        self.error_kinds = tuple(error_kinds)
+        self.stream_chunk_chars = stream_chunk_chars
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {"calls": {}, "errors": 0, "short": 0, "malformed": 0, "banned": 0}
+    
+    @classmethod
+    def from_env(cls) -> "FakeBackend":
+        """Build a backend from the FAKE_OPENAI_* environment variables"""
+        seed = os.getenv("FAKE_OPENAI_SEED")
+        return cls(
+            latency=os.getenv("FAKE_OPENAI_LATENCY", "lognormal:1.0,0.5"),
+            error_rate=float(os.getenv("FAKE_OPENAI_ERROR_RATE", "0")),
+            short_rate=float(os.getenv("FAKE_OPENAI_SHORT_RATE", "0")),
+            malformed_rate=float(os.getenv("FAKE_OPENAI_MALFORMED_RATE", "0")),
+            banned_rate=float(os.getenv("FAKE_OPENAI_BANNED_RATE", "0")),
+            error_kinds=tuple(os.getenv("FAKE_OPENAI_ERROR_KINDS", ",".join(ERROR_KINDS)).split(",")),
+            seed=int(seed) if seed else None
+        )
+    
+    def client(self) -> SimpleNamespace:
+        """A stand-in for openai.OpenAI (chat.completions.create)"""
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self._create_sync)))
+    
+    def async_client(self) -> SimpleNamespace:
+        """A stand-in for openai.AsyncOpenAI (chat.completions.with_raw_response.create, optionally streamed)"""
+        raw = SimpleNamespace(create=self._create_async)
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(with_raw_response=raw)))
+    
+    def stats(self) -> Dict:
+        """Calls per prompt kind and how many were failed or degraded on purpose"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["calls"] = dict(self._stats["calls"])
+        return stats
+    
+    def respond(self, prompt: str) -> Tuple[float, str]:
+        """
+        Decide the outcome of one call: returns (latency, text), or raises the
+        injected error after counting it.
+        """
+        kind = classify_prompt(prompt)
+        with self._lock:
+            self._stats["calls"][kind] = self._stats["calls"].get(kind, 0) + 1
+            latency = max(0.0, self._sample_latency(self._rng))
+            if self._rng.random() < self.error_rate:
+                self._stats["errors"] += 1
+                raise self._error(self._rng.choice(self.error_kinds))
+            short = self._rng.random() < self.short_rate
+            malformed = self._rng.random() < self.malformed_rate
+            banned = kind in (MAIN, REGENERATE) and self._rng.random() < self.banned_rate
+            rng = random.Random(self._rng.random())
+            for name, flag in (("short", short), ("malformed", malformed), ("banned", banned)):
+                if flag:
+                    self._stats[name] += 1
+        
+        if kind == TARGETED_FIX:
+            activity, topic, count = TARGETED_PATTERN.search(prompt).groups()
+            return latency, self._items(rng, topic, int(count), short, malformed)
+        if kind == SYNTHESIZE:
+            count, activity, topic = SYNTHESIZE_PATTERN.search(prompt).groups()
+            return latency, self._items(rng, topic, int(count), False, malformed, first=1)
+        return latency, self._lesson(rng, prompt, short, malformed, banned)
+    
+    def _error(self, kind: str) -> Exception:
+        if kind == "timeout":
+            return openai.APITimeoutError(request=None)
+        if kind == "connection":
+            return openai.APIConnectionError(request=None)
+        if kind == "rate_limit":
+            response = _FakeHTTPResponse(429, {"retry-after": "1"})
+            return openai.RateLimitError("Rate limit reached (fake backend)", response=response, body=None)
+        return openai.InternalServerError("Server error (fake backend)", response=_FakeHTTPResponse(500, {}), body=None)
+    
+    def _items(self, rng: random.Random, topic: str, count: int, short: bool, malformed: bool, first: int = 1) -> str:
+        if short:
+            count = max(0, count - rng.randint(1, 2))
+        marker = (lambda n: "-") if malformed else (lambda n: f"{n}.")
+        return "\n".join(
+            f"{marker(n)} The {rng.choice(WORDS)} {rng.choice(VERBS)} ({topic.lower()})."
+            for n in range(first, first + count)
+        )
+    
+    def _lesson(self, rng: random.Random, prompt: str, short: bool, malformed: bool, banned: bool) -> str:
+        topic_match = TOPIC_PATTERN.search(prompt)
+        topic = (topic_match.group(1) or topic_match.group(2)) if topic_match else "Grammar"
+        counts = [int(count) for count in COUNT_PATTERN.findall(prompt)[:4]] or [6, 6, 6, 6]
+        degraded = rng.randrange(len(counts))
+        
+        lines = [f"**{topic}**", "**Explanation**",
+                 f"A short explanation of **{topic}**, with examples of {topic} in sentences."]
+        if banned:
+            lines.append("Draw a picture that shows the rule.")
+        for index, count in enumerate(counts):
+            lines += ["", f"**Activity Section {'ABCD'[index]}**", f"Instructions: Practise {topic}."]
+            lines.append(self._items(rng, topic, count, short and index == degraded, malformed and index == degraded))
+        return "\n".join(lines)
+    
+    def _completion(self, prompt: str, text: str) -> SimpleNamespace:
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+            usage=self._usage(prompt, text)
+        )
+    
+    def _usage(self, prompt: str, text: str) -> SimpleNamespace:
+        prompt_tokens, completion_tokens = len(prompt) // 4 + 1, len(text) // 4 + 1
+        return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                               total_tokens=prompt_tokens + completion_tokens)
+    
+    def _create_sync(self, messages: List[Dict], **kwargs) -> SimpleNamespace:
+        prompt = messages[-1]["content"]
+        latency, text = self.respond(prompt)
+        time.sleep(latency)
+        return self._completion(prompt, text)
+    
+    async def _create_async(self, messages: List[Dict], stream: bool = False, **kwargs) -> SimpleNamespace:
+        prompt = messages[-1]["content"]
+        latency, text = self.respond(prompt)
+        if not stream:
+            await asyncio.sleep(latency)
+            completion = self._completion(prompt, text)
+            return SimpleNamespace(headers={}, parse=lambda: completion)
+        
+        # The first chunk arrives after a fifth of the latency, the rest spread over the remainder
+        await asyncio.sleep(latency / 5)
+        pieces = [text[i:i + self.stream_chunk_chars] for i in range(0, len(text), self.stream_chunk_chars)]
+        delay = latency * 4 / 5 / max(1, len(pieces))
+        usage = self._usage(prompt, text)
+        
+        async def chunks():
+            for index, piece in enumerate(pieces):
+                if index:
+                    await asyncio.sleep(delay)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None)
+            yield SimpleNamespace(choices=[], usage=usage)
+        
+        return SimpleNamespace(headers={}, parse=chunks)
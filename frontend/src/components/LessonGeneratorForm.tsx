@@ -13,8 +13,29 @@ interface LessonResponse {
   regenerated?: boolean;
   warnings?: string[];
   lessonId?: number;
+  grade?: string;
+  topic?: string;
 }
 
+interface StreamEvent {
+  event: string;
+  data: any;
+}
+
+// Parse one Server-Sent Events message ("event: ...\ndata: ...")
+const parseStreamEvent = (rawEvent: string): StreamEvent => {
+  let event = 'message';
+  const dataLines: string[] = [];
+  for (const line of rawEvent.split('\n')) {
+    if (line.startsWith('event:')) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith('data:')) {
+      dataLines.push(line.slice(5).trim());
+    }
+  }
+  return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : {} };
+};
+
 interface LessonGeneratorFormProps {
   onGenerate: (data: LessonResponse) => void;
   onError: (error: string) => void;
@@ -42,7 +63,7 @@ const LessonGeneratorForm: React.FC<LessonGeneratorFormProps> = ({ onGenerate, o
     setIsLoading(true);
     
     try {
-      const response = await fetch('http://localhost:8000/api/generate-lesson', {
+      const response = await fetch('http://localhost:8000/api/generate-lesson/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -60,14 +81,52 @@ const LessonGeneratorForm: React.FC<LessonGeneratorFormProps> = ({ onGenerate, o
         throw new Error(errorData.detail || 'Failed to generate lesson');
       }
 
-      const data = await response.json();
-      console.log('Generated lesson with ID:', data.lessonId); // Debug log
-      // Pass the lesson data along with the form data for the header
-      onGenerate({
-        ...data,
-        grade: formData.grade,
-        topic: topicString
-      });
+      if (!response.body) {
+        throw new Error('Streaming responses are not supported by this browser');
+      }
+
+      // Show the lesson as it streams in; the "done" event carries the repaired lesson and its ID
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let streamedText = '';
+      let finished = false;
+
+      while (!finished) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const rawEvents = buffer.split('\n\n');
+        buffer = rawEvents.pop() ?? '';
+
+        for (const rawEvent of rawEvents) {
+          const { event, data } = parseStreamEvent(rawEvent);
+
+          if (event === 'token') {
+            streamedText += data.text;
+            onGenerate({ lessonText: streamedText, grade: formData.grade, topic: topicString });
+          } else if (event === 'reset') {
+            streamedText = '';
+            onGenerate({ lessonText: '', grade: formData.grade, topic: topicString });
+          } else if (event === 'done') {
+            console.log('Generated lesson with ID:', data.lessonId); // Debug log
+            // Pass the lesson data along with the form data for the header
+            onGenerate({
+              ...data,
+              grade: formData.grade,
+              topic: topicString
+            });
+            finished = true;
+          } else if (event === 'error') {
+            throw new Error(data.detail || 'Failed to generate lesson');
+          }
+        }
+      }
+
+      if (!finished) {
+        throw new Error('The lesson stream ended unexpectedly');
+      }
     } catch (error) {
       console.error('Error generating lesson:', error);
       let errorMessage = 'An unexpected error occurred';
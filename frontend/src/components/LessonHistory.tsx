@@ -21,33 +21,51 @@ interface LessonDetail {
 
 interface LessonsListResponse {
   lessons: LessonSummary[];
-  total: number;
+  total: number | null;
+  next_cursor: string | null;
 }
 
+const PAGE_SIZE = 20;
+
 const LessonHistory: React.FC = () => {
   const [lessons, setLessons] = useState<LessonSummary[]>([]);
   const [selectedLesson, setSelectedLesson] = useState<LessonDetail | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [loadingDetail, setLoadingDetail] = useState(false);
+  const [total, setTotal] = useState<number | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
-  // Fetch all lessons on component mount
+  // Fetch the first page of lessons on component mount
   useEffect(() => {
     fetchLessons();
   }, []);
 
+  const fetchPage = async (cursor: string | null): Promise<LessonsListResponse> => {
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (cursor) {
+      params.set('cursor', cursor);
+    } else {
+      params.set('include_total', 'true');
+    }
+    
+    const response = await fetch(`http://localhost:8000/api/lessons?${params}`);
+    if (!response.ok) {
+      throw new Error(`Failed to fetch lessons: ${response.status}`);
+    }
+    return response.json();
+  };
+
   const fetchLessons = async () => {
     try {
       setLoading(true);
       setError('');
       
-      const response = await fetch('http://localhost:8000/api/lessons');
-      if (!response.ok) {
-        throw new Error(`Failed to fetch lessons: ${response.status}`);
-      }
-      
-      const data: LessonsListResponse = await response.json();
+      const data = await fetchPage(null);
       setLessons(data.lessons);
+      setTotal(data.total);
+      setNextCursor(data.next_cursor);
     } catch (err) {
       console.error('Error fetching lessons:', err);
       setError(err instanceof Error ? err.message : 'Failed to fetch lessons');
@@ -56,6 +74,24 @@ const LessonHistory: React.FC = () => {
     }
   };
 
+  const fetchMoreLessons = async () => {
+    if (!nextCursor) {
+      return;
+    }
+    try {
+      setLoadingMore(true);
+      
+      const data = await fetchPage(nextCursor);
+      setLessons((current) => [...current, ...data.lessons]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      console.error('Error fetching more lessons:', err);
+      setError(err instanceof Error ? err.message : 'Failed to fetch lessons');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchLessonDetail = async (lessonId: number) => {
     try {
       setLoadingDetail(true);
@@ -174,7 +210,7 @@ const LessonHistory: React.FC = () => {
       <div className="flex justify-between items-center">
         <h2 className="text-2xl font-bold text-gray-800">Lesson History</h2>
         <div className="text-sm text-gray-600">
-          {lessons.length} lesson{lessons.length !== 1 ? 's' : ''} total
+          {total ?? lessons.length} lesson{(total ?? lessons.length) !== 1 ? 's' : ''} total
         </div>
       </div>
 
@@ -226,6 +262,17 @@ const LessonHistory: React.FC = () => {
               </li>
             ))}
           </ul>
+          {nextCursor && (
+            <div className="px-6 py-4 border-t border-gray-200 text-center">
+              <button
+                onClick={fetchMoreLessons}
+                disabled={loadingMore}
+                className="text-blue-600 hover:text-blue-800 transition-colors disabled:text-gray-400"
+              >
+                {loadingMore ? 'Loading...' : `Load more (showing ${lessons.length}${total !== null ? ` of ${total}` : ''})`}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -6,10 +6,25 @@ from prompt_builder import build_grammar_lesson_prompt, build_multi_rule_grammar
 from openai_client import generate_lesson
 from database import LessonDatabase
 
-def load_grade_topics():
+# Locations searched for grade_topics.json; the frontend's copy is the one the web app uses
+GRADE_TOPICS_PATHS = [
+    'grade_topics.json',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'frontend', 'src', 'data', 'grade_topics.json'),
+]
+
+def positive_int(value: str) -> int:
+    """argparse type for options that must be a whole number of at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+def load_grade_topics(path=None):
     """Load curriculum-aligned topics for each grade from grade_topics.json"""
+    candidates = [path] if path else GRADE_TOPICS_PATHS
+    found = next((candidate for candidate in candidates if os.path.exists(candidate)), candidates[0])
     try:
-        with open('grade_topics.json', 'r', encoding='utf-8') as f:
+        with open(found, 'r', encoding='utf-8') as f:
             return json.load(f)
     except FileNotFoundError:
         print("Warning: grade_topics.json not found. Curriculum-aligned suggestions will not be available.")
@@ -88,15 +103,20 @@ def prompt_save_lesson(db: LessonDatabase, topics: list, grade_level: int, lesso
         else:
             print("Please enter 'y' for yes or 'n' for no.")
 
-def list_lessons(db: LessonDatabase):
-    """List all saved lessons with summary information"""
-    lessons = db.list_lessons()
+def list_lessons(db: LessonDatabase, limit: int = 20, cursor: str = None):
+    """List saved lessons with summary information, one page at a time"""
+    try:
+        page = db.list_lessons_page(limit=limit, cursor=cursor, include_total=True)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    lessons = page['lessons']
     
     if not lessons:
         print("No lessons found in the database.")
         return
     
-    print(f"\n📚 Found {len(lessons)} saved lesson(s):")
+    print(f"\n📚 Found {page['total']} saved lesson(s), showing {len(lessons)}:")
     print("=" * 80)
     print(f"{'ID':<4} {'Grade':<6} {'Age':<4} {'Date Generated':<20} {'Topics'}")
     print("=" * 80)
@@ -110,6 +130,9 @@ def list_lessons(db: LessonDatabase):
         date_str = lesson['date_generated'][:19]  # Truncate to remove microseconds
         
         print(f"{lesson['id']:<4} {lesson['grade']:<6} {age_str:<4} {date_str:<20} {topics_str}")
+    
+    if page['next_cursor']:
+        print(f"\nMore lessons: python generate_lesson.py --list --limit {limit} --cursor {page['next_cursor']}")
 
 def view_lesson(db: LessonDatabase, lesson_id: int):
     """Display the full content of a saved lesson"""
@@ -134,8 +157,8 @@ def view_lesson(db: LessonDatabase, lesson_id: int):
     print(lesson['lesson_text'])
 
 def search_lessons(db: LessonDatabase, keyword: str):
-    """Search lessons by keyword"""
-    lessons = db.search_lessons(keyword)
+    """Full-text search of saved lessons, best matches first (every match is listed)"""
+    lessons = db.search_lessons(keyword, limit=None)
     
     if not lessons:
         print(f"No lessons found matching '{keyword}'.")
@@ -155,6 +178,8 @@ def search_lessons(db: LessonDatabase, keyword: str):
         date_str = lesson['date_generated'][:19]  # Truncate to remove microseconds
         
         print(f"{lesson['id']:<4} {lesson['grade']:<6} {age_str:<4} {date_str:<20} {topics_str}")
+        if lesson['snippet']:
+            print(f"     {' '.join(lesson['snippet'].split())}")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -168,11 +193,13 @@ Examples:
   python generate_lesson.py "Adjectives" "Adverbs" --section-b-questions 4 --section-c-questions 3
   python generate_lesson.py "Prepositions" --age 10 --section-d-questions 5
   python generate_lesson.py --grade 4  # Interactive topic selection with curriculum suggestions
-
+  
   # Database operations
-  python generate_lesson.py --list  # List all saved lessons
+  python generate_lesson.py --list  # List the 20 most recent saved lessons
+  python generate_lesson.py --list --limit 50  # List 50 per page
   python generate_lesson.py --view 5  # View lesson with ID 5
   python generate_lesson.py --search "nouns"  # Search lessons containing "nouns"
+  python generate_lesson.py --search '"common noun" verb*'  # Phrase and prefix search
 
 Note: When specifying only a grade without topics, the app will display curriculum-aligned 
 suggestions from grade_topics.json and allow interactive selection. You can also enter 
@@ -236,7 +263,20 @@ custom topics or select from the suggestions by number.
     parser.add_argument(
         "--list",
         action="store_true",
-        help="List all saved lessons with summary information"
+        help="List saved lessons with summary information, newest first"
+    )
+    
+    parser.add_argument(
+        "--limit",
+        type=positive_int,
+        default=20,
+        help="Lessons per page for --list (default: 20)"
+    )
+    
+    parser.add_argument(
+        "--cursor",
+        type=str,
+        help="Continue --list after a previous page (printed at the end of each page)"
     )
     
     parser.add_argument(
@@ -250,7 +290,7 @@ custom topics or select from the suggestions by number.
         "--search",
         type=str,
         metavar="KEYWORD",
-        help="Search lessons by keyword in topics, content, or tags"
+        help="Full-text search of topics, content and tags (supports \"phrases\" and prefix*)"
     )
     
     args = parser.parse_args()
@@ -260,7 +300,7 @@ custom topics or select from the suggestions by number.
     
     # Handle database operations first
     if args.list:
-        list_lessons(db)
+        list_lessons(db, args.limit, args.cursor)
         return
     
     if args.view:
@@ -324,13 +364,13 @@ custom topics or select from the suggestions by number.
         prompt = build_grammar_lesson_prompt(topics[0], lesson_config)
     else:
         prompt = build_multi_rule_grammar_lesson_prompt(topics, lesson_config)
-
+    
     print("\nGenerating lesson(s) from OpenAI...")
     lesson = generate_lesson(prompt)
-
+    
     print("\nGenerated Lesson(s):\n")
     print(lesson)
-
+    
     # Write output to file
     output_filename = "lesson_output.txt"
     with open(output_filename, "w", encoding="utf-8") as f:
@@ -0,0 +1,274 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from database import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# A running job belongs to the worker that claimed it until its lease runs out.
+# Leases are renewed while the job runs, so only jobs whose process died (or
+# hung) are taken over by another queue.
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# handler(payload, set_stage) -> result
+JobHandler = Callable[[Dict, Callable[[str], None]], Awaitable[Dict]]
+
+class JobQueue:
+    """
+    Persistent queue of background jobs processed by a pool of asyncio workers.
+    Jobs are stored in the generation_jobs table (by default in lessons.db), so
+    queued jobs survive a restart. A worker claims a job atomically and holds a
+    lease on it while it runs; jobs whose lease expires (their process stopped)
+    are requeued, so several processes can share one database.
+    SQLite work runs on one thread of its own, in order, off the event loop.
+    """
+    
+    def __init__(self, handler: JobHandler, db_path: str = "lessons.db", workers: int = 2,
+                 lease_seconds: float = JOB_LEASE_SECONDS):
+        """Initialize the job queue"""
+        self.handler = handler
+        self.db_path = db_path
+        self.worker_count = max(1, workers)
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._pool = ConnectionPool(db_path)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-queue-db")
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._reaper: Optional[asyncio.Task] = None
+        self.accepting = False
+        self.init_jobs_table()
+    
+    def init_jobs_table(self):
+        """Create the generation_jobs table if it doesn't exist"""
+        with self._pool.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS generation_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at TIMESTAMP NOT NULL,
+                    updated_at TIMESTAMP NOT NULL
+                )
+            ''')
+            # Owner and lease of running jobs, added to tables created before leases existed
+            columns = {row[1] for row in cursor.execute('PRAGMA table_info(generation_jobs)')}
+            if 'worker_id' not in columns:
+                cursor.execute('ALTER TABLE generation_jobs ADD COLUMN worker_id TEXT')
+            if 'lease_expires_at' not in columns:
+                cursor.execute('ALTER TABLE generation_jobs ADD COLUMN lease_expires_at REAL')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_generation_jobs_status
+                ON generation_jobs (status, created_at)
+            ''')
+            conn.commit()
+    
+    async def _run_db(self, function: Callable, *args, **kwargs) -> Any:
+        # Run a blocking SQLite call on the queue's database thread
+        return await asyncio.wrap_future(self._executor.submit(function, *args, **kwargs))
+    
+    async def start(self):
+        """Requeue jobs whose worker went away, queue every waiting job and start the workers"""
+        self._queue = asyncio.Queue()
+        await self._run_db(self._requeue_expired)
+        pending = await self._run_db(self._queued_ids)
+        for job_id in pending:
+            self._queue.put_nowait(job_id)
+        if pending:
+            logger.info(f"Resuming {len(pending)} queued job(s)")
+        
+        self._workers = [asyncio.create_task(self._worker(n)) for n in range(self.worker_count)]
+        self._reaper = asyncio.create_task(self._reap_expired())
+        self.accepting = True
+    
+    async def shutdown(self, timeout: float = 30.0):
+        """
+        Stop accepting jobs and let the workers drain the queue for up to timeout
+        seconds. Jobs still queued or running after that go back to the queue
+        table and are picked up on the next start().
+        """
+        self.accepting = False
+        if self._queue is None:
+            return
+        
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Job queue did not drain within {timeout}s; remaining jobs resume on restart")
+        
+        tasks = self._workers + ([self._reaper] if self._reaper else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._reaper = None
+    
+    async def submit(self, payload: Dict) -> str:
+        """Store a new job and queue it. Returns the job ID."""
+        if not self.accepting:
+            raise RuntimeError("Job queue is not accepting new jobs")
+        
+        job_id = uuid.uuid4().hex
+        await self._run_db(self._insert, job_id, payload)
+        self._queue.put_nowait(job_id)
+        return job_id
+    
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        """Retrieve a job's status, stage and result by ID"""
+        return await self._run_db(self._select, job_id)
+    
+    async def stats(self) -> Dict:
+        """Return the number of jobs in each status and the in-memory queue depth"""
+        counts = await self._run_db(self._status_counts)
+        return {
+            "workers": len(self._workers),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            **{status: counts.get(status, 0) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+        }
+    
+    def _status_counts(self) -> Dict[str, int]:
+        cursor = self._pool.connect().execute('SELECT status, COUNT(*) FROM generation_jobs GROUP BY status')
+        return dict(cursor.fetchall())
+    
+    def _insert(self, job_id: str, payload: Dict):
+        now = datetime.now().isoformat()
+        with self._pool.connect() as conn:
+            conn.execute('''
+                INSERT INTO generation_jobs (id, status, stage, payload, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (job_id, QUEUED, None, json.dumps(payload), now, now))
+    
+    def _select(self, job_id: str) -> Optional[Dict]:
+        cursor = self._pool.connect().execute('''
+            SELECT id, status, stage, payload, result, error, created_at, updated_at
+            FROM generation_jobs WHERE id = ?
+        ''', (job_id,))
+        row = cursor.fetchone()
+        if row:
+            return {
+                'id': row[0],
+                'status': row[1],
+                'stage': row[2],
+                'payload': json.loads(row[3]),
+                'result': json.loads(row[4]) if row[4] else None,
+                'error': row[5],
+                'created_at': row[6],
+                'updated_at': row[7]
+            }
+        return None
+    
+    def _requeue_expired(self) -> List[str]:
+        # Put running jobs whose lease has run out back in the queue; returns their IDs
+        with self._pool.connect() as conn:
+            cursor = conn.execute('''
+                UPDATE generation_jobs
+                SET status = ?, stage = ?, worker_id = NULL, lease_expires_at = NULL, updated_at = ?
+                WHERE status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                RETURNING id
+            ''', (QUEUED, "requeued", datetime.now().isoformat(), RUNNING, time.time()))
+            return [row[0] for row in cursor.fetchall()]
+    
+    def _queued_ids(self) -> List[str]:
+        cursor = self._pool.connect().execute(
+            'SELECT id FROM generation_jobs WHERE status = ? ORDER BY created_at', (QUEUED,)
+        )
+        return [row[0] for row in cursor.fetchall()]
+    
+    def _claim(self, job_id: str) -> Optional[Dict]:
+        # Take a queued job in one statement; None if another worker got it first
+        with self._pool.connect() as conn:
+            cursor = conn.execute('''
+                UPDATE generation_jobs
+                SET status = ?, stage = ?, worker_id = ?, lease_expires_at = ?, updated_at = ?
+                WHERE id = ? AND status = ?
+            ''', (RUNNING, "started", self.worker_id, time.time() + self.lease_seconds,
+                  datetime.now().isoformat(), job_id, QUEUED))
+            if cursor.rowcount != 1:
+                return None
+        return self._select(job_id)
+    
+    def _update(self, job_id: str, **fields: Any):
+        # Update a job this worker holds, renewing its lease; a job taken over
+        # after its lease ran out is left to its new owner
+        fields["updated_at"] = datetime.now().isoformat()
+        if fields.get("status", RUNNING) == RUNNING:
+            fields["lease_expires_at"] = time.time() + self.lease_seconds
+        else:
+            fields["lease_expires_at"] = None
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._pool.connect() as conn:
+            conn.execute(
+                f'UPDATE generation_jobs SET {assignments} WHERE id = ? AND status = ? AND worker_id = ?',
+                (*fields.values(), job_id, RUNNING, self.worker_id)
+            )
+    
+    async def _reap_expired(self):
+        # Take over jobs left running by a worker that stopped renewing its lease
+        while True:
+            await asyncio.sleep(self.lease_seconds / 2)
+            try:
+                requeued = await self._run_db(self._requeue_expired)
+            except Exception as e:
+                logger.error(f"Requeueing expired jobs failed: {str(e)}")
+                continue
+            if requeued:
+                logger.warning(f"Took over {len(requeued)} job(s) whose worker stopped renewing its lease")
+            for job_id in requeued:
+                self._queue.put_nowait(job_id)
+    
+    async def _keep_lease(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self._run_db(self._update, job_id)
+    
+    async def _worker(self, worker_num: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except Exception as e:
+                logger.error(f"Job {job_id} could not be run: {str(e)}")
+            finally:
+                self._queue.task_done()
+    
+    async def _run_job(self, job_id: str):
+        job = await self._run_db(self._claim, job_id)
+        if job is None:
+            return
+        
+        def set_stage(stage: str):
+            # Queued behind earlier writes on the database thread, so stages land in order
+            self._executor.submit(self._update, job_id, stage=stage)
+        
+        lease = asyncio.create_task(self._keep_lease(job_id))
+        try:
+            result = await self.handler(job['payload'], set_stage)
+        except asyncio.CancelledError:
+            # Shutting down mid-job: hand it back so the next start() runs it again
+            self._executor.submit(self._update, job_id, status=QUEUED, stage="requeued", worker_id=None)
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            await self._run_db(self._update, job_id, status=FAILED, error=str(e))
+        else:
+            await self._run_db(self._update, job_id, status=SUCCEEDED, stage="done", result=json.dumps(result))
+        finally:
+            lease.cancel()
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from database import ConnectionPool
+
+class LessonCache:
+    """
+    Persistent, content-addressed cache of generated lessons.
+    Entries live in the lesson_cache table (by default next to the lessons table in
+    lessons.db) and are keyed by a hash of the prompt plus the model parameters.
+    Eviction is least-recently-used once max_entries is exceeded, and entries older
+    than ttl_seconds are treated as misses. Each thread reuses one connection, so
+    the methods can be called from worker threads to keep them off the event loop.
+    """
+    
+    def __init__(self, db_path: str = "lessons.db", max_entries: int = 1000,
+                 ttl_seconds: Optional[float] = 7 * 24 * 3600):
+        """Initialize the lesson cache"""
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._pool = ConnectionPool(db_path)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "stores": 0}
+        self.init_cache()
+    
+    def init_cache(self):
+        """Create the lesson_cache table if it doesn't exist"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS lesson_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_lesson_cache_last_accessed
+                ON lesson_cache (last_accessed)
+            ''')
+            conn.commit()
+    
+    def _connect(self) -> sqlite3.Connection:
+        return self._pool.connect()
+    
+    def close(self):
+        """Close every connection opened by this cache"""
+        self._pool.close()
+    
+    @staticmethod
+    def make_key(prompt: str, model_params: Dict, **extra) -> str:
+        """Build a cache key from the prompt, the model parameters and any extra inputs"""
+        material = json.dumps(
+            {"prompt": prompt, "model_params": model_params, "extra": extra},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+    
+    def get(self, cache_key: str) -> Optional[Dict]:
+        """Return the cached value for a key, or None on a miss"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT payload, created_at FROM lesson_cache WHERE cache_key = ?',
+                (cache_key,)
+            )
+            row = cursor.fetchone()
+            
+            if row is None:
+                self._count("misses")
+                return None
+            
+            if self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                cursor.execute('DELETE FROM lesson_cache WHERE cache_key = ?', (cache_key,))
+                conn.commit()
+                self._count("expired")
+                self._count("misses")
+                return None
+            
+            cursor.execute('''
+                UPDATE lesson_cache SET last_accessed = ?, hit_count = hit_count + 1
+                WHERE cache_key = ?
+            ''', (now, cache_key))
+            conn.commit()
+        
+        self._count("hits")
+        return json.loads(row[0])
+    
+    def set(self, cache_key: str, value: Dict):
+        """Store a value and evict the least recently used entries beyond max_entries"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO lesson_cache (cache_key, payload, created_at, last_accessed, hit_count)
+                VALUES (?, ?, ?, ?, 0)
+            ''', (cache_key, json.dumps(value), now, now))
+            
+            cursor.execute('SELECT COUNT(*) FROM lesson_cache')
+            overflow = cursor.fetchone()[0] - self.max_entries
+            if overflow > 0:
+                cursor.execute('''
+                    DELETE FROM lesson_cache WHERE cache_key IN (
+                        SELECT cache_key FROM lesson_cache ORDER BY last_accessed ASC LIMIT ?
+                    )
+                ''', (overflow,))
+                self._count("evictions", cursor.rowcount)
+            conn.commit()
+        self._count("stores")
+    
+    def invalidate(self, cache_key: str) -> bool:
+        """Remove a single entry. Returns True if it existed."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM lesson_cache WHERE cache_key = ?', (cache_key,))
+            conn.commit()
+            return cursor.rowcount > 0
+    
+    def clear(self):
+        """Remove every cached entry"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM lesson_cache')
+            conn.commit()
+    
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current number of entries"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM lesson_cache')
+            entries = cursor.fetchone()[0]
+        
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        counters["entries"] = entries
+        counters["max_entries"] = self.max_entries
+        counters["ttl_seconds"] = self.ttl_seconds
+        return counters
+    
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
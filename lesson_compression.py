@@ -0,0 +1,48 @@
+import hashlib
+import zlib
+
+# Codec written for new lesson bodies. The name is stored next to every blob,
+# so a dictionary must never change once released: add a new codec instead.
+CURRENT_CODEC = "zlib-d1"
+
+# Preset dictionary of phrases that recur in generated worksheets. zlib can
+# reference it from the first byte, which matters for short texts like ours;
+# the most common strings go last (closest to the data).
+_DICTIONARY_V1 = "\n".join([
+    "Rule Explanation", "Explanation", "Examples:", "Example:", "Correct:", "Incorrect:",
+    "Instructions:", "Directions:", "Answer:", "Name: ____________________  Date: __________",
+    "none of the above", "Find the mistake", "error analysis", "Explain why",
+    "Rewrite the sentence correctly.", "Rewrite each sentence", "Correct the mistake in each sentence.",
+    "Fill in the blank with the correct", "Choose the correct word to complete the sentence.",
+    "Write a sentence using", "Write your own sentence", "Write a short story", "dialogue",
+    "Circle the", "Underline the", "Identify the", "Read each sentence", "Match each",
+    "statement", "question", "command", "exclamation", "declarative", "interrogative",
+    "imperative", "exclamatory", "punctuation", "capital letter", "period", "question mark",
+    "exclamation point", "comma", "apostrophe", "quotation marks",
+    "noun", "nouns", "pronoun", "pronouns", "verb", "verbs", "adjective", "adjectives",
+    "adverb", "adverbs", "preposition", "conjunction", "subject", "predicate", "tense",
+    "past tense", "present tense", "future tense", "plural", "singular", "possessive",
+    "the sentence", "in the sentence", "each sentence", "sentences", "sentence",
+    "______________________________________________",
+    "____________", "______",
+    "Activity 4\n1. ", "Activity 3\n1. ", "Activity 2\n1. ", "Activity 1\n1. ",
+    "Grammar — ",
+]).encode("utf-8")
+
+_DICTIONARIES = {"zlib-d1": _DICTIONARY_V1}
+
+def body_hash(text: str) -> str:
+    """Content hash used to store identical lesson bodies once"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def compress_body(text: str) -> bytes:
+    """Compress a lesson body with CURRENT_CODEC"""
+    compressor = zlib.compressobj(level=9, zdict=_DICTIONARIES[CURRENT_CODEC])
+    return compressor.compress(text.encode("utf-8")) + compressor.flush()
+
+def decompress_body(codec: str, data: bytes) -> str:
+    """Decompress a lesson body stored with the given codec"""
+    if codec not in _DICTIONARIES:
+        raise ValueError(f"Unknown lesson body codec: {codec}")
+    decompressor = zlib.decompressobj(zdict=_DICTIONARIES[codec])
+    return (decompressor.decompress(data) + decompressor.flush()).decode("utf-8")
@@ -0,0 +1,343 @@
+import re
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional
+
+# Patterns used by the lesson text cleaner
+BOLD_PATTERN = re.compile(r'\*\*(.*?)\*\*')
+ITALIC_PATTERN = re.compile(r'_(.*?)_')
+HEADING_PATTERN = re.compile(r'^#{1,3}\s*')
+# "Rule Heading" or "Rule X: ..." lines
+RULE_LINE_PATTERN = re.compile(r'^\s*Rule (?:Heading\s*$|\d+:)', re.IGNORECASE)
+# This pattern captures optional leading numbers for activity sections
+ACTIVITY_SECTION_PATTERN = re.compile(r'^\s*(?:\d+\.\s*)?(Activity|Section) Section [A-Z]\s*$', re.IGNORECASE)
+BULLET_PATTERN = re.compile(r'^\s*[-•]\s*') # For removing leading bullets
+
+# Patterns used to parse cleaned lessons
+NUMBERED_ITEM_PATTERN = re.compile(r'^\s*\d+\.\s')
+# An "Activity N" header (group 1) or a numbered item, in one match per line
+SECTION_LINE_PATTERN = re.compile(r'^\s*(?:Activity\s+(\d+)\s*$|\d+\.\s)', re.IGNORECASE)
+BANNED_TERMS_PATTERN = re.compile(r'\b(picture|draw|diagram|image|illustration)\b', re.IGNORECASE)
+
+# Activities a lesson is made of, in order
+ACTIVITY_NUMBERS = range(1, 5)
+
+
+@dataclass
+class Activity:
+    """One "Activity N" section of a lesson"""
+    number: int
+    content: str
+    item_count: int
+
+
+@dataclass
+class Lesson:
+    """
+    Structured form of a lesson: the text, its explanation and activities with
+    item counts, and (when parsed against a topic) banned terms and topic mentions.
+    """
+    text: str
+    explanation: str = ""
+    activities: Dict[int, Activity] = field(default_factory=dict)
+    topic: Optional[str] = None
+    banned_terms: List[str] = field(default_factory=list)
+    topic_mentions: int = 0
+    
+    @property
+    def sections(self) -> dict:
+        """The lesson as parse_lesson_sections returns it"""
+        return {
+            "explanation": self.explanation,
+            "activities": {number: activity.content for number, activity in self.activities.items()}
+        }
+    
+    @property
+    def item_counts(self) -> Dict[int, int]:
+        """Numbered items per activity"""
+        return {number: activity.item_count for number, activity in self.activities.items()}
+    
+    @property
+    def warnings(self) -> List[str]:
+        """Banned term and topic adherence warnings, as validate_lesson reports them"""
+        warnings = []
+        if self.banned_terms:
+            warnings.append(f"Found banned terms: {', '.join(set(self.banned_terms))}")
+        if self.topic is not None and self.topic_mentions < 2:
+            warnings.append(f"Topic '{self.topic}' only appears {self.topic_mentions} times")
+        return warnings
+    
+    @property
+    def is_valid(self) -> bool:
+        return not self.warnings
+    
+    def with_activity(self, number: int, content: str) -> "Lesson":
+        """Return a copy with one activity's content replaced"""
+        return self.with_activities({number: content})
+    
+    def with_activities(self, contents: Dict[int, str]) -> "Lesson":
+        """
+        Return a copy with the given activities' content replaced and the text
+        rebuilt once. Only the replaced activities are recounted; banned terms and
+        topic mentions still describe the text the lesson was parsed from.
+        """
+        activities = dict(self.activities)
+        for number, content in contents.items():
+            activities[number] = Activity(number, content, count_items(content.split('\n')))
+        updated = replace(self, activities=activities)
+        updated.text = updated.to_text()
+        return updated
+    
+    def to_text(self) -> str:
+        """Reassemble the lesson text from the explanation and activities"""
+        return assemble_lesson_text(
+            self.explanation, {number: activity.content for number, activity in self.activities.items()}
+        )
+
+
+def assemble_lesson_text(explanation: str, activities: Dict[int, str]) -> str:
+    """
+    Build lesson text from an explanation and activity contents by number.
+    Only ACTIVITY_NUMBERS are included, in order; this is the one place lesson
+    text is reassembled, for repairs and for stored sections alike.
+    """
+    parts = [explanation]
+    for number in ACTIVITY_NUMBERS:
+        if number in activities:
+            parts.append(f"Activity {number}\n{activities[number]}")
+    return "\n\n".join(parts).strip()
+
+
+def count_items(lines: List[str]) -> int:
+    """Count the numbered ("1. ...") lines"""
+    return sum(1 for line in lines if NUMBERED_ITEM_PATTERN.match(line))
+
+
+class _SectionBuilder:
+    # Splits lines into the explanation and "Activity N" sections as they arrive,
+    # counting numbered items along the way
+    
+    def __init__(self):
+        self.explanation = ""
+        self.activities = {}
+        self._number = None
+        self._lines = []
+        self._items = 0
+    
+    def add(self, line: str):
+        match = SECTION_LINE_PATTERN.match(line)
+        if match and match.group(1):
+            self._close()
+            self._number = int(match.group(1))
+            return
+        self._lines.append(line)
+        if match:
+            self._items += 1
+    
+    def finish(self):
+        self._close()
+    
+    def _close(self):
+        content = '\n'.join(self._lines).strip()
+        if self._number is None:
+            self.explanation = content
+        else:
+            self.activities[self._number] = Activity(self._number, content, self._items)
+        self._lines = []
+        self._items = 0
+
+
+class _TopicChecker:
+    # Collects banned terms and topic mentions. Neither can span a line break, so
+    # any run of whole lines can be checked at once
+    
+    def __init__(self, topic: str):
+        self.topic = topic
+        self.topic_pattern = re.compile(re.escape(topic), re.IGNORECASE)
+        self.banned_terms = []
+        self.topic_mentions = 0
+    
+    def check(self, text: str):
+        self.banned_terms.extend(BANNED_TERMS_PATTERN.findall(text))
+        self.topic_mentions += len(self.topic_pattern.findall(text))
+
+
+def parse_lesson(text: str, topic: Optional[str] = None) -> Lesson:
+    """
+    Parse already-cleaned lesson text into a Lesson in one pass over its lines.
+    With a topic, banned terms and topic mentions are collected too.
+    """
+    sections = _SectionBuilder()
+    for line in text.split('\n'):
+        sections.add(line)
+    sections.finish()
+    checker = _TopicChecker(topic) if topic is not None else None
+    if checker:
+        checker.check(text)
+    
+    return Lesson(
+        text=text,
+        explanation=sections.explanation,
+        activities=sections.activities,
+        topic=topic,
+        banned_terms=checker.banned_terms if checker else [],
+        topic_mentions=checker.topic_mentions if checker else 0
+    )
+
+
+class LessonTextCleaner:
+    """
+    Incremental version of clean_lesson_text.
+    Feed raw model output in arbitrary chunks; each call returns the cleaned text
+    that is safe to emit so far. Concatenating every feed() result and finish()
+    gives exactly clean_lesson_text(full_text, subject, topic).
+    """
+    
+    def __init__(self, subject: str, topic: str):
+        self.topic_pattern = re.compile(r'^\s*' + re.escape(topic) + r'\s*$', re.IGNORECASE)
+        self.activity_counter = 0
+        self.rule_section_processed = False
+        self._buffer = ""
+        self._emitted_any = False
+        self._pending_blank = None
+        
+        # Add clean title at the top (the topic is part of it, so it is never repeated below)
+        self._title_lines = [f"{subject} — {topic}", ""]
+    
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk of raw text and return newly cleaned output"""
+        self._buffer += chunk
+        if '\n' not in self._buffer:
+            return self._emit(self._take_title())
+        *complete, self._buffer = self._buffer.split('\n')
+        self._consumed(complete)
+        out_lines = self._take_title()
+        for line in complete:
+            out_lines.extend(self._clean_line(line))
+        return self._emit(out_lines)
+    
+    def finish(self) -> str:
+        """Flush the last partial line; trailing blank lines are dropped"""
+        self._consumed([self._buffer])
+        out_lines = self._take_title() + self._clean_line(self._buffer)
+        self._buffer = ""
+        return self._emit(out_lines)
+    
+    def _take_title(self) -> List[str]:
+        lines, self._title_lines = self._title_lines, []
+        return lines
+    
+    def _clean_line(self, line: str) -> List[str]:
+        # Remove markdown formatting first (skipping substitutions that cannot match)
+        if '**' in line:
+            line = BOLD_PATTERN.sub(r'\1', line)
+        if '_' in line:
+            line = ITALIC_PATTERN.sub(r'\1', line)
+        if line.startswith('#'):
+            line = HEADING_PATTERN.sub('', line)
+        
+        # 1. Handle "Rule Heading" and "Rule X:" replacement
+        if RULE_LINE_PATTERN.match(line):
+            if not self.rule_section_processed:
+                self.rule_section_processed = True
+                return ["Explanation", ""]
+            return [] # Skip the original rule line
+        
+        # 2. Remove any standalone line that equals the topic (case-insensitive) if it appears again near the top
+        if self.topic_pattern.match(line):
+            return [] # Skip duplicate topic lines
+        
+        # 3. Handle Activity Section renaming and remove leading numbers
+        if ACTIVITY_SECTION_PATTERN.match(line):
+            self.activity_counter += 1
+            return [f"Activity {self.activity_counter}", ""]
+        
+        # 4. Remove leading "-" or "•" from list items
+        return [BULLET_PATTERN.sub('', line)]
+    
+    def _emit(self, lines: List[str]) -> str:
+        # 5. Allow at most one blank line in a row, and never a leading or trailing one.
+        # A blank line is held back until the next non-blank line proves it is not trailing.
+        out = []
+        for line in lines:
+            if not line.strip():
+                if (self._emitted_any or out) and self._pending_blank is None:
+                    self._pending_blank = line
+                continue
+            if self._pending_blank is not None:
+                out.append(self._pending_blank)
+                self._pending_blank = None
+            out.append(line)
+        if not out:
+            return ""
+        self._emitted(out)
+        text = '\n'.join(out)
+        if self._emitted_any:
+            text = '\n' + text
+        self._emitted_any = True
+        return text
+    
+    def _consumed(self, lines: List[str]):
+        # Hook for subclasses that inspect the raw lines before cleaning
+        pass
+    
+    def _emitted(self, lines: List[str]):
+        # Hook for subclasses that consume the cleaned lines
+        pass
+
+
+class LessonTokenizer(LessonTextCleaner):
+    """
+    Single-pass lesson post-processing: cleans raw model output like
+    LessonTextCleaner while checking banned terms and topic mentions on the raw
+    lines and splitting the cleaned lines into sections with item counts.
+    After finish(), lesson() returns the structured Lesson.
+    """
+    
+    def __init__(self, subject: str, topic: str):
+        super().__init__(subject, topic)
+        self._checker = _TopicChecker(topic)
+        self._sections = _SectionBuilder()
+        self._text_parts = []
+    
+    def feed(self, chunk: str) -> str:
+        return self._keep(super().feed(chunk))
+    
+    def finish(self) -> str:
+        return self._keep(super().finish())
+    
+    def lesson(self) -> Lesson:
+        """The structured lesson; call once the raw text has been fully fed and finished"""
+        self._sections.finish()
+        return Lesson(
+            text=''.join(self._text_parts),
+            explanation=self._sections.explanation,
+            activities=self._sections.activities,
+            topic=self._checker.topic,
+            banned_terms=self._checker.banned_terms,
+            topic_mentions=self._checker.topic_mentions
+        )
+    
+    def _keep(self, text: str) -> str:
+        if text:
+            self._text_parts.append(text)
+        return text
+    
+    def _consumed(self, lines: List[str]):
+        self._checker.check('\n'.join(lines))
+    
+    def _emitted(self, lines: List[str]):
+        for line in lines:
+            self._sections.add(line)
+
+
+def tokenize_lesson(raw_text: str, subject: str, topic: str) -> Lesson:
+    """
+    Clean raw model output and parse it into a Lesson in a single pass.
+    The result's text equals clean_lesson_text(raw_text, subject, topic).
+    """
+    if not raw_text:
+        return parse_lesson(raw_text, topic)
+    tokenizer = LessonTokenizer(subject, topic)
+    tokenizer.feed(raw_text)
+    tokenizer.finish()
+    return tokenizer.lesson()
@@ -0,0 +1,355 @@
+import asyncio
+import logging
+import os
+import re
+from typing import Callable, List, Optional
+
+from lesson_parser import (
+    ACTIVITY_NUMBERS,
+    NUMBERED_ITEM_PATTERN,
+    BANNED_TERMS_PATTERN,
+    Lesson,
+    LessonTextCleaner,
+    count_items,
+    parse_lesson,
+    tokenize_lesson,
+)
+from metrics import REGENERATIONS, REPAIR_ATTEMPTS, STAGE_SECONDS
+from openai_client import generate_lesson_async
+from rate_limiter import REPAIR
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of activity repairs allowed to run at the same time
+REPAIR_CONCURRENCY = int(os.getenv("REPAIR_CONCURRENCY", "4"))
+
+
+def clean_lesson_text(text: str, subject: str, topic: str) -> str:
+    """
+    Clean lesson text by removing markdown formatting, placeholder headings,
+    and adding a clean title.
+    """
+    if not text:
+        return text
+    
+    cleaner = LessonTextCleaner(subject, topic)
+    return cleaner.feed(text) + cleaner.finish()
+
+
+def parse_lesson_sections(text: str) -> dict:
+    """
+    Parse lesson text into sections: explanation and activities.
+    Returns {"explanation": str, "activities": {1: str, 2: str, 3: str, 4: str}}
+    """
+    return parse_lesson(text).sections
+
+
+def count_numbered_items(block: str) -> int:
+    """
+    Count numbered items in a text block using regex pattern.
+    """
+    if not block:
+        return 0
+    
+    # Lines that start with optional whitespace, then number, dot, space
+    return count_items(block.split('\n'))
+
+
+def validate_counts(sections, config: dict) -> dict:
+    """
+    Validate that each activity has the expected number of items.
+    Accepts a Lesson (whose item counts are already known) or the sections dict
+    from parse_lesson_sections.
+    Returns dict with per-activity actual vs expected counts and overall 'ok' status.
+    """
+    if isinstance(sections, Lesson):
+        item_counts = sections.item_counts
+    else:
+        item_counts = {
+            act_num: count_numbered_items(content) for act_num, content in sections["activities"].items()
+        }
+    
+    validation_result = {
+        "ok": True,
+        "activities": {},
+        "summary": {}
+    }
+    
+    expected_counts = {
+        1: config.get("section_a_questions", 6),
+        2: config.get("section_b_questions", 6),
+        3: config.get("section_c_questions", 6),
+        4: config.get("section_d_questions", 6)
+    }
+    
+    for activity_num in ACTIVITY_NUMBERS:
+        actual_count = item_counts.get(activity_num, 0)
+        expected_count = expected_counts[activity_num]
+        
+        validation_result["activities"][activity_num] = {
+            "actual": actual_count,
+            "expected": expected_count,
+            "match": actual_count == expected_count
+        }
+        
+        if actual_count != expected_count:
+            validation_result["ok"] = False
+    
+    # Add summary
+    validation_result["summary"] = {
+        "total_activities": len(item_counts),
+        "matching_activities": sum(1 for act in validation_result["activities"].values() if act["match"]),
+        "total_expected": sum(expected_counts.values()),
+        "total_actual": sum(act["actual"] for act in validation_result["activities"].values())
+    }
+    
+    return validation_result
+
+
+def generate_targeted_activity_prompt(topic: str, activity_num: int, expected_count: int) -> str:
+    """
+    Generate a targeted prompt for regenerating a specific activity.
+    """
+    return f"""Regenerate ONLY Activity {activity_num} for topic "{topic}", exactly {expected_count} items, each on its own line starting '1.' to '{expected_count}.' No extra text.
+
+Example format:
+1. [First item]
+2. [Second item]
+3. [Third item]
+...
+{expected_count}. [Last item]
+
+Topic: {topic}
+Activity {activity_num}:"""
+
+
+def extract_numbered_items(block: str) -> List[str]:
+    """
+    Return the stripped numbered lines ("1. ...") of a text block.
+    """
+    return [line.strip() for line in block.split('\n') if NUMBERED_ITEM_PATTERN.match(line.strip())]
+
+
+async def regenerate_activity_items(topic: str, activity_num: int, expected_count: int,
+                                    current_content: str, max_attempts: int = 2) -> str:
+    """
+    Regenerate the items of a single activity and return the new activity content.
+    Falls back to synthesizing the missing items if every attempt has the wrong count.
+    """
+    logger.info(f"Attempting to fix Activity {activity_num} (expected: {expected_count} items)")
+    
+    for attempt in range(max_attempts):
+        try:
+            # Generate targeted prompt
+            targeted_prompt = generate_targeted_activity_prompt(topic, activity_num, expected_count)
+            
+            # Generate new activity content
+            REPAIR_ATTEMPTS.inc(activity=activity_num)
+            new_activity_content = await generate_lesson_async(targeted_prompt, priority=REPAIR, call_type="targeted-fix")
+            
+            # Clean up the generated content (remove any extra text)
+            cleaned_lines = [line for line in new_activity_content.split('\n') if NUMBERED_ITEM_PATTERN.match(line.strip())]
+            
+            if len(cleaned_lines) == expected_count:
+                logger.info(f"Successfully fixed Activity {activity_num} on attempt {attempt + 1}")
+                return '\n'.join(cleaned_lines)
+            else:
+                logger.warning(f"Activity {activity_num} attempt {attempt + 1}: got {len(cleaned_lines)} items, expected {expected_count}")
+        
+        except Exception as e:
+            logger.error(f"Error fixing Activity {activity_num} attempt {attempt + 1}: {str(e)}")
+    
+    # If all attempts failed, try to synthesize the missing items
+    logger.warning(f"All attempts failed for Activity {activity_num}, synthesizing items")
+    return await synthesize_activity_items(topic, activity_num, expected_count, current_content)
+
+
+async def synthesize_activity_items(topic: str, activity_num: int, expected_count: int, current_content: str) -> str:
+    """
+    Top up an activity with generated items and return the new activity content.
+    Returns current_content unchanged if nothing is missing or generation fails.
+    """
+    current_count = count_numbered_items(current_content)
+    
+    if current_count >= expected_count:
+        return current_content
+    
+    # Extract existing items
+    existing_items = extract_numbered_items(current_content)
+    
+    # Generate additional items
+    missing_count = expected_count - current_count
+    additional_prompt = f"""Generate exactly {missing_count} more numbered items for Activity {activity_num} about "{topic}". 
+Each item should be on its own line starting with the next number ({current_count + 1}.) through ({expected_count}.).
+Make them relevant to the topic and consistent with the existing items.
+
+Existing items:
+{chr(10).join(existing_items[:3])}  # Show first 3 for context
+
+Generate {missing_count} more items:"""
+    
+    try:
+        additional_content = await generate_lesson_async(additional_prompt, priority=REPAIR, call_type="synthesize")
+        additional_items = extract_numbered_items(additional_content)[:missing_count]
+        
+        logger.info(f"Synthesized {len(additional_items)} items for Activity {activity_num}")
+        # Combine existing and additional items
+        return '\n'.join(existing_items + additional_items)
+    
+    except Exception as e:
+        logger.error(f"Error synthesizing items for Activity {activity_num}: {str(e)}")
+        return current_content
+
+
+async def repair_lesson_activities(lesson: Lesson, topic: str, validation_result: dict,
+                                   max_concurrency: int = REPAIR_CONCURRENCY) -> Lesson:
+    """
+    Repair every activity flagged by validate_counts concurrently.
+    Activities are independent, so each repair works on its own block; at most
+    max_concurrency repairs are in flight and the results are merged into the
+    lesson in a single rebuild.
+    """
+    mismatched = [
+        (act_num, act_data['expected'])
+        for act_num, act_data in validation_result['activities'].items()
+        if not act_data['match']
+    ]
+    if not mismatched:
+        return lesson
+    
+    def current_content(act_num: int) -> str:
+        return lesson.activities[act_num].content if act_num in lesson.activities else ""
+    
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    
+    async def repair(act_num: int, expected_count: int) -> str:
+        async with semaphore:
+            return await regenerate_activity_items(topic, act_num, expected_count, current_content(act_num))
+    
+    results = await asyncio.gather(
+        *(repair(act_num, expected_count) for act_num, expected_count in mismatched),
+        return_exceptions=True
+    )
+    
+    changes = {}
+    for (act_num, _), new_content in zip(mismatched, results):
+        if isinstance(new_content, Exception):
+            logger.error(f"Error repairing Activity {act_num}: {str(new_content)}")
+            continue
+        if new_content != current_content(act_num):
+            changes[act_num] = new_content
+    
+    return lesson.with_activities(changes) if changes else lesson
+
+
+def validate_lesson(text: str, topic: str) -> tuple[bool, List[str]]:
+    """
+    Validate lesson content for banned terms and topic adherence.
+    Returns (is_valid, warnings_list)
+    """
+    warnings = []
+    
+    # Check for banned terms (pictures, drawings, diagrams, images)
+    banned_matches = BANNED_TERMS_PATTERN.findall(text)
+    if banned_matches:
+        warnings.append(f"Found banned terms: {', '.join(set(banned_matches))}")
+    
+    # Check topic adherence (topic should appear at least 2 times)
+    topic_matches = len(re.findall(re.escape(topic), text, flags=re.IGNORECASE))
+    if topic_matches < 2:
+        warnings.append(f"Topic '{topic}' only appears {topic_matches} times")
+    
+    is_valid = len(warnings) == 0
+    return is_valid, warnings
+
+
+def build_stronger_prompt(prompt: str, topic: str) -> str:
+    """
+    Add a stronger system steer to a prompt whose output failed validate_lesson.
+    """
+    return prompt + f"\n\nYour last output violated constraints. Strictly follow: no pictures; keep strictly on-topic: {topic}."
+
+
+async def repair_lesson(lesson: Lesson, topic: str, lesson_config: dict) -> tuple[Lesson, dict]:
+    """
+    Validate activity counts from the parsed lesson and fix any mismatched activities.
+    Only repaired activities are recounted; the lesson is never re-parsed.
+    Returns (lesson, final_validation_result).
+    """
+    validation_result = validate_counts(lesson, lesson_config)
+    
+    # Log initial validation results
+    logger.info(f"Initial validation: {validation_result['summary']}")
+    for act_num, act_data in validation_result['activities'].items():
+        if not act_data['match']:
+            logger.warning(f"Activity {act_num}: expected {act_data['expected']}, got {act_data['actual']}")
+    
+    if validation_result['ok']:
+        return lesson, validation_result
+    
+    # Fix mismatched activities
+    logger.info("Fixing mismatched activities...")
+    fixed_lesson = await repair_lesson_activities(lesson, topic, validation_result)
+    
+    # Re-validate after fixes
+    final_validation = validate_counts(fixed_lesson, lesson_config)
+    
+    # Log final validation results
+    logger.info(f"Final validation: {final_validation['summary']}")
+    for act_num, act_data in final_validation['activities'].items():
+        if not act_data['match']:
+            logger.warning(f"Activity {act_num} still mismatched: expected {act_data['expected']}, got {act_data['actual']}")
+        else:
+            logger.info(f"Activity {act_num} fixed: {act_data['actual']} items")
+    
+    return fixed_lesson, final_validation
+
+
+async def generate_validated_lesson(prompt: str, subject: str, topics: List[str], lesson_config: dict,
+                                    on_stage: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    Generate, validate, clean and repair a lesson.
+    Returns a dict with lessonText, regenerated, warnings, validation and the
+    structured lesson.
+    on_stage, if given, is called with the name of each pipeline stage as it starts.
+    """
+    report_stage = on_stage or (lambda stage: None)
+    
+    logger.info("Calling OpenAI API to generate lesson...")
+    report_stage("generating")
+    
+    # Generate the lesson using OpenAI, then clean, parse and validate it in one pass
+    raw_lesson = await generate_lesson_async(prompt)
+    with STAGE_SECONDS.time(stage="clean_validate"):
+        lesson = tokenize_lesson(raw_lesson, subject, topics[0])
+    warnings = lesson.warnings
+    
+    # If invalid, regenerate once with stronger constraints
+    regenerated = False
+    if not lesson.is_valid:
+        logger.warning(f"Lesson validation failed: {warnings}. Regenerating with stronger constraints.")
+        report_stage("regenerating")
+        
+        # Regenerate
+        REGENERATIONS.inc()
+        raw_lesson = await generate_lesson_async(build_stronger_prompt(prompt, topics[0]), call_type="regenerate")
+        with STAGE_SECONDS.time(stage="clean_validate"):
+            lesson = tokenize_lesson(raw_lesson, subject, topics[0])
+        regenerated = True
+        
+        # Use the warnings from the regeneration
+        warnings = lesson.warnings
+    
+    logger.info("Lesson generated successfully")
+    
+    # Validate activity counts and fix if needed
+    report_stage("repairing")
+    lesson, validation_result = await repair_lesson(lesson, topics[0], lesson_config)
+    
+    return {
+        "lessonText": lesson.text,
+        "regenerated": regenerated,
+        "warnings": warnings,
+        "validation": validation_result,
+        "lesson": lesson
+    }
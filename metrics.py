@@ -0,0 +1,211 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from request_timing import record_stage
+
+# In-process metrics exported by GET /metrics in the Prometheus text format
+# (version 0.0.4), kept here so no client library is needed. Values are per
+# process; with several server workers each one exports its own. Histograms
+# with a server_timing name also add their observations to the current
+# request's Server-Timing header (see request_timing).
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bucket upper bounds in seconds
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 90.0, 120.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Metric:
+    kind = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+    
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines += [line for key, value in items for line in self._samples(key, value)]
+        return lines
+
+class Counter(_Metric):
+    """A monotonically increasing count, optionally split by labels"""
+    kind = "counter"
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def get(self, **labels) -> float:
+        """Current value for one label set (0 if never incremented)"""
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+    
+    def _samples(self, key, value) -> List[str]:
+        return [f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(value)}"]
+
+class Histogram(_Metric):
+    """
+    Observations counted into cumulative buckets, with their sum and count.
+    server_timing, if given, is a format string over the labels naming the
+    Server-Timing entry each observation is added to.
+    """
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = STAGE_BUCKETS, server_timing: Optional[str] = None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.server_timing = server_timing
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        if self.server_timing:
+            record_stage(self.server_timing.format(**labels), value)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block takes, whether or not it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def count(self, **labels) -> int:
+        """Number of observations for one label set"""
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            return series[2] if series else 0
+    
+    def _samples(self, key, series) -> List[str]:
+        pairs = list(zip(self.labelnames, key))
+        counts, total, count = series
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', '+Inf' if bound == float('inf') else repr(float(bound)))])} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(pairs)} {repr(float(total))}")
+        lines.append(f"{self.name}_count{_format_labels(pairs)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """The set of metrics rendered by /metrics"""
+    
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = STAGE_BUCKETS, server_timing: Optional[str] = None) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets, server_timing))
+    
+    def _register(self, metric):
+        if any(existing.name == metric.name for existing in self._metrics):
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+registry = MetricsRegistry()
+
+# Pipeline stages: prompt_build, clean_validate, docx_render
+STAGE_SECONDS = registry.histogram(
+    "lesson_stage_duration_seconds", "Time spent in each lesson pipeline stage.", ["stage"],
+    server_timing="{stage}"
+)
+# call_type: main, regenerate, targeted-fix, synthesize; includes retries and rate limiter waits
+LLM_CALL_SECONDS = registry.histogram(
+    "llm_call_duration_seconds", "Time per LLM call, including retries, by call type and outcome.",
+    ["call_type", "outcome"], buckets=LLM_BUCKETS, server_timing="llm-{call_type}"
+)
+DB_OPERATION_SECONDS = registry.histogram(
+    "db_operation_duration_seconds", "Time per LessonDatabase method call.", ["method"], buckets=DB_BUCKETS
+)
+REGENERATIONS = registry.counter(
+    "lesson_regenerations_total", "Lessons regenerated with a stronger prompt after failing validation."
+)
+REPAIR_ATTEMPTS = registry.counter(
+    "lesson_repair_attempts_total", "Targeted regenerations of an activity with the wrong item count.", ["activity"]
+)
+STORAGE_FAILURES = registry.counter(
+    "storage_failures_total", "Failed lesson cache, artifact cache and database operations.", ["store", "operation"]
+)
+# cache: lesson_cache, artifact_cache; result: hit, miss
+CACHE_LOOKUPS = registry.counter(
+    "cache_lookups_total", "Lesson and artifact cache lookups by result.", ["cache", "result"]
+)
+
+# Set while a timed database method runs, so methods calling each other are recorded once
+_in_db_method: ContextVar[bool] = ContextVar("in_db_method", default=False)
+
+def timed_db_method(method):
+    """
+    Record a LessonDatabase method's latency, and count it as a failure if it
+    raises. Only the outermost call is recorded: a method that calls others
+    (list_lessons_page calling find_lessons) is one operation in the histogram,
+    the failure counter and the request's single "db" Server-Timing entry.
+    """
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        if _in_db_method.get():
+            return method(*args, **kwargs)
+        reset_token = _in_db_method.set(True)
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            STORAGE_FAILURES.inc(store="database", operation=method.__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _in_db_method.reset(reset_token)
+            DB_OPERATION_SECONDS.observe(elapsed, method=method.__name__)
+            record_stage("db", elapsed)
+    return wrapper
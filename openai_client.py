@@ -1,18 +1,288 @@
+import asyncio
 import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
 from dotenv import load_dotenv
 import openai
 
+from rate_limiter import RateLimiter, INTERACTIVE, current_priority, parse_reset_duration
+from circuit_breaker import CircuitBreaker
+from metrics import LLM_CALL_SECONDS
+
 load_dotenv()
 
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Model parameters shared by every lesson generation call
+MODEL = "gpt-4"
+TEMPERATURE = 0.7
+MAX_TOKENS = 1500
+MODEL_PARAMS = {"model": MODEL, "temperature": TEMPERATURE, "max_tokens": MAX_TOKENS}
 
-def generate_lesson(prompt):
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.7,
-        max_tokens=1500
+# Per-attempt timeout and retry policy for upstream calls
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "20"))
+
+# Errors worth retrying; everything else (bad request, auth, ...) fails immediately
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError
+)
+
+# Token usage reported by the API, accumulated for the whole process
+token_usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+# Optional per-task usage accumulator, see track_token_usage()
+_usage_scope: ContextVar[Optional[Dict[str, int]]] = ContextVar("usage_scope", default=None)
+
+@contextmanager
+def track_token_usage():
+    """
+    Collect the token usage of every call made inside this block (including
+    from tasks it spawns) into the yielded dict.
+    """
+    scope = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    reset_token = _usage_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _usage_scope.reset(reset_token)
+
+def _record_usage(usage):
+    targets = [token_usage]
+    scope = _usage_scope.get()
+    if scope is not None:
+        targets.append(scope)
+    for target in targets:
+        target["calls"] += 1
+        if usage is not None:
+            target["prompt_tokens"] += usage.prompt_tokens or 0
+            target["completion_tokens"] += usage.completion_tokens or 0
+            target["total_tokens"] += usage.total_tokens or 0
+
+def estimate_prompt_tokens(prompt: str) -> int:
+    """Rough token estimate for a prompt (about 4 characters per token for English text)"""
+    return len(prompt) // 4 + 1
+
+# Process-wide budget shared by every async call, see rate_limiter.RateLimiter
+rate_limiter = RateLimiter(
+    requests_per_minute=int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500")),
+    tokens_per_minute=int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "40000")),
+    max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+)
+
+def _call_priority(priority: Optional[int]) -> int:
+    # A call never runs ahead of the priority class of the task that makes it
+    return max(current_priority(), INTERACTIVE if priority is None else priority)
+
+def _tokens_used(usage) -> Optional[int]:
+    return usage.total_tokens if usage is not None else None
+
+# Opens after consecutive upstream failures so callers fail fast instead of piling up
+circuit_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("OPENAI_BREAKER_THRESHOLD", "5")),
+    reset_timeout=float(os.getenv("OPENAI_BREAKER_RESET_SECONDS", "30"))
+)
+
+# Retry counters for the whole process
+retry_stats = {"attempts": 0, "retries": 0, "gave_up": 0, "by_error": {}}
+
+def retry_delay(attempt: int, error: Exception) -> float:
+    """Exponential backoff with full jitter, never shorter than a 429's retry-after"""
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+    if isinstance(error, openai.RateLimitError):
+        retry_after = parse_reset_duration(error.response.headers.get("retry-after"))
+        if retry_after:
+            delay = max(delay, min(retry_after, RETRY_MAX_DELAY))
+    return delay
+
+def _record_failure(error: BaseException):
+    # Timeouts, connection errors and 5xx count against the breaker; 429s are
+    # the rate limiter's business and client errors say nothing about upstream health
+    if isinstance(error, RETRYABLE_ERRORS) and not isinstance(error, openai.RateLimitError):
+        circuit_breaker.record_failure()
+    else:
+        circuit_breaker.release()
+
+def _should_retry(error: BaseException, attempt: int) -> bool:
+    _record_failure(error)
+    if not isinstance(error, RETRYABLE_ERRORS):
+        return False
+    if attempt >= MAX_RETRIES:
+        retry_stats["gave_up"] += 1
+        return False
+    retry_stats["retries"] += 1
+    name = type(error).__name__
+    retry_stats["by_error"][name] = retry_stats["by_error"].get(name, 0) + 1
+    return True
+
+def _begin_attempt():
+    circuit_breaker.before_call()
+    retry_stats["attempts"] += 1
+
+# Which chat API the clients talk to: "openai", or "fake" for the local stand-in
+# in fake_openai.py (load tests and offline development, no tokens spent)
+OPENAI_BACKEND = os.getenv("OPENAI_BACKEND", "openai")
+
+def create_clients(backend: str = OPENAI_BACKEND):
+    """Return the (sync, async) chat clients for a backend"""
+    if backend == "fake":
+        from fake_openai import FakeBackend
+        fake = FakeBackend.from_env()
+        return fake.client(), fake.async_client()
+    if backend != "openai":
+        raise ValueError(f"Unknown OPENAI_BACKEND: {backend}")
+    return (
+        openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=REQUEST_TIMEOUT, max_retries=0),
+        openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=REQUEST_TIMEOUT, max_retries=0)
     )
-    return response.choices[0].message.content 
\ No newline at end of file
+
+def use_clients(sync_client, async_chat_client):
+    """Route every following call through these clients (e.g. a fake_openai.FakeBackend's)"""
+    global client, async_client
+    client, async_client = sync_client, async_chat_client
+
+client, async_client = create_clients()
+
+def generate_lesson(prompt):
+    """
+    Synchronous lesson generation for the generate_lesson.py CLI. Retries and
+    the circuit breaker work as in generate_lesson_async, but the call does not
+    go through rate_limiter: the limiter is an asyncio budget for the calls
+    sharing one event loop, and the CLI makes a single blocking call per process,
+    so there is nothing to queue it behind. Code that makes calls alongside
+    others (the app, batch runs) must use generate_lesson_async.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        _begin_attempt()
+        try:
+            response = client.chat.completions.create(
+                model=MODEL,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS
+            )
+        except Exception as e:
+            if not _should_retry(e, attempt):
+                raise
+            time.sleep(retry_delay(attempt, e))
+            continue
+        circuit_breaker.record_success()
+        _record_usage(response.usage)
+        return response.choices[0].message.content
+
+@contextmanager
+def _timed_call(call_type: str):
+    # Latency of a whole call (rate limiter waits and retries included), by whether it succeeded
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        LLM_CALL_SECONDS.observe(time.perf_counter() - start, call_type=call_type, outcome=outcome)
+
+async def _create_completion(prompt: str, estimated_tokens: int, priority: int):
+    async with rate_limiter.limit(estimated_tokens, priority) as permit:
+        try:
+            raw = await async_client.chat.completions.with_raw_response.create(
+                model=MODEL,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS
+            )
+        except openai.RateLimitError as e:
+            permit.record_rate_limited(e.response.headers)
+            raise
+        response = raw.parse()
+        permit.record_response(raw.headers, _tokens_used(response.usage))
+    return response
+
+async def generate_lesson_async(prompt, priority: Optional[int] = None, call_type: str = "main"):
+    """
+    Async variant of generate_lesson for use inside the FastAPI event loop.
+    Each attempt waits for the shared rate limiter; priority is one of the
+    rate_limiter classes (INTERACTIVE, REPAIR, BATCH). Retryable errors are
+    retried with backoff, and CircuitOpenError is raised while the breaker is open.
+    call_type labels the call's latency metric: main, regenerate, targeted-fix
+    or synthesize.
+    """
+    estimated_tokens = estimate_prompt_tokens(prompt) + MAX_TOKENS
+    priority = _call_priority(priority)
+    with _timed_call(call_type):
+        for attempt in range(MAX_RETRIES + 1):
+            _begin_attempt()
+            try:
+                response = await _create_completion(prompt, estimated_tokens, priority)
+            except asyncio.CancelledError:
+                circuit_breaker.release()
+                raise
+            except Exception as e:
+                if not _should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(retry_delay(attempt, e))
+                continue
+            circuit_breaker.record_success()
+            _record_usage(response.usage)
+            return response.choices[0].message.content
+
+async def stream_lesson_async(prompt, priority: Optional[int] = None, call_type: str = "main"):
+    """
+    Yield the lesson text in chunks as the model produces them.
+    Opening the stream is retried like generate_lesson_async; once text has
+    been yielded an error is raised to the caller instead. call_type is as for
+    generate_lesson_async.
+    """
+    estimated_tokens = estimate_prompt_tokens(prompt) + MAX_TOKENS
+    priority = _call_priority(priority)
+    with _timed_call(call_type):
+        for attempt in range(MAX_RETRIES + 1):
+            _begin_attempt()
+            error = None
+            async with rate_limiter.limit(estimated_tokens, priority) as permit:
+                try:
+                    raw = await async_client.chat.completions.with_raw_response.create(
+                        model=MODEL,
+                        messages=[
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=TEMPERATURE,
+                        max_tokens=MAX_TOKENS,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+                except openai.RateLimitError as e:
+                    permit.record_rate_limited(e.response.headers)
+                    error = e
+                except asyncio.CancelledError:
+                    circuit_breaker.release()
+                    raise
+                except Exception as e:
+                    error = e
+                else:
+                    tokens_used = None
+                    try:
+                        async for chunk in raw.parse():
+                            if chunk.usage is not None:
+                                _record_usage(chunk.usage)
+                                tokens_used = _tokens_used(chunk.usage)
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                yield chunk.choices[0].delta.content
+                    except BaseException as e:
+                        _record_failure(e)
+                        raise
+                    circuit_breaker.record_success()
+                    permit.record_response(raw.headers, tokens_used)
+                    return
+            if not _should_retry(error, attempt):
+                raise error
+            await asyncio.sleep(retry_delay(attempt, error))
@@ -0,0 +1,230 @@
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, Mapping, Optional
+
+# Priority classes; lower values are served first
+INTERACTIVE = 0
+REPAIR = 1
+BATCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", REPAIR: "repair", BATCH: "batch"}
+
+_priority: ContextVar[int] = ContextVar("call_priority", default=INTERACTIVE)
+
+@contextmanager
+def priority_scope(priority: int):
+    """
+    Run the calls made inside this block (including from tasks it spawns) at the
+    given priority. Scopes only ever lower the priority: a repair inside a batch
+    run stays at batch priority.
+    """
+    reset_token = _priority.set(max(_priority.get(), priority))
+    try:
+        yield
+    finally:
+        _priority.reset(reset_token)
+
+def current_priority() -> int:
+    """Return the priority class of the current task"""
+    return _priority.get()
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse rate-limit reset headers such as "1s", "6m0s", "20ms" or "0.5" into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+class RateLimiter:
+    """
+    Process-wide client-side budget for OpenAI calls.
+    Each call reserves one request and an estimated number of tokens from
+    token buckets refilled at requests_per_minute / tokens_per_minute, and
+    takes one of a limited number of concurrency slots. The slot limit adapts
+    AIMD-style: it grows by roughly one per window of successful calls and is
+    halved on every 429. Rate-limit response headers pull the local buckets
+    down to what the provider reports. Waiting calls are served by priority
+    class, then in arrival order.
+    """
+    
+    def __init__(self, requests_per_minute: int = 500, tokens_per_minute: int = 40000,
+                 max_concurrency: int = 8, min_concurrency: int = 1):
+        """Initialize the rate limiter"""
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.concurrency_limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.configure(requests_per_minute, tokens_per_minute)
+        self._paused_until = 0.0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._wakeup = None
+        self._counters = {"granted": 0, "rate_limited": 0, "throttled_waits": 0}
+    
+    def configure(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        """Change the per-minute budgets; buckets start full"""
+        if requests_per_minute is not None:
+            self.request_capacity = float(requests_per_minute)
+            self.requests_available = self.request_capacity
+        if tokens_per_minute is not None:
+            self.token_capacity = float(tokens_per_minute)
+            self.tokens_available = self.token_capacity
+        self._updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self.requests_available = min(self.request_capacity, self.requests_available + elapsed * self.request_capacity / 60.0)
+        self.tokens_available = min(self.token_capacity, self.tokens_available + elapsed * self.token_capacity / 60.0)
+    
+    @asynccontextmanager
+    async def limit(self, estimated_tokens: int, priority: Optional[int] = None):
+        """
+        Hold a slot for one upstream call. The yielded CallPermit is used to report
+        the outcome (response headers, actual token usage, or a 429).
+        """
+        priority = current_priority() if priority is None else priority
+        reserved = int(min(estimated_tokens, self.token_capacity))
+        await self._acquire(reserved, priority)
+        permit = CallPermit(reserved)
+        try:
+            yield permit
+        finally:
+            self._release(permit)
+    
+    async def _acquire(self, tokens: int, priority: int):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), tokens, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just before being cancelled: hand the slot back
+                self.in_flight -= 1
+                self._dispatch()
+            raise
+    
+    def _dispatch(self):
+        self._refill()
+        now = time.monotonic()
+        while self._waiters:
+            priority, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= int(self.concurrency_limit):
+                return  # _release() dispatches again when a slot frees up
+            
+            wait = max(
+                self._paused_until - now,
+                (1 - self.requests_available) * 60.0 / self.request_capacity,
+                (tokens - self.tokens_available) * 60.0 / self.token_capacity
+            )
+            if wait > 0:
+                self._schedule_wakeup(wait)
+                return
+            
+            heapq.heappop(self._waiters)
+            self.requests_available -= 1
+            self.tokens_available -= tokens
+            self.in_flight += 1
+            self._counters["granted"] += 1
+            future.set_result(None)
+    
+    def _schedule_wakeup(self, delay: float):
+        if self._wakeup is not None and self._wakeup.when() <= asyncio.get_running_loop().time() + delay:
+            return
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self._counters["throttled_waits"] += 1
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._on_wakeup)
+    
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._dispatch()
+    
+    def _release(self, permit: "CallPermit"):
+        self.in_flight -= 1
+        self._refill()
+        
+        if permit.rate_limited:
+            # Multiplicative decrease, and stop sending until the provider's window resets
+            self._counters["rate_limited"] += 1
+            self.concurrency_limit = max(float(self.min_concurrency), self.concurrency_limit / 2)
+            retry_after = parse_reset_duration(permit.headers.get("retry-after")) or 1.0
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        elif permit.succeeded:
+            # Additive increase: about +1 slot per window of successful calls
+            self.concurrency_limit = min(float(self.max_concurrency), self.concurrency_limit + 1.0 / self.concurrency_limit)
+        
+        if permit.tokens_used is not None:
+            # Refund (or charge) the difference between the estimate and real usage
+            self.tokens_available = min(self.token_capacity, self.tokens_available + permit.reserved - permit.tokens_used)
+        self._apply_headers(permit.headers)
+        self._dispatch()
+    
+    def _apply_headers(self, headers: Mapping[str, str]):
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        try:
+            if remaining_requests is not None:
+                self.requests_available = min(self.requests_available, float(remaining_requests))
+            if remaining_tokens is not None:
+                self.tokens_available = min(self.tokens_available, float(remaining_tokens))
+        except ValueError:
+            pass
+    
+    def stats(self) -> Dict:
+        """Return the current budget, concurrency and counters"""
+        self._refill()
+        waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                waiting[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        return {
+            "concurrency_limit": round(self.concurrency_limit, 2),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": waiting,
+            "requests_available": round(self.requests_available, 1),
+            "tokens_available": round(self.tokens_available, 1),
+            "requests_per_minute": self.request_capacity,
+            "tokens_per_minute": self.token_capacity,
+            "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            **self._counters
+        }
+
+class CallPermit:
+    """Outcome of one rate-limited call, reported back to the RateLimiter"""
+    
+    def __init__(self, reserved: int):
+        self.reserved = reserved
+        self.headers: Mapping[str, str] = {}
+        self.tokens_used: Optional[int] = None
+        self.succeeded = False
+        self.rate_limited = False
+    
+    def record_response(self, headers: Mapping[str, str], tokens_used: Optional[int] = None):
+        """Report a successful response"""
+        self.succeeded = True
+        self.headers = headers or {}
+        self.tokens_used = tokens_used
+    
+    def record_rate_limited(self, headers: Optional[Mapping[str, str]] = None):
+        """Report a 429 response"""
+        self.rate_limited = True
+        self.headers = headers or {}
@@ -0,0 +1,146 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from docx_renderer import render_docx
+from lesson_parser import Lesson
+
+# Workers are started by a fork server (or spawned where there is none) rather
+# than forked from the server process, which runs threads and an event loop
+# whose locks a plain fork could copy mid-use
+DEFAULT_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+class RenderQueueFullError(Exception):
+    """Raised when too many renders are already waiting for a worker"""
+
+class RenderPool:
+    """
+    Bounded process pool for CPU-bound document rendering.
+    Renders run in worker processes so they never block the event loop. At most
+    max_pending renders may be queued or running at once (further requests are
+    rejected rather than piling up), export renders are limited to export_slots
+    separately, and a render that takes longer than timeout seconds is abandoned. Workers are started and warmed up by start(), which
+    should be called from the thread that owns the event loop.
+    """
+    
+    def __init__(self, workers: int = 2, max_pending: int = 32, timeout: float = 30,
+                 start_method: str = DEFAULT_START_METHOD, export_slots: Optional[int] = None):
+        """Initialize the render pool"""
+        self.workers = workers
+        self.max_pending = max_pending
+        # Export renders allowed in the pool at once; by default one worker is
+        # left for downloads (a download waits behind at most one export render
+        # in a one-worker pool)
+        self.export_slots = export_slots if export_slots is not None else max(1, workers - 1)
+        self.timeout = timeout
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._exporting = 0
+        self._export_loop = None
+        self._export_slots: Optional[asyncio.Semaphore] = None
+        self._counters = {"rendered": 0, "rejected": 0, "timeouts": 0, "errors": 0}
+    
+    def start(self, warm_up: bool = True) -> List[Future]:
+        """
+        Start the worker processes and (by default) render a small document in
+        each. Returns the warm-up futures without waiting for them, so an event
+        loop can await them instead of blocking.
+        """
+        context = multiprocessing.get_context(self.start_method)
+        if self.start_method == "forkserver":
+            # Import python-docx once in the fork server instead of in every worker
+            context.set_forkserver_preload(["docx_renderer"])
+        with self._lock:
+            if self._executor is not None:
+                return []
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        if not warm_up:
+            return []
+        # Building the worksheet template is the slow part of a first render; do
+        # it in every worker now rather than on the first download
+        return [self._executor.submit(render_docx, Lesson("Warm up", "Warm up"), 1, ["Warm up"]) for _ in range(self.workers)]
+    
+    def shutdown(self):
+        """Stop the worker processes, dropping renders that have not started"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def render(self, lesson: Lesson, grade: int, topics: List[str], wait_for_slot: bool = False) -> bytes:
+        """
+        Render a lesson to DOCX bytes in a worker process.
+        Raises RenderQueueFullError when max_pending renders are in flight and
+        asyncio.TimeoutError when the render takes longer than timeout. With
+        wait_for_slot (exports, which bound their own concurrency) the render
+        instead waits for one of export_slots and does not count towards
+        max_pending, so exports never crowd out single downloads.
+        """
+        if wait_for_slot:
+            async with self._export_semaphore():
+                with self._lock:
+                    self._exporting += 1
+                try:
+                    return await self._render(lesson, grade, topics)
+                finally:
+                    with self._lock:
+                        self._exporting -= 1
+        
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._counters["rejected"] += 1
+                raise RenderQueueFullError(f"{self._pending} renders already pending")
+            self._pending += 1
+        try:
+            return await self._render(lesson, grade, topics)
+        finally:
+            with self._lock:
+                self._pending -= 1
+    
+    async def _render(self, lesson: Lesson, grade: int, topics: List[str]) -> bytes:
+        if self._executor is None:
+            self.start(warm_up=False)
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, render_docx, lesson, grade, topics)
+            # A timed-out render keeps its worker busy until it finishes; the pool
+            # size and the pending limit bound how much of that can pile up
+            content = await asyncio.wait_for(future, self.timeout)
+            self._count("rendered")
+            return content
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            raise
+        except Exception:
+            self._count("errors")
+            raise
+    
+    def _export_semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop; make a new one for each loop
+        loop = asyncio.get_running_loop()
+        if self._export_loop is not loop:
+            self._export_loop = loop
+            self._export_slots = asyncio.Semaphore(self.export_slots)
+        return self._export_slots
+    
+    def stats(self) -> Dict:
+        """Return pool size, current queue depth and render counters"""
+        with self._lock:
+            counters = dict(self._counters)
+            counters["pending"] = self._pending
+            counters["exporting"] = self._exporting
+        counters["workers"] = self.workers
+        counters["max_pending"] = self.max_pending
+        counters["export_slots"] = self.export_slots
+        counters["timeout"] = self.timeout
+        counters["start_method"] = self.start_method
+        counters["started"] = self._executor is not None
+        return counters
+    
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
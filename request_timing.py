@@ -0,0 +1,182 @@
+import asyncio
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+# Per-request stage timings, reported in a Server-Timing header, and opt-in
+# cProfile reports for slow requests.
+#
+# Profiling is on for every request with PROFILE_REQUESTS=1, or for a single
+# request with ?profile=<PROFILE_ADMIN_TOKEN> (the parameter is ignored while
+# no token is configured). Requests slower than PROFILE_SLOW_MS leave a .prof
+# file (load it with pstats or snakeviz) and a text summary in PROFILE_DIR.
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") == "1"
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "1000"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_QUERY_PARAM = "profile"
+
+# Functions listed in the text summary of a profile
+PROFILE_SUMMARY_LINES = 40
+
+class RequestTiming:
+    """
+    Time spent per stage while handling one request. Stages that overlap
+    (concurrent activity repairs) are summed, so they can add up to more than
+    the request's total.
+    """
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._stages: Dict[str, List[float]] = {}
+    
+    def record(self, stage: str, seconds: float):
+        entry = self._stages.get(stage)
+        if entry is None:
+            self._stages[stage] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+    
+    def stages(self) -> Dict[str, Dict[str, float]]:
+        """Milliseconds and call count per stage, in the order stages first ran"""
+        return {stage: {"ms": round(seconds * 1000, 3), "count": count}
+                for stage, (seconds, count) in self._stages.items()}
+    
+    def header_value(self) -> str:
+        """The Server-Timing header value, ending with the total time so far"""
+        entries = []
+        for stage, (seconds, count) in self._stages.items():
+            entry = f"{stage};dur={seconds * 1000:.3f}"
+            if count > 1:
+                entry += f';desc="{count} calls"'
+            entries.append(entry)
+        entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.3f}")
+        return ", ".join(entries)
+
+_current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+def current_timing() -> Optional[RequestTiming]:
+    """The timing of the request being handled, if any"""
+    return _current_timing.get()
+
+def record_stage(stage: str, seconds: float):
+    """Add a stage's duration to the current request's timing (no-op outside requests)"""
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.record(stage, seconds)
+
+class RequestProfiler:
+    """
+    Profiles requests with cProfile and keeps reports of slow ones.
+    cProfile sees everything running on the event loop thread, so only one
+    request is profiled at a time and its report can include work done for
+    requests that overlapped with it.
+    """
+    
+    def __init__(self, always: bool = PROFILE_REQUESTS, admin_token: str = PROFILE_ADMIN_TOKEN,
+                 slow_ms: float = PROFILE_SLOW_MS, directory: str = PROFILE_DIR):
+        """Initialize the profiler"""
+        self.always = always
+        self.admin_token = admin_token
+        self.slow_ms = slow_ms
+        self.directory = directory
+        self._busy = threading.Lock()
+        self.written = 0
+    
+    def wanted(self, query_string: bytes) -> bool:
+        """Whether a request should be profiled: always, or when it carries the admin token"""
+        if self.always:
+            return True
+        if not self.admin_token or PROFILE_QUERY_PARAM.encode() not in query_string:
+            return False
+        values = parse_qs(query_string.decode("latin-1")).get(PROFILE_QUERY_PARAM, [])
+        return any(hmac.compare_digest(value, self.admin_token) for value in values)
+    
+    def start(self) -> Optional[cProfile.Profile]:
+        """Start profiling, or return None if another request is being profiled"""
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except Exception:
+            self._busy.release()
+            raise
+        return profile
+    
+    def stop(self, profile: cProfile.Profile):
+        """Stop profiling (on the thread that started it) so the next request can be profiled"""
+        profile.disable()
+        self._busy.release()
+    
+    def write_report(self, profile: cProfile.Profile, elapsed_ms: float, method: str, path: str) -> Optional[str]:
+        """If the request was slow, write its report and return the .prof path"""
+        if elapsed_ms < self.slow_ms:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+        base = os.path.join(
+            self.directory, f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{method}-{slug}-{elapsed_ms:.0f}ms"
+        )
+        profile.dump_stats(f"{base}.prof")
+        summary = io.StringIO()
+        summary.write(f"{method} {path} took {elapsed_ms:.1f} ms\n\n")
+        pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(PROFILE_SUMMARY_LINES)
+        with open(f"{base}.txt", "w") as f:
+            f.write(summary.getvalue())
+        self.written += 1
+        return f"{base}.prof"
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that gives every HTTP request a RequestTiming, adds the
+    Server-Timing header to its response and, when enabled, profiles it.
+    Headers go out before a streamed body, so streamed responses only carry
+    the stages that ran before the first byte.
+    """
+    
+    def __init__(self, app, profiler: Optional[RequestProfiler] = None):
+        self.app = app
+        self.profiler = profiler or RequestProfiler()
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        timing = RequestTiming()
+        reset_token = _current_timing.set(timing)
+        
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.header_value().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        profile = self.profiler.start() if self.profiler.wanted(scope.get("query_string", b"")) else None
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timing.reset(reset_token)
+            if profile is not None:
+                self.profiler.stop(profile)
+                elapsed_ms = (time.perf_counter() - timing.start) * 1000
+                path = await asyncio.to_thread(
+                    self.profiler.write_report, profile, elapsed_ms, scope["method"], scope["path"]
+                )
+                if path:
+                    logger.info(f"Profiled slow request {scope['method']} {scope['path']} ({elapsed_ms:.0f} ms): {path}")
@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+class SingleFlight:
+    """
+    Coalesce concurrent async calls that share a key into a single execution.
+    The first caller for a key starts the work; callers that arrive while it is
+    still running wait for the same result (or exception) instead of starting
+    their own. The shared work is shielded, so one caller disconnecting does not
+    cancel it for the others.
+    """
+    
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._counters = {"executions": 0, "coalesced": 0}
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for this key, or join the execution already in flight"""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda finished: self._forget(key, finished))
+            self._counters["executions"] += 1
+        else:
+            self._counters["coalesced"] += 1
+        return await asyncio.shield(task)
+    
+    def stats(self) -> Dict:
+        """Return execution counters; "coalesced" is the number of calls saved"""
+        return {**self._counters, "in_flight": len(self._in_flight)}
+    
+    def _forget(self, key: str, finished: asyncio.Task):
+        if self._in_flight.get(key) is finished:
+            del self._in_flight[key]
+        # Mark the exception as retrieved in case every waiter went away
+        if not finished.cancelled():
+            finished.exception()
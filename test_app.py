@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Test script for the FastAPI endpoints in app.py.
+Requests go straight through the ASGI app; the OpenAI client is replaced with
+the fake backend from fake_openai.py so no network access is needed.
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+# app.py opens its database and caches when imported; keep them out of the working directory
+os.environ.setdefault("LESSON_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="lesson-app-test-"), "lessons.db"))
+os.environ.setdefault("RENDER_WORKERS", "1")
+
+import app
+import openai_client
+from docx_renderer import DOCX_MEDIA_TYPE
+from fake_openai import FakeBackend, MAIN, REGENERATE
+
+LESSON_TEXT = "Grammar — Nouns\n\nExplanation\nA noun names a thing.\n\nActivity 1\n1. dog\n2. cat"
+
+async def asgi_request(method: str, path: str, body: Optional[dict] = None,
+                       headers: Optional[List[Tuple[bytes, bytes]]] = None) -> Tuple[int, Dict[str, str], bytes]:
+    """Send one request through the app and return (status, headers, body), reading streamed bodies to the end"""
+    payload = json.dumps(body).encode() if body is not None else b""
+    request_headers = [(b"host", b"test")] + (headers or [])
+    if body is not None:
+        request_headers.append((b"content-type", b"application/json"))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": request_headers, "client": ("test", 1), "server": ("test", 80)
+    }
+    response = {"status": 0, "headers": {}, "body": []}
+    sent = False
+    finished = asyncio.Event()
+    
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+    
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {name.decode(): value.decode() for name, value in message["headers"]}
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+            if not message.get("more_body"):
+                finished.set()
+    
+    await app.app(scope, receive, send)
+    finished.set()
+    return response["status"], response["headers"], b"".join(response["body"])
+
+def stream_lesson(backend: FakeBackend, topic: str, **fields) -> List[Tuple[str, dict]]:
+    """POST a lesson request to the streaming endpoint and return its (event, data) pairs"""
+    previous = (openai_client.client, openai_client.async_client)
+    openai_client.use_clients(backend.client(), backend.async_client())
+    try:
+        request = dict({"grade": 3, "subject": "Grammar", "topic": topic, "questions_per_section": 4}, **fields)
+        status, headers, body = asyncio.run(asgi_request("POST", "/api/generate-lesson/stream", request))
+    finally:
+        openai_client.use_clients(*previous)
+    assert status == 200 and headers["content-type"].startswith("text/event-stream"), (status, headers)
+    
+    events = []
+    for message in body.decode().split("\n\n"):
+        if message:
+            event_line, data_line = message.split("\n")
+            events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+def test_stream_events():
+    """Test that a streamed lesson sends its text as tokens, then the saved lesson"""
+    print("🧪 Testing streamed lesson events...")
+    
+    backend = FakeBackend(seed=11, stream_chunk_chars=25)
+    events = stream_lesson(backend, "Proper Nouns")
+    names = [name for name, _ in events]
+    
+    assert names[-2:] == ["status", "done"] and set(names[:-2]) == {"token"}, names
+    assert len(names) > 3, "The lesson should arrive in several token events"
+    done = events[-1][1]
+    assert done["lessonText"] == "".join(data["text"] for name, data in events if name == "token")
+    assert done["success"] and not done["cached"] and not done["regenerated"] and not done["repaired"]
+    assert done["validation"]["ok"], done["validation"]
+    assert app.db.get_lesson(done["lessonId"])["lesson_text"] == done["lessonText"]
+    assert "llm-main" in done["timing"] and "db" in done["timing"]
+    assert backend.stats()["calls"] == {MAIN: 1}
+    print(f"✅ {names.count('token')} token events, then status and done (lesson {done['lessonId']})")
+    return True
+
+def test_stream_reset_on_regeneration():
+    """Test that a lesson failing validation is discarded with a reset event and regenerated"""
+    print("\n🧪 Testing streamed regeneration...")
+    
+    backend = FakeBackend(seed=12, banned_rate=1.0)
+    events = stream_lesson(backend, "Common Nouns")
+    names = [name for name, _ in events]
+    
+    assert names.count("reset") == 1 and names[0] == "token", names
+    reset_at = names.index("reset")
+    assert events[reset_at][1]["reason"] == "regenerating" and events[reset_at][1]["warnings"]
+    assert names[reset_at + 1] == "token" and names[-1] == "done", names
+    done = events[-1][1]
+    assert done["regenerated"] and done["warnings"]
+    retried_text = "".join(data["text"] for name, data in events[reset_at + 1:] if name == "token")
+    assert done["lessonText"] == retried_text, "Only the text after the reset makes up the lesson"
+    assert backend.stats()["calls"] == {MAIN: 1, REGENERATE: 1}
+    print("✅ Reset sent once before the regenerated lesson streams")
+    return True
+
+def test_stream_error_event():
+    """Test that a failed generation ends the stream with an error event"""
+    print("\n🧪 Testing streamed generation errors...")
+    
+    backend = FakeBackend(seed=13, error_rate=1.0, error_kinds=("server",))
+    max_retries = openai_client.MAX_RETRIES
+    openai_client.MAX_RETRIES = 0  # Give up on the first error instead of backing off
+    try:
+        events = stream_lesson(backend, "Collective Nouns")
+    finally:
+        openai_client.MAX_RETRIES = max_retries
+        openai_client.circuit_breaker.record_success()
+    
+    assert [name for name, _ in events] == ["error"], events
+    assert events[0][1]["detail"].startswith("Failed to generate lesson: Server error")
+    print(f"✅ Error event: {events[0][1]['detail']}")
+    return True
+
+def test_stream_cached_lesson():
+    """Test that a repeated request is answered from the lesson cache without calling the model"""
+    print("\n🧪 Testing streamed cached lessons...")
+    
+    backend = FakeBackend(seed=14)
+    hits = app.metrics.CACHE_LOOKUPS.get(cache="lesson_cache", result="hit")
+    first = stream_lesson(backend, "Plural Nouns")[-1][1]
+    events = stream_lesson(backend, "Plural Nouns")
+    assert app.metrics.CACHE_LOOKUPS.get(cache="lesson_cache", result="hit") == hits + 1
+    
+    assert [name for name, _ in events] == ["token", "done"], events
+    assert events[0][1]["text"] == first["lessonText"]
+    done = events[1][1]
+    assert done["cached"] and done["lessonText"] == first["lessonText"] and done["validation"] is None
+    assert done["lessonId"] == first["lessonId"], "A cached lesson keeps the history row it was saved to"
+    assert backend.stats()["calls"] == {MAIN: 1}
+    print("✅ Second request streamed the cached lesson in one token event")
+    
+    lesson_count = app.db.get_lesson_count()
+    assert stream_lesson(backend, "Plural Nouns")[-1][1]["lessonId"] == first["lessonId"]
+    assert app.db.get_lesson_count() == lesson_count
+    app.db.delete_lesson(first["lessonId"])
+    saved_again = stream_lesson(backend, "Plural Nouns")[-1][1]["lessonId"]
+    assert saved_again != first["lessonId"] and app.db.get_lesson(saved_again)["lesson_text"] == first["lessonText"]
+    assert stream_lesson(backend, "Plural Nouns")[-1][1]["lessonId"] == saved_again
+    assert backend.stats()["calls"] == {MAIN: 1}
+    print("✅ Cache hits add no history rows; a deleted lesson is saved again once")
+    
+    events = stream_lesson(backend, "Plural Nouns", fresh=True)
+    assert not events[-1][1]["cached"] and backend.stats()["calls"] == {MAIN: 2}
+    print("✅ fresh=true bypasses the cache")
+    return True
+
+def test_docx_conditional_get():
+    """Test that If-None-Match with the current ETag gets a 304 and anything else the document"""
+    print("\n🧪 Testing conditional DOCX downloads...")
+    
+    lesson_id = app.db.save_lesson(["Nouns"], 3, LESSON_TEXT)
+    path = f"/api/lessons/{lesson_id}/docx"
+    
+    def download(if_none_match: Optional[str] = None):
+        headers = [(b"if-none-match", if_none_match.encode())] if if_none_match is not None else []
+        return asyncio.run(asgi_request("GET", path, headers=headers))
+    
+    def artifact_lookups():
+        return {result: app.metrics.CACHE_LOOKUPS.get(cache="artifact_cache", result=result) for result in ("hit", "miss")}
+    
+    try:
+        before = artifact_lookups()
+        status, headers, body = download()
+        assert status == 200 and headers["content-type"] == DOCX_MEDIA_TYPE and body.startswith(b"PK")
+        assert download('"stale"')[2] == body
+        assert artifact_lookups() == {"hit": before["hit"] + 1, "miss": before["miss"] + 1}
+        etag = headers["etag"]
+        assert etag.startswith('"') and etag.endswith('"'), etag
+        print(f"✅ First download: {len(body)} bytes, ETag {etag}; the next one is a cache hit")
+        
+        for if_none_match in (etag, f"W/{etag}", f'"stale", {etag}', f'W/"stale",W/{etag}', "*"):
+            status, headers, body = download(if_none_match)
+            assert (status, body) == (304, b""), (if_none_match, status)
+            assert headers["etag"] == etag
+        print("✅ Exact, weak, listed and * validators get an empty 304")
+        
+        for if_none_match in ('"stale"', etag.strip('"'), ""):
+            status, headers, body = download(if_none_match)
+            assert status == 200 and body.startswith(b"PK"), (if_none_match, status)
+        
+        app.db.update_activity(lesson_id, 1, "1. dog\n2. cat\n3. bird")
+        status, headers, body = download(etag)
+        assert status == 200 and body.startswith(b"PK") and headers["etag"] != etag
+        print("✅ Other and outdated validators get the current document")
+        
+        assert not app.etag_matches(None, etag) and app.etag_matches(f" {etag} ", etag)
+        assert asyncio.run(asgi_request("GET", "/api/lessons/999999/docx"))[0] == 404
+        print("✅ Unknown lessons are a 404")
+        return True
+    
+    finally:
+        app.render_pool.shutdown()
+
+def test_export_zip():
+    """Test ZIP exports by ID and by filter, and the checks before anything is rendered"""
+    print("\n🧪 Testing ZIP exports...")
+    
+    def export(body: dict):
+        status, headers, content = asyncio.run(asgi_request("POST", "/api/lessons/export", body))
+        return status, headers, content
+    
+    def entries(content: bytes) -> dict:
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            return {name: archive.read(name) for name in archive.namelist()}
+    
+    conjunctions = [app.db.save_lesson(["Conjunctions"], 11, f"{LESSON_TEXT}\n3. fox {n}") for n in range(3)]
+    prepositions = app.db.save_lesson(["Prepositions"], 11, LESSON_TEXT)
+    other_grade = app.db.save_lesson(["Conjunctions"], 12, LESSON_TEXT)
+    max_lessons = app.EXPORT_MAX_LESSONS
+    
+    try:
+        status, headers, content = export({"lesson_ids": [prepositions, conjunctions[0], prepositions]})
+        assert status == 200 and headers["content-type"] == "application/zip", status
+        assert "content-length" not in headers, "The archive is streamed as worksheets render"
+        files = entries(content)
+        assert list(files) == [f"{prepositions}_Lesson_Grade11_Prepositions.docx",
+                               f"{conjunctions[0]}_Lesson_Grade11_Conjunctions.docx"], list(files)
+        for document in files.values():
+            assert "word/document.xml" in zipfile.ZipFile(io.BytesIO(document)).namelist()
+        print("✅ One worksheet per lesson, in request order, duplicates dropped")
+        
+        status, _, content = export({"lesson_ids": [prepositions, 999998, 999999]})
+        assert status == 404 and json.loads(content)["detail"] == "Lessons not found: 999998, 999999"
+        print("✅ Unknown IDs are a 404 listing them")
+        
+        status, _, content = export({"grade": 11, "topic": " conjunctions "})
+        assert status == 200 and list(entries(content)) == [
+            f"{lesson_id}_Lesson_Grade11_Conjunctions.docx" for lesson_id in reversed(conjunctions)
+        ]
+        status, _, content = export({"grade": 11})
+        exported = {int(name.split("_")[0]) for name in entries(content)}
+        assert status == 200 and exported == set(conjunctions) | {prepositions}, exported
+        assert export({"grade": 12, "topic": "Conjunctions"})[0] == 200 and other_grade not in exported
+        status, _, content = export({"topic": "Prepositions"})
+        assert status == 200 and list(entries(content)) == [f"{prepositions}_Lesson_Grade11_Prepositions.docx"]
+        assert export({"grade": 11, "topic": "Interjections"})[0] == 404
+        assert export({})[0] == 400 and export({"lesson_ids": []})[0] == 400
+        print("✅ Grade and topic filters select the matching lessons, newest first")
+        
+        app.EXPORT_MAX_LESSONS = 2
+        status, _, content = export({"lesson_ids": conjunctions})
+        assert status == 400 and "At most 2 lessons" in json.loads(content)["detail"]
+        assert export({"lesson_ids": conjunctions[:2] + conjunctions[:2]})[0] == 200, "Duplicates do not count"
+        status, _, content = export({"grade": 11, "topic": "Conjunctions"})
+        assert status == 400 and "narrow the filter" in json.loads(content)["detail"]
+        print("✅ EXPORT_MAX_LESSONS caps ID lists and filters")
+        app.EXPORT_MAX_LESSONS = max_lessons
+        
+        app.db.delete_lesson(conjunctions[1])
+        
+        async def collect():
+            return [name async for name, _ in app.export_docx_entries(conjunctions)]
+        
+        assert asyncio.run(collect()) == [
+            f"{conjunctions[0]}_Lesson_Grade11_Conjunctions.docx", f"{conjunctions[2]}_Lesson_Grade11_Conjunctions.docx"
+        ]
+        print("✅ Lessons deleted after the export started are skipped")
+        
+        exported = [app.db.save_lesson(["Articles"], 11, f"{LESSON_TEXT}\n3. owl {n}") for n in range(4)]
+        downloaded = app.db.save_lesson(["Articles"], 11, f"{LESSON_TEXT}\n3. elk")
+        max_pending = app.render_pool.max_pending
+        app.render_pool.max_pending = 1
+        cached_files = app.artifact_cache.stats()["entries"]
+        
+        async def download_during_export():
+            export_request = asyncio.ensure_future(asgi_request("POST", "/api/lessons/export", {"lesson_ids": exported}))
+            
+            async def export_rendering():
+                while app.render_pool.stats()["exporting"] == 0:
+                    await asyncio.sleep(0.001)
+            
+            await asyncio.wait_for(export_rendering(), 10)
+            download = await asgi_request("GET", f"/api/lessons/{downloaded}/docx")
+            return download, await export_request
+        
+        try:
+            download, export_response = asyncio.run(download_during_export())
+        finally:
+            app.render_pool.max_pending = max_pending
+        assert download[0] == 200 and download[2].startswith(b"PK"), download[0]
+        assert export_response[0] == 200 and len(entries(export_response[2])) == len(exported)
+        print("✅ Downloads are not turned away while an export is rendering")
+        assert app.artifact_cache.stats()["entries"] == cached_files + 1
+        print("✅ Only the download was cached, not the exported worksheets")
+        return True
+    
+    finally:
+        app.EXPORT_MAX_LESSONS = max_lessons
+        app.render_pool.shutdown()
+
+if __name__ == "__main__":
+    print("🚀 Starting app endpoint tests...\n")
+    
+    results = [
+        test_stream_events(),
+        test_stream_reset_on_regeneration(),
+        test_stream_error_event(),
+        test_stream_cached_lesson(),
+        test_docx_conditional_get(),
+        test_export_zip(),
+    ]
+    
+    if all(results):
+        print("\n🎉 All app endpoint tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for the rendered artifact (DOCX) cache
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from artifact_cache import ArtifactCache
+
+def make_temp_db() -> str:
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        return tmp_file.name
+
+def test_artifact_hits_and_invalidation():
+    """Test keys, hits, misses and invalidation by lesson"""
+    print("🧪 Testing artifact cache hits and invalidation...")
+    
+    db_path = make_temp_db()
+    try:
+        cache = ArtifactCache(db_path)
+        key = ArtifactCache.make_key(1, "hash-a", "1")
+        
+        assert key == ArtifactCache.make_key(1, "hash-a", "1")
+        assert key != ArtifactCache.make_key(1, "hash-b", "1")
+        assert key != ArtifactCache.make_key(1, "hash-a", "2")
+        assert key != ArtifactCache.make_key(2, "hash-a", "1")
+        print("✅ Keys depend on lesson, text and renderer version")
+        
+        assert cache.get(key) is None
+        cache.set(key, 1, b"docx bytes")
+        cache.set(ArtifactCache.make_key(2, "hash-c", "1"), 2, b"other")
+        assert cache.get(key) == b"docx bytes"
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["bytes"] == 15
+        print("✅ Artifacts are stored and served")
+        
+        assert cache.invalidate_lesson(1) == 1
+        assert cache.get(key) is None
+        assert cache.stats()["entries"] == 1
+        print("✅ Deleting a lesson drops only its artifacts")
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+def test_artifact_size_eviction():
+    """Test least-recently-used eviction once max_bytes is exceeded"""
+    print("\n🧪 Testing artifact cache size bound...")
+    
+    db_path = make_temp_db()
+    try:
+        cache = ArtifactCache(db_path, max_bytes=250)
+        cache.set("a", 1, b"a" * 100)
+        time.sleep(0.01)
+        cache.set("b", 2, b"b" * 100)
+        time.sleep(0.01)
+        cache.get("a")  # "b" is now the least recently used artifact
+        time.sleep(0.01)
+        cache.set("c", 3, b"c" * 100)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.stats()["bytes"] == 200 and cache.stats()["evictions"] == 1
+        print("✅ Least recently used artifact evicted")
+        
+        cache.set("huge", 4, b"x" * 1000)
+        assert cache.get("huge") is None and cache.stats()["entries"] == 2
+        print("✅ Artifacts larger than the cache are not stored")
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+if __name__ == "__main__":
+    print("🚀 Starting artifact cache tests...\n")
+    
+    if test_artifact_hits_and_invalidation() and test_artifact_size_eviction():
+        print("\n🎉 All artifact cache tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test script for bulk lesson generation (batch_generate.py).
+The lesson pipeline is replaced with a local stub so no network access is needed.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import batch_generate
+import openai_client
+from database import LessonDatabase
+from lesson_parser import parse_lesson
+
+GRADE_TOPICS = {"3": ["Nouns", " Verbs "], "10": ["Clauses"], "4": ["Adjectives"]}
+
+def make_fake_pipeline(failing_topics=()):
+    """Return a fake generate_validated_lesson that uses 150 tokens per lesson, and its calls"""
+    calls = []
+    
+    async def fake_pipeline(prompt, subject, topics, lesson_config):
+        calls.append((lesson_config["grade_level"], topics[0]))
+        await asyncio.sleep(0.01)
+        if topics[0] in failing_topics:
+            raise RuntimeError(f"model unavailable for {topics[0]}")
+        openai_client._record_usage(SimpleNamespace(prompt_tokens=100, completion_tokens=50, total_tokens=150))
+        text = f"{subject} — {topics[0]}\n\nExplanation\nAbout {topics[0]}.\n\nActivity 1\n1. One"
+        return {"lessonText": text, "lesson": parse_lesson(text)}
+    
+    return fake_pipeline, calls
+
+def run(jobs, db, fake_pipeline) -> dict:
+    original_pipeline = batch_generate.generate_validated_lesson
+    batch_generate.generate_validated_lesson = fake_pipeline
+    try:
+        return asyncio.run(batch_generate.run_batch(jobs, db, concurrency=2))
+    finally:
+        batch_generate.generate_validated_lesson = original_pipeline
+
+def test_build_batch_jobs():
+    """Test that jobs cover the selected grades in numeric order with trimmed topics"""
+    print("🧪 Testing batch job list...")
+    
+    assert batch_generate.build_batch_jobs(GRADE_TOPICS) == [
+        (3, "Nouns"), (3, "Verbs"), (4, "Adjectives"), (10, "Clauses")
+    ]
+    assert batch_generate.build_batch_jobs(GRADE_TOPICS, [10, 5]) == [(10, "Clauses")]
+    print("✅ Jobs listed per grade, unknown grades ignored")
+    return True
+
+def test_rerun_skips_stored_lessons():
+    """Test that a second run over the same jobs generates nothing"""
+    print("\n🧪 Testing resumable batch runs...")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        db_path = tmp_file.name
+    
+    try:
+        db = LessonDatabase(db_path)
+        jobs = batch_generate.build_batch_jobs(GRADE_TOPICS)
+        
+        fake_pipeline, calls = make_fake_pipeline()
+        first = run(jobs, db, fake_pipeline)
+        assert (first["generated"], first["skipped"], first["failed"]) == (4, 0, 0), first
+        assert first["tokens"] == 600 and len(calls) == 4
+        assert db.get_lesson_count() == 4
+        print("✅ First run generated and stored every lesson")
+        
+        fake_pipeline, calls = make_fake_pipeline()
+        second = run(jobs, db, fake_pipeline)
+        assert (second["generated"], second["skipped"], second["failed"]) == (0, 4, 0), second
+        assert calls == [] and second["tokens"] == 0 and db.get_lesson_count() == 4
+        print("✅ Second run skipped every stored lesson")
+        
+        assert db.has_lesson(["nouns"], 3) and not db.has_lesson(["Nouns"], 4)
+        assert not db.has_lesson(["Nouns", "Verbs"], 3) and not db.has_lesson([], 3)
+        print("✅ Stored lessons are matched on grade and the exact topic set")
+        db.close()
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+def test_failures_and_summary():
+    """Test that failed jobs are counted, not stored, and retried by the next run"""
+    print("\n🧪 Testing batch failures and throughput summary...")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        db_path = tmp_file.name
+    
+    try:
+        db = LessonDatabase(db_path)
+        jobs = batch_generate.build_batch_jobs(GRADE_TOPICS, [3])
+        
+        fake_pipeline, calls = make_fake_pipeline(failing_topics={"Verbs"})
+        summary = run(jobs, db, fake_pipeline)
+        assert summary["total"] == 2 and summary["generated"] == 1 and summary["failed"] == 1, summary
+        assert summary["tokens"] == 150
+        assert summary["elapsed_seconds"] >= 0
+        assert summary["lessons_per_minute"] > 0
+        assert abs(summary["tokens_per_minute"] - 150 * summary["lessons_per_minute"]) <= 1, "Throughput uses the same elapsed time"
+        assert not db.has_lesson(["Verbs"], 3)
+        print(f"✅ 1 generated, 1 failed ({summary['lessons_per_minute']} lessons/min)")
+        
+        fake_pipeline, calls = make_fake_pipeline()
+        retry = run(jobs, db, fake_pipeline)
+        assert calls == [(3, "Verbs")] and retry["generated"] == 1 and retry["skipped"] == 1
+        print("✅ The next run retries only the failed job")
+        db.close()
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+if __name__ == "__main__":
+    print("🚀 Starting batch generation tests...\n")
+    
+    results = [
+        test_build_batch_jobs(),
+        test_rerun_skips_stored_lessons(),
+        test_failures_and_summary(),
+    ]
+    
+    if all(results):
+        print("\n🎉 All batch generation tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
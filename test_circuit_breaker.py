@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script for the circuit breaker and OpenAI call retries
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import openai
+import openai_client
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+def test_breaker_opens_and_recovers():
+    """Test that the breaker opens after repeated failures and closes after a good trial call"""
+    print("🧪 Testing circuit breaker transitions...")
+    
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.1)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    
+    try:
+        breaker.before_call()
+        assert False, "Open breaker should reject calls"
+    except CircuitOpenError:
+        print("✅ Open breaker failed fast")
+    
+    time.sleep(0.15)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    try:
+        breaker.before_call()
+        assert False, "Only one trial call is allowed while half-open"
+    except CircuitOpenError:
+        pass
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.stats()["opened"] == 1
+    print("✅ Breaker closed again after a successful trial call")
+    return True
+
+def test_retries_with_backoff():
+    """Test that retryable errors are retried and other errors are not"""
+    print("\n🧪 Testing retries...")
+    
+    original_create = openai_client._create_completion
+    original_delay = openai_client.RETRY_BASE_DELAY
+    openai_client.RETRY_BASE_DELAY = 0.001
+    attempts = {"count": 0}
+    
+    class FakeResponse:
+        usage = None
+        choices = [type("Choice", (), {"message": type("Message", (), {"content": "lesson"})()})()]
+    
+    async def flaky_create(prompt, estimated_tokens, priority):
+        attempts["count"] += 1
+        if attempts["count"] < 3:
+            raise openai.APIConnectionError(request=None)
+        return FakeResponse()
+    
+    async def bad_request(prompt, estimated_tokens, priority):
+        attempts["count"] += 1
+        raise ValueError("not retryable")
+    
+    try:
+        openai_client._create_completion = flaky_create
+        assert asyncio.run(openai_client.generate_lesson_async("prompt")) == "lesson"
+        assert attempts["count"] == 3
+        print("✅ Connection errors were retried until the call succeeded")
+        
+        attempts["count"] = 0
+        openai_client._create_completion = bad_request
+        try:
+            asyncio.run(openai_client.generate_lesson_async("prompt"))
+            assert False, "Non-retryable errors should be raised"
+        except ValueError:
+            pass
+        assert attempts["count"] == 1
+        print("✅ Non-retryable errors were raised without retrying")
+        return True
+    
+    finally:
+        openai_client._create_completion = original_create
+        openai_client.RETRY_BASE_DELAY = original_delay
+
+if __name__ == "__main__":
+    print("🚀 Starting circuit breaker tests...\n")
+    
+    if test_breaker_opens_and_recovers() and test_retries_with_backoff():
+        print("\n🎉 All circuit breaker tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
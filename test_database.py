@@ -5,8 +5,11 @@ Test script for the SQLite database functionality
 
 import os
 import tempfile
+import threading
 import json
 from database import LessonDatabase
+from lesson_compression import compress_body
+from lesson_parser import parse_lesson
 
 def test_database_operations():
     """Test basic database operations"""
@@ -84,7 +87,7 @@ def test_database_operations():
         
         print("\n🎉 All database tests passed!")
         return True
-        
+    
     except Exception as e:
         print(f"❌ Test failed with error: {e}")
         return False
@@ -132,7 +135,7 @@ def test_database_schema():
         
         print("✅ Database schema is correct")
         return True
-        
+    
     except Exception as e:
         print(f"❌ Schema test failed with error: {e}")
         return False
@@ -141,13 +144,306 @@ def test_database_schema():
         if os.path.exists(db_path):
             os.unlink(db_path)
 
+def test_topic_index_and_filters():
+    """Test the normalized topic index, its backfill and the filtered queries"""
+    print("\n🗂️ Testing topic index and filters...")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        db_path = tmp_file.name
+    
+    try:
+        # A database created before the topic index existed
+        import sqlite3
+        with sqlite3.connect(db_path) as conn:
+            conn.execute('''
+                CREATE TABLE lessons (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, topics TEXT NOT NULL, grade INTEGER NOT NULL,
+                    age INTEGER, date_generated TIMESTAMP NOT NULL, lesson_text TEXT NOT NULL, tags TEXT
+                )
+            ''')
+            conn.execute(
+                "INSERT INTO lessons (topics, grade, date_generated, lesson_text) VALUES (?, ?, ?, ?)",
+                (json.dumps(["Nouns", "Verbs"]), 3, "2024-01-15T10:00:00", "Old lesson")
+            )
+        
+        db = LessonDatabase(db_path)
+        new_id = db.save_lesson(["nouns"], 4, "New lesson")
+        
+        assert [lesson['id'] for lesson in db.find_lessons(topic="NOUNS")] == [new_id, 1]
+        print("✅ Existing lessons were backfilled and topics match case-insensitively")
+        assert [lesson['id'] for lesson in db.find_lessons(topic="nouns", grade=3)] == [1]
+        assert [lesson['id'] for lesson in db.find_lessons(date_from="2024-01-01", date_to="2024-01-15")] == [1]
+        assert db.find_lessons(topic="adverbs") == []
+        print("✅ Grade, topic and date filters work")
+        assert db.get_topic_counts() == {"nouns": 2, "verbs": 1}
+        
+        db.delete_lesson(1)
+        assert db.get_topic_counts() == {"nouns": 1}
+        print("✅ Topic index follows deletions")
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+def test_full_text_search():
+    """Test ranked full-text search with phrases, prefixes and snippets"""
+    print("\n🔍 Testing full-text search...")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        db_path = tmp_file.name
+    
+    try:
+        db = LessonDatabase(db_path)
+        nouns_id = db.save_lesson(["Common Nouns"], 3, "A common noun names a general thing. Proper nouns are capitalized.")
+        verbs_id = db.save_lesson(["Verbs"], 3, "Action verbs show what the subject does.", tags=["action"])
+        db.save_lesson(["Adjectives"], 4, "Adjectives describe things.")
+        
+        results = db.search_lessons('"common noun"')
+        assert [lesson['id'] for lesson in results] == [nouns_id]
+        assert "[common noun]" in results[0]['snippet']
+        print("✅ Phrase search returns highlighted snippets")
+        
+        assert 'lesson_text' not in results[0]
+        full = db.search_lessons('"common noun"', fields="full")
+        assert full[0]['lesson_text'].startswith("A common noun") and full[0]['snippet'] == results[0]['snippet']
+        print("✅ Summary results leave out the body; fields='full' includes it")
+        
+        assert [lesson['id'] for lesson in db.search_lessons("verb*")] == [verbs_id]
+        assert [lesson['id'] for lesson in db.search_lessons("action")] == [verbs_id]
+        print("✅ Prefix and tag search work")
+        
+        assert len(db.search_lessons("a*", limit=1)) == 1 and len(db.search_lessons("a*", limit=None)) == 3
+        print("✅ limit caps the results; limit=None returns every match")
+        
+        # Stray FTS syntax in user input is treated as plain words, not an error
+        assert isinstance(db.search_lessons('noun AND ('), list)
+        assert db.search_lessons('"') == []
+        
+        db.delete_lesson(verbs_id)
+        assert db.search_lessons("verbs") == []
+        print("✅ Search index follows deletions")
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+def test_keyset_pagination():
+    """Test paging through lessons with cursors and optional totals"""
+    print("\n📄 Testing keyset pagination...")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        db_path = tmp_file.name
+    
+    try:
+        db = LessonDatabase(db_path)
+        ids = [db.save_lesson(["Nouns"], 3 if n % 2 else 4, f"Lesson {n}") for n in range(7)]
+        
+        seen = []
+        cursor = None
+        while True:
+            page = db.list_lessons_page(limit=3, cursor=cursor)
+            assert page['total'] is None
+            seen += [lesson['id'] for lesson in page['lessons']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        assert seen == list(reversed(ids))
+        print("✅ Pages cover every lesson once, newest first")
+        
+        page = db.list_lessons_page(limit=2, include_total=True, grade=3)
+        assert page['total'] == 3 and len(page['lessons']) == 2
+        assert all(lesson['grade'] == 3 for lesson in page['lessons'])
+        assert [lesson['id'] for lesson in db.list_lessons(limit=2)] == list(reversed(ids))[:2]
+        print("✅ Filters, totals and list_lessons limits work")
+        
+        try:
+            db.list_lessons_page(cursor="not-a-cursor")
+            assert False, "Malformed cursors should be rejected"
+        except ValueError:
+            print("✅ Malformed cursor rejected")
+        
+        for limit in (0, -1):
+            try:
+                db.list_lessons_page(limit=limit)
+                assert False, "Page limits below 1 should be rejected"
+            except ValueError:
+                pass
+        print("✅ Page limits below 1 rejected")
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+def test_compressed_body_storage():
+    """Test that lesson bodies are compressed, stored once and migrated from raw rows"""
+    print("\n🗜️ Testing compressed lesson body storage...")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        db_path = tmp_file.name
+    
+    try:
+        # A database from before bodies were compressed, with the text inline
+        import sqlite3
+        old_text = "Activity 1\n1. Underline the noun in each sentence.\n" * 20
+        with sqlite3.connect(db_path) as conn:
+            conn.execute('''
+                CREATE TABLE lessons (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, topics TEXT NOT NULL, grade INTEGER NOT NULL,
+                    age INTEGER, date_generated TIMESTAMP NOT NULL, lesson_text TEXT NOT NULL, tags TEXT
+                )
+            ''')
+            conn.execute(
+                "INSERT INTO lessons (topics, grade, date_generated, lesson_text) VALUES (?, ?, ?, ?)",
+                (json.dumps(["Nouns"]), 3, "2024-01-15T10:00:00", old_text)
+            )
+        
+        db = LessonDatabase(db_path)
+        assert db.get_lesson(1)['lesson_text'] == old_text
+        assert [lesson['id'] for lesson in db.search_lessons("underline")] == [1]
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("SELECT lesson_text FROM lessons WHERE id = 1").fetchone()[0] == ''
+            assert conn.execute("SELECT COUNT(*) FROM lesson_sections WHERE lesson_id = 1").fetchone()[0] == 2
+        print("✅ Existing bodies were migrated and still read and search the same")
+        
+        duplicate_id = db.save_lesson(["Nouns"], 3, old_text)
+        other_id = db.save_lesson(["Verbs"], 4, "Circle the verb — ünïcode too.", tags=["verbs"])
+        assert db.get_lesson(other_id)['lesson_text'] == "Circle the verb — ünïcode too."
+        stats = db.get_storage_stats()
+        assert stats['bodies'] == 3 and stats['unique_bodies'] == 2
+        assert stats['stored_bytes'] < stats['text_bytes']
+        print(f"✅ Duplicate bodies stored once ({stats['ratio']}x smaller on disk)")
+        
+        db.delete_lesson(1)
+        assert db.get_lesson(duplicate_id)['lesson_text'] == old_text
+        assert [lesson['id'] for lesson in db.search_lessons("underline")] == [duplicate_id]
+        db.delete_lesson(duplicate_id)
+        assert db.get_storage_stats()['unique_bodies'] == 1
+        assert db.search_lessons("underline") == []
+        print("✅ Shared blobs survive until their last lesson is deleted")
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+def test_lesson_sections():
+    """Test that activities are stored parsed and can be read and updated one at a time"""
+    print("\n📑 Testing stored lesson sections...")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        db_path = tmp_file.name
+    
+    try:
+        db = LessonDatabase(db_path)
+        lesson_text = "\n".join([
+            "Grammar — Nouns", "", "Explanation", "A noun names a thing.", "",
+            "Activity 1", "", "1. dog", "2. cat", "", "Activity 2", "", "1. apple"
+        ])
+        lesson_id = db.save_lesson(["Nouns"], 3, lesson_text)
+        shared_id = db.save_lesson(["Nouns"], 4, lesson_text)
+        
+        assert db.get_activity(lesson_id, 1) == {'lesson_id': lesson_id, 'number': 1, 'content': "1. dog\n2. cat", 'item_count': 2}
+        assert db.get_activity_counts(lesson_id) == {1: 2, 2: 1}
+        assert db.get_activity(lesson_id, 0) is None and db.get_activity(lesson_id, 3) is None
+        assert db.get_activity_counts(999) is None
+        sections = db.get_lesson_sections(lesson_id)
+        assert sections.explanation == "Grammar — Nouns\n\nExplanation\nA noun names a thing."
+        assert sections.item_counts == {1: 2, 2: 1} and sections.text == parse_lesson(lesson_text).to_text()
+        assert db.get_lesson_sections(999) is None
+        print("✅ Activities and item counts read without the rest of the lesson")
+        
+        updated = db.update_activity(lesson_id, 2, "1. apple\n2. pear\n3. plum\n")
+        assert updated == {'lesson_id': lesson_id, 'number': 2, 'content': "1. apple\n2. pear\n3. plum", 'item_count': 3}
+        assert db.get_activity_counts(lesson_id) == {1: 2, 2: 3}
+        changes = db._connect().total_changes
+        assert db.get_lesson(lesson_id)['lesson_text'].endswith("Activity 2\n1. apple\n2. pear\n3. plum")
+        assert db.get_lesson(shared_id)['lesson_text'] == lesson_text
+        assert [lesson['id'] for lesson in db.search_lessons("plum")] == [lesson_id]
+        assert len(db.find_lessons(fields="full")) == 2
+        assert db._connect().total_changes == changes, "The body is rebuilt on update, reads never write"
+        assert db.update_activity(lesson_id, 5, "1. x") is None and db.update_activity(999, 1, "1. x") is None
+        print("✅ Updating one activity keeps the body and search in step")
+        
+        extra_id = db.save_lesson(["Verbs"], 3, lesson_text + "\n\nActivity 5\n\n1. run")
+        db.update_activity(extra_id, 1, "1. jump")
+        expected = parse_lesson(lesson_text.replace("1. dog\n2. cat", "1. jump")).to_text()
+        assert db.get_lesson(extra_id)['lesson_text'] == expected
+        print("✅ Rebuilt bodies match Lesson.to_text, without sections outside activities 1-4")
+        
+        db.delete_lesson(lesson_id)
+        assert db.get_activity_counts(lesson_id) is None
+        assert db.get_activity_counts(shared_id) == {1: 2, 2: 1}
+        print("✅ Sections are deleted with their lesson")
+        
+        # A body left stale by schema version 5 is rebuilt when the database is upgraded
+        conn = db._connect()
+        conn.execute("UPDATE lesson_sections SET data = ? WHERE lesson_id = ? AND section = 2",
+                     (compress_body("1. apple\n2. fig"), shared_id))
+        conn.execute("CREATE TABLE stale_lesson_bodies (lesson_id INTEGER PRIMARY KEY)")
+        conn.execute("INSERT INTO stale_lesson_bodies VALUES (?)", (shared_id,))
+        conn.execute("PRAGMA user_version = 5")
+        conn.commit()
+        db.close()
+        db = LessonDatabase(db_path)
+        assert db.get_lesson(shared_id)['lesson_text'].endswith("Activity 2\n1. apple\n2. fig")
+        assert [lesson['id'] for lesson in db.search_lessons("fig")] == [shared_id]
+        tables = {row[0] for row in db._connect().execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "stale_lesson_bodies" not in tables
+        print("✅ Bodies left stale by earlier versions are rebuilt by the migration")
+        db.close()
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+def test_connections_across_threads():
+    """Test that connections opened by other threads are closed and cleaned up safely"""
+    print("\n🧵 Testing per-thread connections...")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        db_path = tmp_file.name
+    
+    try:
+        db = LessonDatabase(db_path)
+        for grade in (1, 2, 3):
+            worker = threading.Thread(target=db.save_lesson, args=(["Nouns"], grade, "1. dog"))
+            worker.start()
+            worker.join()
+        
+        # Each new connection drops the ones left behind by finished threads
+        assert len(db._pool._connections) == 2, "Only this thread's and the last worker's connections remain"
+        print("✅ Connections of finished threads are closed")
+        
+        worker = threading.Thread(target=db.save_lesson, args=(["Verbs"], 4, "1. run"))
+        worker.start()
+        worker.join()
+        db.close()
+        assert db._pool._connections == {}
+        print("✅ close() closes connections opened by other threads")
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
 if __name__ == "__main__":
     print("🚀 Starting database tests...\n")
     
     schema_test = test_database_schema()
     operations_test = test_database_operations()
+    topics_test = test_topic_index_and_filters()
+    search_test = test_full_text_search()
+    pagination_test = test_keyset_pagination()
+    storage_test = test_compressed_body_storage()
+    sections_test = test_lesson_sections()
+    threads_test = test_connections_across_threads()
     
-    if schema_test and operations_test:
+    if (schema_test and operations_test and topics_test and search_test and pagination_test and storage_test
+            and sections_test and threads_test):
         print("\n🎉 All tests passed! Database functionality is working correctly.")
     else:
         print("\n❌ Some tests failed. Please check the implementation.")
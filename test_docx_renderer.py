@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script for the template-based DOCX worksheet renderer
+"""
+
+import os
+import sys
+from io import BytesIO
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from docx import Document
+from docx_renderer import (
+    parse_worksheet, render_docx, worksheet_blocks, BLANK, HEADING, ITEM, BULLET, INSTRUCTIONS, PARAGRAPH, ANSWER
+)
+from lesson_parser import parse_lesson
+
+LESSON_TEXT = "\n".join([
+    "Grammar — Nouns",
+    "",
+    "Explanation:",
+    "A **noun** names a person, place & thing.",
+    "",
+    "",
+    "Instructions: Circle the <noun>.",
+    "- dog",
+    "• cat",
+    "7. The dog ran.",
+    "",
+    "",
+    "9. The cat\tsat.\x01",
+    "",
+    "Activity 1",
+    "Rules — read first",
+    "1. Find the noun.",
+])
+
+def test_parse_worksheet():
+    """Test that lesson lines become the expected worksheet blocks"""
+    print("🧪 Testing worksheet parsing...")
+    
+    lesson = parse_lesson(LESSON_TEXT)
+    assert worksheet_blocks(lesson) == [
+        (HEADING, "Explanation:"),
+        (PARAGRAPH, [("A ", False), ("noun", True), (" names a person, place & thing.", False)]),
+        (ANSWER, None),
+        (INSTRUCTIONS, "Circle the <noun>."),
+        (BULLET, "dog"),
+        (BULLET, "cat"),
+        (ITEM, "1. The dog ran."),
+        (ANSWER, None),
+        (ITEM, "1. The cat\tsat.\x01"),  # a new list restarts at 1
+        (PARAGRAPH, [("Activity 1", False)]),
+        (PARAGRAPH, [("Rules — read first", False)]),  # only the lesson title is skipped
+        (ITEM, "1. Find the noun."),
+    ]
+    for text in (LESSON_TEXT, "Title — T\n\nRULES\n\nActivity 1\n- a\n\nActivity 2\nNOTES:\n\nActivity 3\n1. x", "Activity 1\n\n1. x"):
+        lesson = parse_lesson(text)
+        assert worksheet_blocks(lesson) == parse_worksheet(lesson.to_text()), text
+    assert parse_worksheet("Plain line\n\nNext") == [(PARAGRAPH, [("Plain line", False)]), (PARAGRAPH, [("Next", False)])]
+    assert parse_worksheet("\n\nNOTES") == [(BLANK, None), (BLANK, None), (HEADING, "NOTES")]
+    print("✅ Headings, lists, instructions, bold runs and answer lines recognised")
+    print("✅ Blocks built from lesson sections match a scan of the whole text")
+    return True
+
+def test_render_docx():
+    """Test that rendered worksheets open in python-docx with the header and body in place"""
+    print("\n🧪 Testing worksheet rendering...")
+    
+    doc = Document(BytesIO(render_docx(parse_lesson(LESSON_TEXT), 3, ["Nouns & Verbs"])))
+    paragraphs = [(paragraph.style.name, paragraph.text) for paragraph in doc.paragraphs]
+    assert paragraphs[:4] == [
+        ("Title", "Coding Cat Club"),
+        ("Normal", "Grade 3 — Topic: Nouns & Verbs"),
+        ("Normal", "Name: " + "_" * 30 + "    Date: " + "_" * 30),
+        ("Heading 1", "Lesson Worksheet"),
+    ]
+    assert ("Heading 2", "Explanation:") in paragraphs
+    assert ("List Bullet", "cat") in paragraphs
+    assert ("Normal", "Instructions: Circle the <noun>.") in paragraphs
+    assert ("Normal", "1. The cat\tsat.") in paragraphs
+    print("✅ Header, styles and escaped text survive a round trip")
+    
+    bold = [run.text for paragraph in doc.paragraphs for run in paragraph.runs if run.bold]
+    assert "noun" in bold and "Instructions: " in bold
+    assert sum(paragraph.text == "_" * 50 for paragraph in doc.paragraphs) == 2
+    assert doc.sections[0].left_margin == doc.sections[0].top_margin == 914400  # one inch
+    print("✅ Formatting, answer lines and margins are applied")
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Starting DOCX renderer tests...\n")
+    
+    if test_parse_worksheet() and test_render_docx():
+        print("\n🎉 All DOCX renderer tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for the fake OpenAI backend used by load tests (fake_openai.py)
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import openai_client
+from fake_openai import FakeBackend, MAIN, SYNTHESIZE, TARGETED_FIX, parse_latency
+from lesson_pipeline import generate_validated_lesson
+from prompt_builder import build_grammar_lesson_prompt
+
+LESSON_CONFIG = {"section_a_questions": 5, "section_b_questions": 5, "section_c_questions": 5, "section_d_questions": 5}
+
+def run_with_backend(backend, coro_factory):
+    previous = (openai_client.client, openai_client.async_client)
+    openai_client.use_clients(backend.client(), backend.async_client())
+    try:
+        return asyncio.run(coro_factory())
+    finally:
+        openai_client.use_clients(*previous)
+
+def test_valid_lessons_pass_validation():
+    """Test that an undisturbed fake lesson passes validation without any repair calls"""
+    print("🧪 Testing fake lessons against the pipeline...")
+    
+    backend = FakeBackend(seed=1)
+    prompt = build_grammar_lesson_prompt("Nouns", dict(LESSON_CONFIG, grade_level=3))
+    result = run_with_backend(backend, lambda: generate_validated_lesson(prompt, "Grammar", ["Nouns"], LESSON_CONFIG))
+    
+    assert result["validation"]["ok"], result["validation"]
+    assert not result["regenerated"]
+    assert backend.stats()["calls"] == {MAIN: 1}
+    print("✅ One call, counts match the prompt")
+    return True
+
+def test_short_outputs_exercise_repairs():
+    """Test that short outputs go through the targeted fix and then the synthesize path"""
+    print("\n🧪 Testing short outputs...")
+    
+    backend = FakeBackend(seed=2, short_rate=1.0)
+    prompt = build_grammar_lesson_prompt("Nouns", dict(LESSON_CONFIG, grade_level=3))
+    result = run_with_backend(backend, lambda: generate_validated_lesson(prompt, "Grammar", ["Nouns"], LESSON_CONFIG))
+    
+    calls = backend.stats()["calls"]
+    assert calls[MAIN] == 1 and calls[TARGETED_FIX] >= 1 and calls[SYNTHESIZE] >= 1, calls
+    assert result["validation"]["ok"], result["validation"]
+    print(f"✅ Repaired after {calls[TARGETED_FIX]} targeted fixes and {calls[SYNTHESIZE]} synthesize calls")
+    return True
+
+def test_injected_errors_are_retryable():
+    """Test that injected failures use the error types the client retries"""
+    print("\n🧪 Testing injected errors...")
+    
+    backend = FakeBackend(seed=3, error_rate=1.0)
+    create = backend.async_client().chat.completions.with_raw_response.create
+    for _ in range(20):
+        try:
+            asyncio.run(create(messages=[{"role": "user", "content": "x"}]))
+            assert False, "Expected an error"
+        except openai_client.RETRYABLE_ERRORS:
+            pass
+    assert backend.stats()["errors"] == 20
+    print("✅ Every injected error is retryable")
+    
+    for spec in ("fixed:0.5", "uniform:0.1,0.2", "lognormal:1,0.5", "exponential:0.3"):
+        parse_latency(spec)
+    try:
+        parse_latency("normal:1")
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+    print("✅ Latency specs are parsed and unknown ones rejected")
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Starting fake OpenAI backend tests...\n")
+    
+    if test_valid_lessons_pass_validation() and test_short_outputs_exercise_repairs() and test_injected_errors_are_retryable():
+        print("\n🎉 All fake backend tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent background job queue
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from job_queue import JobQueue
+
+async def echo_handler(payload, set_stage):
+    set_stage("working")
+    await asyncio.sleep(0.01)
+    if payload.get("fail"):
+        raise ValueError("handler failed")
+    return {"echo": payload["value"]}
+
+def test_jobs_run_and_report_results():
+    """Test that submitted jobs are processed and their results stored"""
+    print("🧪 Testing job processing...")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        db_path = tmp_file.name
+    
+    try:
+        async def run():
+            queue = JobQueue(echo_handler, db_path, workers=2)
+            await queue.start()
+            ok_id = await queue.submit({"value": 42})
+            failing_id = await queue.submit({"value": 0, "fail": True})
+            await queue.shutdown(timeout=5)
+            return await queue.get_job(ok_id), await queue.get_job(failing_id)
+        
+        ok_job, failing_job = asyncio.run(run())
+        
+        assert ok_job['status'] == "succeeded" and ok_job['result'] == {"echo": 42}
+        print("✅ Successful job stored its result")
+        assert failing_job['status'] == "failed" and "handler failed" in failing_job['error']
+        print("✅ Failing job recorded its error")
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+def test_jobs_survive_restart():
+    """Test that queued and interrupted jobs are resumed by a new queue instance"""
+    print("\n🧪 Testing job persistence across restarts...")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        db_path = tmp_file.name
+    
+    try:
+        async def never_finishes(payload, set_stage):
+            await asyncio.sleep(3600)
+        
+        async def first_run():
+            queue = JobQueue(never_finishes, db_path, workers=1)
+            await queue.start()
+            running_id = await queue.submit({"value": 1})
+            queued_id = await queue.submit({"value": 2})
+            await asyncio.sleep(0.05)
+            await queue.shutdown(timeout=0.1)  # Simulate the process stopping mid-job
+            return running_id, queued_id
+        
+        running_id, queued_id = asyncio.run(first_run())
+        
+        async def second_run():
+            queue = JobQueue(echo_handler, db_path, workers=1)
+            await queue.start()
+            await queue.shutdown(timeout=5)
+            return await queue.get_job(running_id), await queue.get_job(queued_id)
+        
+        interrupted_job, queued_job = asyncio.run(second_run())
+        
+        assert interrupted_job['status'] == "succeeded", interrupted_job
+        assert queued_job['status'] == "succeeded", queued_job
+        print("✅ Interrupted and queued jobs completed after restart")
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+def test_jobs_are_claimed_once():
+    """Test that queues sharing a database never run the same job twice, nor take over live jobs"""
+    print("\n🧪 Testing job claims and leases...")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        db_path = tmp_file.name
+    
+    try:
+        runs = []
+        
+        async def counting_handler(payload, set_stage):
+            runs.append(payload["value"])
+            await asyncio.sleep(0.05)
+            return {"echo": payload["value"]}
+        
+        async def run():
+            first = JobQueue(counting_handler, db_path, workers=2)
+            second = JobQueue(counting_handler, db_path, workers=2)
+            await first.start()
+            await second.start()
+            job_ids = [await first.submit({"value": n}) for n in range(4)]
+            for job_id in job_ids:
+                second._queue.put_nowait(job_id)  # Both processes see every job
+            await asyncio.gather(first.shutdown(timeout=5), second.shutdown(timeout=5))
+            return [await first.get_job(job_id) for job_id in job_ids]
+        
+        jobs = asyncio.run(run())
+        assert sorted(runs) == [0, 1, 2, 3], runs
+        assert all(job['status'] == "succeeded" for job in jobs)
+        print("✅ Each job ran exactly once across two queues")
+        
+        async def blocked_handler(payload, set_stage):
+            await asyncio.sleep(3600)
+        
+        async def takeover():
+            owner = JobQueue(blocked_handler, db_path, workers=1, lease_seconds=0.3)
+            await owner.start()
+            live_id = await owner.submit({"value": 8})
+            
+            # A job left running by a process that died: nobody renews its lease
+            dead_id = await owner.submit({"value": 9})
+            with sqlite3.connect(db_path) as conn:
+                conn.execute('''
+                    UPDATE generation_jobs SET status = 'running', worker_id = 'dead', lease_expires_at = ?
+                    WHERE id = ?
+                ''', (time.time() - 1, dead_id))
+            
+            other = JobQueue(echo_handler, db_path, workers=1, lease_seconds=0.3)
+            await other.start()
+            await asyncio.sleep(0.5)  # Longer than the lease: the owner keeps renewing it
+            await other.shutdown(timeout=5)
+            live, dead = await other.get_job(live_id), await other.get_job(dead_id)
+            await owner.shutdown(timeout=0)
+            return live, dead
+        
+        live, taken_over = asyncio.run(takeover())
+        assert live['status'] == "running", live
+        assert taken_over['status'] == "succeeded" and taken_over['result'] == {"echo": 9}, taken_over
+        print("✅ Running jobs are only taken over once their lease expires")
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+if __name__ == "__main__":
+    print("🚀 Starting job queue tests...\n")
+    
+    if test_jobs_run_and_report_results() and test_jobs_survive_restart() and test_jobs_are_claimed_once():
+        print("\n🎉 All job queue tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
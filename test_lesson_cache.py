@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for the content-addressed lesson cache
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lesson_cache import LessonCache
+
+MODEL_PARAMS = {"model": "gpt-4", "temperature": 0.7, "max_tokens": 1500}
+
+def make_temp_db() -> str:
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        return tmp_file.name
+
+def test_cache_hit_and_miss():
+    """Test keys, hits, misses and persistence across instances"""
+    print("🧪 Testing lesson cache hits and misses...")
+    
+    db_path = make_temp_db()
+    try:
+        cache = LessonCache(db_path)
+        key = LessonCache.make_key("prompt about nouns", MODEL_PARAMS, subject="Grammar")
+        
+        assert key == LessonCache.make_key("prompt about nouns", MODEL_PARAMS, subject="Grammar")
+        assert key != LessonCache.make_key("prompt about verbs", MODEL_PARAMS, subject="Grammar")
+        assert key != LessonCache.make_key("prompt about nouns", {**MODEL_PARAMS, "temperature": 0.2}, subject="Grammar")
+        print("✅ Keys depend on prompt and model parameters")
+        
+        assert cache.get(key) is None
+        cache.set(key, {"lessonText": "Grammar — Nouns", "warnings": []})
+        assert cache.get(key) == {"lessonText": "Grammar — Nouns", "warnings": []}
+        
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+        print("✅ Hit/miss counters are correct")
+        
+        # A new instance sees the persisted entry
+        assert LessonCache(db_path).get(key) is not None
+        print("✅ Cache entries persist across instances")
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+def test_cache_eviction():
+    """Test TTL expiry and least-recently-used eviction"""
+    print("\n🧪 Testing lesson cache eviction...")
+    
+    db_path = make_temp_db()
+    try:
+        cache = LessonCache(db_path, max_entries=2, ttl_seconds=None)
+        cache.set("a", {"n": 1})
+        time.sleep(0.01)
+        cache.set("b", {"n": 2})
+        time.sleep(0.01)
+        cache.get("a")  # "b" is now the least recently used entry
+        time.sleep(0.01)
+        cache.set("c", {"n": 3})
+        
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.stats()["evictions"] == 1
+        print("✅ Least recently used entry evicted")
+        
+        ttl_cache = LessonCache(db_path, ttl_seconds=0.05)
+        ttl_cache.set("d", {"n": 4})
+        time.sleep(0.1)
+        assert ttl_cache.get("d") is None
+        assert ttl_cache.stats()["expired"] == 1
+        print("✅ Expired entry treated as a miss")
+        return True
+    
+    finally:
+        if os.path.exists(db_path):
+            os.unlink(db_path)
+
+if __name__ == "__main__":
+    print("🚀 Starting lesson cache tests...\n")
+    
+    if test_cache_hit_and_miss() and test_cache_eviction():
+        print("\n🎉 All lesson cache tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
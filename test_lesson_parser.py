@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for the single-pass lesson tokenizer and the structured Lesson in lesson_parser.py
+"""
+
+import os
+import sys
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from lesson_parser import LessonTokenizer, parse_lesson, tokenize_lesson
+from lesson_pipeline import clean_lesson_text, validate_counts, validate_lesson
+
+RAW_LESSON = "\n".join([
+    "**Nouns**",
+    "",
+    "Rule Heading",
+    "A **noun** names a _person_, place, or thing. Draw a picture of a noun.",
+    "- dog",
+    "",
+    "**Activity Section A**",
+    "1. The dog ran.",
+    "2. The cat sat.",
+    "1. Activity Section B",
+    "1. The bird sang.",
+    "Not an item",
+    "3.No space, not an item",
+    "",
+])
+
+def test_tokenizer_matches_separate_passes():
+    """Test that one tokenizer pass gives the cleaned text, sections, counts and warnings"""
+    print("🧪 Testing single-pass lesson tokenizer...")
+    
+    expected_text = clean_lesson_text(RAW_LESSON, "Grammar", "Nouns")
+    expected_valid, expected_warnings = validate_lesson(RAW_LESSON, "Nouns")
+    
+    for chunk_size in (1, 5, 64, len(RAW_LESSON)):
+        tokenizer = LessonTokenizer("Grammar", "Nouns")
+        streamed = "".join(
+            tokenizer.feed(RAW_LESSON[i:i + chunk_size]) for i in range(0, len(RAW_LESSON), chunk_size)
+        ) + tokenizer.finish()
+        lesson = tokenizer.lesson()
+        
+        assert streamed == lesson.text == expected_text, f"Chunk size {chunk_size} produced different text"
+        assert lesson.sections == parse_lesson(expected_text).sections
+        assert lesson.item_counts == {1: 2, 2: 1}, lesson.item_counts
+        assert (lesson.is_valid, sorted(lesson.warnings)) == (expected_valid, sorted(expected_warnings))
+    
+    assert lesson.explanation.startswith("Grammar — Nouns\n\nExplanation")
+    assert sorted(lesson.banned_terms) == ["Draw", "picture"]
+    assert lesson.topic_mentions == 1
+    print("✅ Text, sections, item counts and warnings match the separate passes")
+    
+    empty = tokenize_lesson("", "Grammar", "Nouns")
+    assert empty.text == "" and empty.activities == {} and not empty.is_valid
+    print("✅ Empty output gives an empty, invalid lesson")
+    return True
+
+def test_with_activity_recounts_only_that_activity():
+    """Test that replacing an activity updates its count and rebuilds the text"""
+    print("\n🧪 Testing activity replacement...")
+    
+    lesson = tokenize_lesson(RAW_LESSON, "Grammar", "Nouns")
+    config = {"section_a_questions": 2, "section_b_questions": 3, "section_c_questions": 0, "section_d_questions": 0}
+    assert not validate_counts(lesson, config)["ok"]
+    
+    fixed = lesson.with_activity(2, "1. one\n2. two\n3. three")
+    assert fixed.item_counts == {1: 2, 2: 3}
+    assert fixed.activities[1] is lesson.activities[1]
+    assert parse_lesson(fixed.text).item_counts == fixed.item_counts
+    assert fixed.text.endswith("Activity 2\n1. one\n2. two\n3. three")
+    assert validate_counts(fixed, config)["ok"]
+    assert lesson.item_counts == {1: 2, 2: 1}, "The original lesson must not change"
+    print("✅ Only the replaced activity is recounted")
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Starting lesson parser tests...\n")
+    
+    if test_tokenizer_matches_separate_passes() and test_with_activity_recounts_only_that_activity():
+        print("\n🎉 All lesson parser tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test script for the lesson post-processing and repair pipeline in lesson_pipeline.py.
+The OpenAI client is replaced with a local fake so no network access is needed.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import lesson_pipeline
+from singleflight import SingleFlight
+
+SAMPLE_LESSON = "\n".join([
+    "Grammar — Nouns",
+    "",
+    "Explanation",
+    "A noun names a person, place, or thing.",
+    "",
+    "Activity 1",
+    "1. dog",
+    "2. cat",
+    "",
+    "Activity 2",
+    "1. one",
+    "2. two",
+    "3. three",
+    "",
+    "Activity 3",
+    "1. apple",
+    "",
+    "Activity 4",
+    "1. red",
+    "2. blue",
+    "3. green",
+])
+
+RAW_LESSON = "\n".join([
+    "**Nouns**",
+    "",
+    "Rule Heading",
+    "A **noun** names a _person_, place, or thing.",
+    "## Examples",
+    "- dog",
+    "• cat",
+    "",
+    "",
+    "",
+    "**Activity Section A**",
+    "1. The dog ran.",
+    "2. The cat sat.",
+    "1. Activity Section B",
+    "1. The bird sang.",
+    "",
+    "",
+])
+
+def make_fake_generate(delay: float):
+    """Return a fake generate_lesson_async that answers targeted prompts with 3 items"""
+    calls = []
+    
+    async def fake_generate(prompt, **kwargs):
+        calls.append(prompt)
+        await asyncio.sleep(delay)
+        return "\n".join(f"{i}. fixed item {i}" for i in range(1, 4))
+    
+    return fake_generate, calls
+
+def test_concurrent_activity_repair():
+    """Test that mismatched activities are repaired concurrently and merged once"""
+    print("Testing concurrent activity repair...")
+    
+    original_generate = lesson_pipeline.generate_lesson_async
+    fake_generate, calls = make_fake_generate(delay=0.2)
+    lesson_pipeline.generate_lesson_async = fake_generate
+    
+    try:
+        config = {f"section_{s}_questions": 3 for s in "abcd"}
+        validation = lesson_pipeline.validate_counts(lesson_pipeline.parse_lesson_sections(SAMPLE_LESSON), config)
+        assert not validation["ok"]
+        
+        start = time.perf_counter()
+        lesson = lesson_pipeline.parse_lesson(SAMPLE_LESSON)
+        fixed = asyncio.run(lesson_pipeline.repair_lesson_activities(lesson, "Nouns", validation, max_concurrency=4)).text
+        elapsed = time.perf_counter() - start
+        
+        final = lesson_pipeline.validate_counts(lesson_pipeline.parse_lesson_sections(fixed), config)
+        assert final["ok"], final["activities"]
+        assert len(calls) == 2, f"Expected 2 repair calls, got {len(calls)}"
+        assert elapsed < 0.35, f"Repairs ran serially ({elapsed:.2f}s)"
+        assert "2. two" in fixed, "Untouched activity should be preserved"
+        print(f"✅ Repaired 2 activities in {elapsed:.2f}s")
+        return True
+    
+    finally:
+        lesson_pipeline.generate_lesson_async = original_generate
+
+def test_repair_respects_concurrency_limit():
+    """Test that max_concurrency bounds the number of in-flight repairs"""
+    print("\nTesting repair concurrency limit...")
+    
+    original_generate = lesson_pipeline.generate_lesson_async
+    fake_generate, calls = make_fake_generate(delay=0.1)
+    lesson_pipeline.generate_lesson_async = fake_generate
+    
+    try:
+        config = {f"section_{s}_questions": 3 for s in "abcd"}
+        validation = lesson_pipeline.validate_counts(lesson_pipeline.parse_lesson_sections(SAMPLE_LESSON), config)
+        
+        start = time.perf_counter()
+        lesson = lesson_pipeline.parse_lesson(SAMPLE_LESSON)
+        asyncio.run(lesson_pipeline.repair_lesson_activities(lesson, "Nouns", validation, max_concurrency=1))
+        elapsed = time.perf_counter() - start
+        
+        assert elapsed >= 0.2, f"Expected serial repairs with max_concurrency=1 ({elapsed:.2f}s)"
+        print("✅ Concurrency limit respected")
+        return True
+    
+    finally:
+        lesson_pipeline.generate_lesson_async = original_generate
+
+def test_incremental_cleaner_matches_batch():
+    """Test that streaming chunks through LessonTextCleaner matches clean_lesson_text"""
+    print("\nTesting incremental lesson text cleaner...")
+    
+    expected = lesson_pipeline.clean_lesson_text(RAW_LESSON, "Grammar", "Nouns")
+    assert expected.startswith("Grammar — Nouns\n\nExplanation")
+    assert "Activity 1" in expected and "Activity 2" in expected
+    assert "**" not in expected and "\n\n\n" not in expected
+    
+    for chunk_size in (1, 3, 7, 64):
+        cleaner = lesson_pipeline.LessonTextCleaner("Grammar", "Nouns")
+        streamed = "".join(
+            cleaner.feed(RAW_LESSON[i:i + chunk_size]) for i in range(0, len(RAW_LESSON), chunk_size)
+        ) + cleaner.finish()
+        assert streamed == expected, f"Chunk size {chunk_size} produced different output"
+    
+    print("✅ Streamed output matches batch cleaning")
+    return True
+
+def test_single_flight_coalesces_identical_calls():
+    """Test that concurrent calls with the same key share one execution"""
+    print("\nTesting single-flight request coalescing...")
+    
+    flights = SingleFlight()
+    executions = []
+    
+    async def work(key):
+        executions.append(key)
+        await asyncio.sleep(0.05)
+        return f"lesson for {key}"
+    
+    async def run():
+        return await asyncio.gather(
+            *(flights.do("nouns", lambda: work("nouns")) for _ in range(5)),
+            flights.do("verbs", lambda: work("verbs"))
+        )
+    
+    results = asyncio.run(run())
+    assert results == ["lesson for nouns"] * 5 + ["lesson for verbs"]
+    assert executions == ["nouns", "verbs"], executions
+    stats = flights.stats()
+    assert stats["executions"] == 2 and stats["coalesced"] == 4 and stats["in_flight"] == 0
+    print("✅ 6 calls coalesced into 2 executions")
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Starting lesson pipeline tests...\n")
+    
+    results = [
+        test_concurrent_activity_repair(),
+        test_repair_respects_concurrency_limit(),
+        test_incremental_cleaner_matches_batch(),
+        test_single_flight_coalesces_identical_calls(),
+    ]
+    
+    if all(results):
+        print("\n🎉 All lesson pipeline tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script for the Prometheus metrics in metrics.py and the pipeline and database instrumentation
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import openai_client
+from database import LessonDatabase
+from fake_openai import FakeBackend
+from lesson_pipeline import generate_validated_lesson
+from metrics import (
+    DB_OPERATION_SECONDS,
+    LLM_CALL_SECONDS,
+    REPAIR_ATTEMPTS,
+    STAGE_SECONDS,
+    MetricsRegistry,
+)
+from prompt_builder import build_grammar_lesson_prompt
+
+def test_exposition_format():
+    """Test that counters and histograms render in the Prometheus text format"""
+    print("🧪 Testing metrics rendering...")
+    
+    registry = MetricsRegistry()
+    requests = registry.counter("test_requests_total", "Requests.", ["path"])
+    latency = registry.histogram("test_latency_seconds", "Latency.", ["stage"], buckets=(0.1, 1.0))
+    
+    requests.inc(path="/a")
+    requests.inc(2, path='/b"quoted"')
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, stage="x")
+    
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP test_requests_total Requests.", "# TYPE test_requests_total counter"]
+    assert 'test_requests_total{path="/a"} 1' in lines
+    assert 'test_requests_total{path="/b\\"quoted\\""} 2' in lines
+    assert "# TYPE test_latency_seconds histogram" in lines
+    assert 'test_latency_seconds_bucket{stage="x",le="0.1"} 2' in lines, "Buckets include their upper bound"
+    assert 'test_latency_seconds_bucket{stage="x",le="1.0"} 3' in lines
+    assert 'test_latency_seconds_bucket{stage="x",le="+Inf"} 4' in lines
+    assert next(line for line in lines if "_sum" in line).startswith('test_latency_seconds_sum{stage="x"} 3.65')
+    assert 'test_latency_seconds_count{stage="x"} 4' in lines
+    print("✅ Counters, cumulative buckets, sum and count rendered")
+    
+    try:
+        requests.inc(method="GET")
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+    try:
+        registry.counter("test_requests_total", "Again.")
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+    print("✅ Wrong labels and duplicate names are rejected")
+    return True
+
+def test_pipeline_and_database_instrumentation():
+    """Test that generation, repairs and database calls are recorded"""
+    print("\n🧪 Testing pipeline and database instrumentation...")
+    
+    config = {"grade_level": 3, "section_a_questions": 5, "section_b_questions": 5,
+              "section_c_questions": 5, "section_d_questions": 5}
+    before = {
+        "main": LLM_CALL_SECONDS.count(call_type="main", outcome="ok"),
+        "fix": LLM_CALL_SECONDS.count(call_type="targeted-fix", outcome="ok"),
+        "validate": STAGE_SECONDS.count(stage="clean_validate"),
+        "repairs": sum(REPAIR_ATTEMPTS.get(activity=n) for n in range(1, 5)),
+    }
+    
+    backend = FakeBackend(seed=5, short_rate=1.0)
+    previous = (openai_client.client, openai_client.async_client)
+    openai_client.use_clients(backend.client(), backend.async_client())
+    try:
+        prompt = build_grammar_lesson_prompt("Nouns", config)
+        asyncio.run(generate_validated_lesson(prompt, "Grammar", ["Nouns"], config))
+    finally:
+        openai_client.use_clients(*previous)
+    
+    calls = backend.stats()["calls"]
+    assert LLM_CALL_SECONDS.count(call_type="main", outcome="ok") == before["main"] + 1
+    assert LLM_CALL_SECONDS.count(call_type="targeted-fix", outcome="ok") == before["fix"] + calls["targeted-fix"]
+    assert STAGE_SECONDS.count(stage="clean_validate") == before["validate"] + 1
+    assert sum(REPAIR_ATTEMPTS.get(activity=n) for n in range(1, 5)) == before["repairs"] + calls["targeted-fix"]
+    print("✅ LLM calls are labeled by type and repair attempts counted per activity")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        test_db_path = tmp_file.name
+    try:
+        db = LessonDatabase(test_db_path)
+        saves = DB_OPERATION_SECONDS.count(method="save_lesson")
+        lesson_id = db.save_lesson(["Nouns"], 3, "Activity 1\n1. One")
+        db.get_lesson(lesson_id)
+        assert DB_OPERATION_SECONDS.count(method="save_lesson") == saves + 1
+        assert DB_OPERATION_SECONDS.count(method="get_lesson") >= 1
+        
+        finds, pages = DB_OPERATION_SECONDS.count(method="find_lessons"), DB_OPERATION_SECONDS.count(method="list_lessons_page")
+        db.list_lessons_page(include_total=True)
+        assert DB_OPERATION_SECONDS.count(method="list_lessons_page") == pages + 1
+        assert DB_OPERATION_SECONDS.count(method="find_lessons") == finds, "Nested calls are part of the outer one"
+        db.close()
+    finally:
+        os.unlink(test_db_path)
+    print("✅ Database methods are timed, each call once")
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Starting metrics tests...\n")
+    
+    if test_exposition_format() and test_pipeline_and_database_instrumentation():
+        print("\n🎉 All metrics tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for the OpenAI rate limiter
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rate_limiter import RateLimiter, INTERACTIVE, REPAIR, BATCH, parse_reset_duration
+
+def test_priority_order():
+    """Test that waiting calls are served interactive first, then repair, then batch"""
+    print("🧪 Testing priority classes...")
+    
+    async def run():
+        limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=100000, max_concurrency=1)
+        order = []
+        
+        async def call(name, priority):
+            async with limiter.limit(10, priority) as permit:
+                order.append(name)
+                await asyncio.sleep(0.01)
+                permit.record_response({})
+        
+        blocker = asyncio.create_task(call("first", BATCH))
+        await asyncio.sleep(0)
+        waiting = [
+            asyncio.create_task(call("batch", BATCH)),
+            asyncio.create_task(call("repair", REPAIR)),
+            asyncio.create_task(call("interactive", INTERACTIVE))
+        ]
+        await asyncio.gather(blocker, *waiting)
+        return order
+    
+    order = asyncio.run(run())
+    assert order == ["first", "interactive", "repair", "batch"], order
+    print("✅ Interactive calls jumped ahead of repair and batch calls")
+    return True
+
+def test_aimd_and_token_budget():
+    """Test that a 429 halves concurrency and that the token budget makes calls wait"""
+    print("\n🧪 Testing adaptive concurrency and token budget...")
+    
+    async def run():
+        limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=6000, max_concurrency=8)
+        async with limiter.limit(100) as permit:
+            permit.record_rate_limited({"retry-after": "0"})
+        after_429 = limiter.concurrency_limit
+        
+        async with limiter.limit(100) as permit:
+            permit.record_response({}, tokens_used=100)
+        after_success = limiter.concurrency_limit
+        
+        # Drain the bucket, then a 50-token call needs ~0.5s of refill at 100 tokens/s
+        async with limiter.limit(6000) as permit:
+            permit.record_response({}, tokens_used=6000)
+        start = time.monotonic()
+        async with limiter.limit(50) as permit:
+            permit.record_response({}, tokens_used=50)
+        return after_429, after_success, time.monotonic() - start
+    
+    after_429, after_success, waited = asyncio.run(run())
+    assert after_429 == 4, after_429
+    assert 4 < after_success < 5, after_success
+    print("✅ Concurrency halved on 429 and grew back additively")
+    assert 0.3 < waited < 2, waited
+    print(f"✅ Call waited {waited:.2f}s for the token budget to refill")
+    return True
+
+def test_parse_reset_duration():
+    """Test parsing of rate-limit reset headers"""
+    print("\n🧪 Testing reset header parsing...")
+    assert parse_reset_duration("1s") == 1
+    assert parse_reset_duration("6m0s") == 360
+    assert abs(parse_reset_duration("20ms") - 0.02) < 1e-9
+    assert parse_reset_duration("2.5") == 2.5
+    assert parse_reset_duration(None) is None
+    print("✅ Reset durations parsed")
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Starting rate limiter tests...\n")
+    
+    if test_priority_order() and test_aimd_and_token_budget() and test_parse_reset_duration():
+        print("\n🎉 All rate limiter tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
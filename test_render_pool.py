@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test script for the DOCX render process pool
+"""
+
+import asyncio
+import io
+import os
+import sys
+import zipfile
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lesson_parser import parse_lesson
+from render_pool import RenderPool, RenderQueueFullError
+
+LESSON = parse_lesson("Grammar — Nouns\n\nActivity 1\n1. Underline the noun.\n2. Circle the noun.")
+
+def test_render_pool():
+    """Test rendering in workers, the pending limit and the timeout"""
+    print("🧪 Testing render pool...")
+    
+    pool = RenderPool(workers=1, max_pending=1, timeout=30)
+    try:
+        for warmup in pool.start():
+            warmup.result()
+        assert pool.stats()["started"] and pool.stats()["start_method"] in ("forkserver", "spawn")
+        assert pool.start() == [], "A started pool is not started again"
+        
+        content = asyncio.run(pool.render(LESSON, 3, ["Nouns"]))
+        assert "word/document.xml" in zipfile.ZipFile(io.BytesIO(content)).namelist()
+        print("✅ Lesson rendered in a worker process")
+        
+        async def two_at_once(wait_for_slot):
+            return await asyncio.gather(
+                pool.render(LESSON, 3, ["Nouns"]),
+                pool.render(LESSON, 3, ["Nouns"], wait_for_slot=wait_for_slot),
+                return_exceptions=True
+            )
+        
+        results = asyncio.run(two_at_once(False))
+        assert isinstance(results[0], bytes) and isinstance(results[1], RenderQueueFullError)
+        results = asyncio.run(two_at_once(True))
+        assert all(isinstance(result, bytes) for result in results)
+        assert pool.stats()["rejected"] == 1 and pool.stats()["pending"] == 0
+        print("✅ Renders beyond max_pending are rejected unless the caller waits")
+        
+        async def download_during_exports():
+            exports = [asyncio.ensure_future(pool.render(LESSON, 3, ["Nouns"], wait_for_slot=True)) for _ in range(4)]
+            await asyncio.sleep(0)
+            assert pool.stats()["exporting"] == pool.export_slots == 1, pool.stats()
+            download = await pool.render(LESSON, 3, ["Nouns"])
+            return [download] + await asyncio.gather(*exports)
+        
+        results = asyncio.run(download_during_exports())
+        assert all(isinstance(result, bytes) for result in results)
+        assert pool.stats()["rejected"] == 1 and pool.stats()["exporting"] == 0
+        print("✅ Exports wait for their own slots and leave max_pending to downloads")
+        
+        pool.timeout = 0
+        try:
+            asyncio.run(pool.render(LESSON, 3, ["Nouns"]))
+            assert False, "Render should have timed out"
+        except asyncio.TimeoutError:
+            pass
+        assert pool.stats()["timeouts"] == 1 and pool.stats()["pending"] == 0
+        print("✅ Slow renders time out")
+        return True
+    
+    finally:
+        pool.shutdown()
+
+if __name__ == "__main__":
+    print("🚀 Starting render pool tests...\n")
+    
+    if test_render_pool():
+        print("\n🎉 All render pool tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for Server-Timing headers and request profiling (request_timing.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from database import LessonDatabase
+from metrics import LLM_CALL_SECONDS, STAGE_SECONDS
+from request_timing import RequestProfiler, ServerTimingMiddleware, record_stage
+
+def call(app, query: bytes = b"") -> dict:
+    """Send one GET through an ASGI app and return its response headers"""
+    scope = {"type": "http", "method": "GET", "path": "/api/test", "query_string": query, "headers": []}
+    headers = {}
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        if message["type"] == "http.response.start":
+            headers.update((name.decode(), value.decode()) for name, value in message["headers"])
+    
+    asyncio.run(app(scope, receive, send))
+    return headers
+
+def make_app(db: LessonDatabase):
+    async def app(scope, receive, send):
+        with STAGE_SECONDS.time(stage="prompt_build"):
+            pass
+        for _ in range(2):
+            LLM_CALL_SECONDS.observe(0.25, call_type="targeted-fix", outcome="ok")
+        lesson_id = db.save_lesson(["Nouns"], 3, "Activity 1\n1. One")
+        db.list_lessons_page(limit=5)
+        db.get_lesson(lesson_id)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"ok"})
+    return app
+
+def test_server_timing_header():
+    """Test that the stages a request runs show up in its Server-Timing header"""
+    print("🧪 Testing Server-Timing header...")
+    
+    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
+        test_db_path = tmp_file.name
+    try:
+        db = LessonDatabase(test_db_path)
+        profiler = RequestProfiler(always=False, admin_token="")
+        headers = call(ServerTimingMiddleware(make_app(db), profiler))
+        db.close()
+    finally:
+        os.unlink(test_db_path)
+    
+    entries = [entry.strip() for entry in headers["server-timing"].split(",")]
+    names = [entry.split(";")[0] for entry in entries]
+    assert names == ["prompt_build", "llm-targeted-fix", "db", "total"], names
+    assert entries[1] == 'llm-targeted-fix;dur=500.000;desc="2 calls"', entries[1]
+    assert entries[2].endswith('desc="3 calls"'), "Nested database calls are counted once"
+    print(f"✅ Server-Timing: {headers['server-timing']}")
+    
+    record_stage("outside", 1.0)  # No request: ignored
+    print("✅ Stages recorded outside a request are ignored")
+    return True
+
+def test_profiling_is_opt_in():
+    """Test that only enabled, slow requests leave a profile on disk"""
+    print("\n🧪 Testing request profiling...")
+    
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    
+    with tempfile.TemporaryDirectory() as profile_dir:
+        profiler = RequestProfiler(always=False, admin_token="secret", slow_ms=0, directory=profile_dir)
+        middleware = ServerTimingMiddleware(app, profiler)
+        
+        call(middleware)
+        call(middleware, b"profile=wrong")
+        assert os.listdir(profile_dir) == [], "Profiling needs the admin token"
+        
+        call(middleware, b"profile=secret")
+        files = sorted(os.listdir(profile_dir))
+        assert [os.path.splitext(name)[1] for name in files] == [".prof", ".txt"], files
+        assert "GET-api_test" in files[0]
+        print("✅ The admin token profiles a request and writes its report")
+        
+        slow_only = RequestProfiler(always=True, slow_ms=60_000, directory=profile_dir)
+        call(ServerTimingMiddleware(app, slow_only))
+        assert slow_only.written == 0 and len(os.listdir(profile_dir)) == 2
+        print("✅ Requests under the threshold leave no report")
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Starting request timing tests...\n")
+    
+    if test_server_timing_header() and test_profiling_is_opt_in():
+        print("\n🎉 All request timing tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming ZIP export
+"""
+
+import asyncio
+import io
+import os
+import sys
+import zipfile
+
+# Add the current directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from zip_stream import stream_zip
+
+def test_stream_zip():
+    """Test that streamed chunks form a valid archive, one entry per chunk"""
+    print("🧪 Testing streamed ZIP archives...")
+    
+    async def entries():
+        for n in range(3):
+            yield f"lesson_{n}.docx", bytes([n]) * (n * 1000)
+    
+    async def collect():
+        return [chunk async for chunk in stream_zip(entries())]
+    
+    chunks = asyncio.run(collect())
+    assert len(chunks) == 4  # one per entry, then the central directory
+    
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+    assert archive.namelist() == ["lesson_0.docx", "lesson_1.docx", "lesson_2.docx"]
+    assert archive.testzip() is None
+    assert archive.read("lesson_2.docx") == bytes([2]) * 2000
+    print("✅ Streamed chunks form a valid archive")
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Starting ZIP stream tests...\n")
+    
+    if test_stream_zip():
+        print("\n🎉 All ZIP stream tests passed!")
+    else:
+        print("\n❌ Some tests failed.")
+        sys.exit(1)
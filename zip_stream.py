@@ -0,0 +1,38 @@
+import zipfile
+from typing import AsyncIterator, Tuple
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back out in chunks"""
+    
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+    
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._offset
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def stream_zip(entries: AsyncIterator[Tuple[str, bytes]]) -> AsyncIterator[bytes]:
+    """
+    Build a ZIP archive from (name, content) entries and yield it in pieces as
+    each entry arrives, so only one entry is held in memory at a time.
+    Entries are stored uncompressed: DOCX files are already ZIP-compressed.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        async for name, content in entries:
+            archive.writestr(name, content)
+            yield sink.drain()
+    yield sink.drain()